@@ -34,6 +34,12 @@ urlpatterns = [
     url('^api/v1/auth/logout/$', LogoutRestView.as_view(), name='rest_logout'),
     url('^api/v1/viewflow/tasks/$', list_rest.AllTaskListRestView.as_view(ns_map=flows), name='rest_viewflow_tasks'),
     url('^api/v1/viewflow/queue/$', list_rest.AllQueueListRestView.as_view(ns_map=flows), name='rest_viewflow_queue'),
+    url('^api/v1/viewflow/queue/claim/$', list_rest.AllQueueClaimRestView.as_view(ns_map=flows),
+        name='rest_viewflow_queue_claim'),
+    url('^api/v1/viewflow/tasks/action/$', list_rest.AllTaskActionRestView.as_view(ns_map=flows),
+        name='rest_viewflow_task_action'),
+    url('^api/v1/viewflow/processes/cancel/$', list_rest.AllProcessCancelRestView.as_view(ns_map=flows),
+        name='rest_viewflow_process_cancel'),
 
     # Note that the namespace for the per-app REST API URL shall be of the format 'rest_viewflow_app_xxx', where 'xxx'
     # is the name of the app. It is critical for reversing from view name to URL. See also
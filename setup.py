@@ -39,6 +39,7 @@ setup(
               'viewflow.flow',
               'viewflow.flow.views',
               'viewflow.management',
+              'viewflow.management.commands',
               'viewflow.migrations',
               'viewflow.nodes',
               'viewflow.south_migrations',
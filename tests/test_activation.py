@@ -3,11 +3,13 @@ from django.test import TestCase
 from viewflow import activation, flow, lock
 from viewflow.activation import STATUS
 from viewflow.compat import mock
+from viewflow.token import Token
 
 
 class Test(TestCase):
     class ProcessStub(object):
         _default_manager = mock.Mock()
+        active_task_count = None
 
         def __init__(self, flow_class=None):
             self.flow_class = flow_class
@@ -24,6 +26,7 @@ class Test(TestCase):
     class TaskStub(object):
         process_id = 1
         status = STATUS.NEW
+        token = Token('start')
 
         def __init__(self, flow_task=None):
             self.flow_task = flow_task
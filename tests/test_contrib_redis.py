@@ -13,6 +13,7 @@ from django.test.utils import override_settings
 
 from viewflow import flow
 from viewflow.base import Flow, this
+from viewflow.compat import mock
 from viewflow.contrib import redis
 from viewflow.exceptions import FlowLockFailed
 
@@ -66,3 +67,130 @@ class Test(TestCase):
 
         thread1.join()
         thread2.join()
+
+
+def get_redis_client():
+    try:
+        import fakeredis
+        return fakeredis.FakeStrictRedis()
+    except ImportError:
+        import redis as redis_py
+        return redis_py.StrictRedis.from_url(os.environ['REDIS_CACHE_URL'])
+
+
+def redis_available():
+    try:
+        import fakeredis  # NOQA
+        return True
+    except ImportError:
+        return 'REDIS_CACHE_URL' in os.environ
+
+
+@unittest.skipUnless(redis_available(), 'Notify lock test requires fakeredis or redis server url')
+class TestNotifyLock(TestCase):
+    class TestFlow(Flow):
+        start = flow.Start().Next(this.end)
+        end = flow.End()
+
+    def setUp(self):
+        self.client = get_redis_client()
+        self.client.flushdb()
+        self.process = TestNotifyLock.TestFlow.process_class.objects.create(flow_class=TestNotifyLock.TestFlow)
+
+    def test_waiter_woken_on_release(self):
+        lock_impl = redis.RedisNotifyLock(client=self.client, timeout=5, lease=5)
+        lock = lock_impl(TestNotifyLock.TestFlow)
+        acquired = threading.Event()
+        released_at, wait_time = [], []
+
+        def holder():
+            with lock(TestNotifyLock.TestFlow, self.process.pk):
+                acquired.set()
+                time.sleep(0.1)
+                released_at.append(time.time())
+
+        def waiter():
+            acquired.wait()
+            with lock(TestNotifyLock.TestFlow, self.process.pk):
+                wait_time.append(time.time() - released_at[0])
+
+        thread1 = threading.Thread(target=holder)
+        thread2 = threading.Thread(target=waiter)
+        thread1.start()
+        thread2.start()
+        thread1.join()
+        thread2.join()
+
+        self.assertEqual(1, len(wait_time))
+        self.assertLess(wait_time[0], 1)
+
+    def test_waiter_rechecks_without_notification(self):
+        lock = redis.RedisNotifyLock(client=self.client, timeout=10, lease=30)(TestNotifyLock.TestFlow)
+        key = 'django-viewflow-lock-{}/{}'.format(TestNotifyLock.TestFlow._meta.flow_label, self.process.pk)
+        released_at, wait_time = [], []
+
+        def waiter():
+            with lock(TestNotifyLock.TestFlow, self.process.pk):
+                wait_time.append(time.time() - released_at[0])
+
+        # a holder that died, or whose notification was taken by a waiter that already left
+        self.client.set(key, b'other', px=30000)
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        time.sleep(0.1)
+        released_at.append(time.time())
+        self.client.delete(key)
+        thread.join()
+
+        self.assertEqual(1, len(wait_time))
+        self.assertLess(wait_time[0], redis.NOTIFY_TIMEOUT + 0.5)
+
+    def test_lease_renewed_while_held(self):
+        lock = redis.RedisNotifyLock(client=self.client, timeout=1, lease=0.3)(TestNotifyLock.TestFlow)
+        key = 'django-viewflow-lock-{}/{}'.format(TestNotifyLock.TestFlow._meta.flow_label, self.process.pk)
+
+        with lock(TestNotifyLock.TestFlow, self.process.pk):
+            time.sleep(0.6)
+            self.assertTrue(self.client.exists(key))
+        self.assertFalse(self.client.exists(key))
+
+    def test_lock_timeout(self):
+        lock = redis.RedisNotifyLock(client=self.client, timeout=1, lease=5)(TestNotifyLock.TestFlow)
+        errors = queue.Queue()
+
+        def waiter():
+            try:
+                with lock(TestNotifyLock.TestFlow, self.process.pk):
+                    pass
+            except FlowLockFailed as e:
+                errors.put(e)
+
+        with lock(TestNotifyLock.TestFlow, self.process.pk):
+            thread = threading.Thread(target=waiter)
+            thread.start()
+            thread.join()
+
+        self.assertIsInstance(errors.get_nowait(), FlowLockFailed)
+
+
+class TestRelease(unittest.TestCase):
+    def test_release_retried_on_watch_error(self):
+        pipe = mock.MagicMock()
+        pipe.get.return_value = b'token'
+        pipe.execute.side_effect = [redis.WatchError(), None]
+        client = mock.Mock()
+        client.pipeline.return_value.__enter__ = mock.Mock(return_value=pipe)
+        client.pipeline.return_value.__exit__ = mock.Mock(return_value=False)
+
+        redis._release(client, 'key', 'key/notify', b'token')
+
+        self.assertEqual(2, pipe.execute.call_count)
+        pipe.delete.assert_any_call('key')
+        pipe.lpush.assert_called_with('key/notify', 1)
+        pipe.pexpire.assert_called_with('key/notify', redis.NOTIFY_TIMEOUT * 1000)
+
+    def test_renewal_stop_waits_for_thread(self):
+        renewal = redis._LeaseRenewal(mock.Mock(), 'key', b'token', 30)
+        renewal.start()
+        renewal.stop()
+        self.assertFalse(renewal.is_alive())
@@ -1,7 +1,10 @@
+from django.db import connection, models
 from django.test import TestCase
 
-from viewflow import fields, flow
+from viewflow import catalog, fields, flow
 from viewflow.base import Flow, this
+from viewflow.compat import mock
+from viewflow.models import AbstractProcess, AbstractTask, FlowCatalog
 from viewflow.token import Token
 
 
@@ -73,7 +76,106 @@ class Test(TestCase):
         self.assertEqual(field.to_python(Token('start/1')), Token('start/1'))
         self.assertEqual(field.to_python('start/1'), Token('start/1'))
 
+    def test_registered_refs_lookup_without_import(self):
+        with mock.patch('viewflow.fields.import_string') as import_string, \
+                mock.patch('viewflow.fields.get_containing_app_data') as get_containing_app_data:
+            self.assertEqual(fields.import_flow_by_ref('tests/test_fields.TestFlow'), TestFlow)
+            self.assertEqual(fields.get_flow_ref(TestFlow), 'tests/test_fields.TestFlow')
+            self.assertEqual(fields.import_task_by_ref('tests/test_fields.TestFlow.end'), TestFlow.end)
+            self.assertEqual(fields.get_task_ref(TestFlow.end), 'tests/test_fields.TestFlow.end')
+
+        self.assertFalse(import_string.called)
+        self.assertFalse(get_containing_app_data.called)
+
+    def test_compact_reference_fields_succeed(self):
+        act = CompactTestFlow.start.run()
+
+        process = CompactProcess.objects.get(pk=act.process.pk)
+        self.assertEqual(process.flow_class, CompactTestFlow)
+        self.assertEqual(
+            CompactProcess.objects.filter(pk=process.pk).values_list('flow_class', flat=True).get(),
+            FlowCatalog.objects.get(ref='tests/test_fields.CompactTestFlow').pk)
+
+        task = CompactTask.objects.get(process=process, flow_task=CompactTestFlow.end)
+        self.assertEqual(task.flow_task, CompactTestFlow.end)
+        self.assertEqual(
+            CompactTask.objects.filter(pk=task.pk).values_list('flow_task', flat=True).get(),
+            FlowCatalog.objects.get(ref='tests/test_fields.CompactTestFlow.end').pk)
+
+        self.assertEqual(
+            [process],
+            list(CompactProcess.objects.filter(flow_class__in=[CompactTestFlow])))
+        self.assertEqual(2, CompactTask.objects.filter(process__flow_class=CompactTestFlow).count())
+
+    def test_compact_reference_fields_prep_value_succeed(self):
+        flow_field, task_field = fields.CompactFlowReferenceField(), fields.CompactTaskReferenceField()
+
+        self.assertEqual(flow_field.get_prep_value(None), None)
+        self.assertEqual(
+            flow_field.get_db_prep_save(TestFlow, connection),
+            flow_field.get_prep_value('tests/test_fields.TestFlow'))
+        self.assertEqual(flow_field.to_python(flow_field.get_prep_value(TestFlow)), TestFlow)
+
+        self.assertEqual(task_field.get_prep_value(''), None)
+        self.assertEqual(
+            task_field.get_db_prep_save(TestFlow.start, connection),
+            task_field.get_prep_value('tests/test_fields.TestFlow.start'))
+        self.assertEqual(task_field.to_python(task_field.get_prep_value(TestFlow.start)), TestFlow.start)
+
+    def test_compact_reference_lookup_does_not_create_entries(self):
+        CompactTestFlow.start.run()
+        catalog_size = FlowCatalog.objects.count()
+
+        self.assertEqual([], list(CompactProcess.objects.filter(flow_class=TestFlow)))
+        self.assertEqual([], list(CompactProcess.objects.filter(flow_class__in=[TestFlow])))
+        self.assertEqual(0, CompactTask.objects.filter(flow_task='tests/test_fields.TestFlow.missing').count())
+        self.assertEqual(catalog_size, FlowCatalog.objects.count())
+
+    def test_compact_reference_exclude_unknown(self):
+        process = CompactTestFlow.start.run().process
+
+        self.assertEqual([process], list(CompactProcess.objects.exclude(flow_class=TestFlow)))
+        self.assertEqual(
+            2, CompactTask.objects.exclude(flow_task='tests/test_fields.TestFlow.missing').count())
+
+    def test_existing_catalog_entry_cached(self):
+        ref = 'tests/test_fields.TestFlow.existing'
+        entry = FlowCatalog.objects.create(ref=ref)
+        self.addCleanup(catalog._ref_by_id.pop, entry.pk, None)
+        self.addCleanup(catalog._id_by_ref.pop, ref, None)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(entry.pk, catalog.get_catalog_id(ref, create=False))
+            self.assertEqual(entry.pk, catalog.get_catalog_id(ref, create=False))
+            self.assertEqual(ref, catalog.get_catalog_ref(entry.pk))
+
+    def test_created_catalog_entry_cached_on_commit(self):
+        ref = 'tests/test_fields.TestFlow.created'
+        ref_id = catalog.get_catalog_id(ref)
+
+        self.assertNotIn(ref, catalog._id_by_ref)
+        with self.assertNumQueries(1):
+            self.assertEqual(ref_id, catalog.get_catalog_id(ref, create=False))
+        self.assertNotIn(ref, catalog._id_by_ref)
+
 
 class TestFlow(Flow):
     start = flow.Start(lambda request: None).Next(this.end)
     end = flow.End()
+
+
+class CompactProcess(AbstractProcess):
+    flow_class = fields.CompactFlowReferenceField()
+
+
+class CompactTask(AbstractTask):
+    flow_task = fields.CompactTaskReferenceField()
+    process = models.ForeignKey(CompactProcess)
+
+
+class CompactTestFlow(Flow):
+    process_class = CompactProcess
+    task_class = CompactTask
+
+    start = flow.StartFunction().Next(this.end)
+    end = flow.End()
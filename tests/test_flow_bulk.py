@@ -0,0 +1,400 @@
+import gc
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db.models.query import QuerySet
+from django.test import TestCase
+from django.utils.six import StringIO
+from django.utils.timezone import now
+
+from viewflow import flow, signals
+from viewflow.activation import STATUS, Activation, StartActivation, ViewActivation
+from viewflow.base import Flow, this
+from viewflow.bulk import CancelPlan, perform_task_actions
+from viewflow.compat import mock
+from viewflow.exceptions import FlowLockConflict, FlowLockFailed, FlowRuntimeError
+from viewflow.lock import no_lock
+from viewflow.models import Process, Task
+
+
+class Test(TestCase):
+    def test_start_many_creates_tasks(self):
+        processes = BulkTestFlow.start_many(BulkTestFlow.start, [{}, {}, {}])
+        self.assertEqual(3, len(processes))
+
+        for process in processes:
+            start = Task.objects.get(process=process, flow_task=BulkTestFlow.start)
+            task = Task.objects.get(process=process, flow_task=BulkTestFlow.task)
+
+            self.assertEqual(STATUS.DONE, start.status)
+            self.assertEqual('START', start.flow_task_type)
+            self.assertEqual(STATUS.NEW, task.status)
+            self.assertEqual('HUMAN', task.flow_task_type)
+            self.assertEqual([start], list(task.previous.all()))
+
+            process.refresh_from_db()
+            self.assertEqual(STATUS.NEW, process.status)
+            self.assertEqual(1, process.active_task_count)
+
+    def test_activations_collected_without_gc(self):
+        gc.collect()
+        gc.set_debug(gc.DEBUG_SAVEALL)
+        try:
+            BulkTestFlow.start.run()
+            task = Task.objects.get(flow_task=BulkTestFlow.task)
+            task.activate().cancel.can_proceed()
+            del task
+            gc.collect()
+            self.assertEqual([], [obj for obj in gc.garbage if isinstance(obj, Activation)])
+        finally:
+            gc.set_debug(0)
+            del gc.garbage[:]
+
+    def test_start_many_signal_per_chunk(self):
+        received = []
+
+        def handler(sender, processes, tasks, **kwargs):
+            received.append((sender, len(processes), len(tasks)))
+
+        signals.flow_started_bulk.connect(handler)
+        try:
+            BulkTestFlow.start_many(BulkTestFlow.start, [{}, {}, {}], chunk_size=2)
+        finally:
+            signals.flow_started_bulk.disconnect(handler)
+
+        self.assertEqual([(BulkTestFlow, 2, 2), (BulkTestFlow, 1, 1)], received)
+
+    def test_start_many_activates_executable_nodes(self):
+        processes = BulkFuncTestFlow.start_many(BulkFuncTestFlow.start, [{}, {}])
+
+        for process in processes:
+            process.refresh_from_db()
+            self.assertEqual(STATUS.DONE, process.status)
+            self.assertEqual(0, process.active_task_count)
+
+    def test_start_many_bulk_inserts(self):
+        bulk_create = QuerySet.bulk_create
+
+        def bulk_create_returning_ids(queryset, objs, batch_size=None):
+            # emulate backends with `can_return_ids_from_bulk_insert`
+            objs = bulk_create(queryset, objs, batch_size=batch_size)
+            pks = queryset.model._base_manager.order_by('-pk').values_list('pk', flat=True)[:len(objs)]
+            for obj, pk in zip(objs, reversed(list(pks))):
+                obj.pk = pk
+            return objs
+
+        with mock.patch('viewflow.bulk._can_bulk_create', lambda model: not model._meta.parents), \
+                mock.patch.object(QuerySet, 'bulk_create', bulk_create_returning_ids), \
+                mock.patch('viewflow.models.AbstractTask.save') as task_save:
+            processes = BulkTestFlow.start_many(BulkTestFlow.start, [{}, {}, {}])
+        self.assertFalse(task_save.called)
+
+        for process in processes:
+            start = Task.objects.get(process=process, flow_task=BulkTestFlow.start)
+            task = Task.objects.get(process=process, flow_task=BulkTestFlow.task)
+            self.assertEqual([start], list(task.previous.all()))
+            process.refresh_from_db()
+            self.assertEqual(1, process.active_task_count)
+
+    def test_start_many_custom_activation_started_one_by_one(self):
+        received = []
+
+        def handler(sender, process, **kwargs):
+            received.append(process.pk)
+
+        signals.flow_started.connect(handler, sender=CustomStartTestFlow)
+        try:
+            processes = CustomStartTestFlow.start_many(CustomStartTestFlow.start, [{}, {}])
+        finally:
+            signals.flow_started.disconnect(handler, sender=CustomStartTestFlow)
+
+        self.assertEqual([process.pk for process in processes], received)
+        for process in processes:
+            self.assertEqual('custom', Task.objects.get(process=process, flow_task=CustomStartTestFlow.start).comments)
+            self.assertTrue(Task.objects.filter(process=process, flow_task=CustomStartTestFlow.task).exists())
+
+    def test_start_many_custom_next_activation_started_one_by_one(self):
+        processes = CustomNextTestFlow.start_many(CustomNextTestFlow.start, [{}, {}])
+
+        for process in processes:
+            self.assertEqual('custom', Task.objects.get(process=process, flow_task=CustomNextTestFlow.task).comments)
+
+    def test_start_many_requires_start_node(self):
+        with self.assertRaises(FlowRuntimeError):
+            BulkTestFlow.start_many(BulkTestFlow.task, [{}])
+
+
+class TestTaskActions(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', is_superuser=True)
+        self.user = User.objects.create(username='user')
+        for _ in range(3):
+            BulkTestFlow.start.run()
+        self.tasks = Task.objects.filter(flow_task=BulkTestFlow.task)
+
+    def test_assign_many(self):
+        with self.assertNumQueries(3 + 3 + 2 * 5):
+            # task list, tasks and update, processes, plus transaction, lock and update savepoints
+            results = self.tasks.bulk_assign(self.admin)
+
+        self.assertEqual(dict.fromkeys(self.tasks.values_list('pk', flat=True)), results)
+        self.assertEqual(3, self.tasks.filter(owner=self.admin, status=STATUS.ASSIGNED).count())
+
+    def test_locks_acquired_in_process_order(self):
+        locked = []
+
+        def lock_impl(flow):
+            def lock(flow_class, process_pk):
+                locked.append(process_pk)
+                return no_lock(flow)(flow_class, process_pk)
+            return lock
+
+        with mock.patch.object(BulkTestFlow, 'lock_impl', lock_impl):
+            self.tasks.order_by('-pk').bulk_assign(self.admin)
+
+        self.assertEqual(sorted(self.tasks.values_list('process_id', flat=True)), locked)
+
+    def test_transition_checked(self):
+        task = self.tasks.first()
+        task.activate().assign(self.admin)
+
+        results = self.tasks.bulk_unassign(self.admin)
+        self.assertIsNone(results[task.pk])
+        self.assertEqual(2, len([message for message in results.values() if message is not None]))
+        self.assertEqual(3, self.tasks.filter(status=STATUS.NEW, owner__isnull=True).count())
+
+    def test_permission_checked(self):
+        results = self.tasks.bulk_cancel(self.user)
+
+        self.assertEqual(['Permission denied'] * 3, list(results.values()))
+        self.assertFalse(self.tasks.filter(status=STATUS.CANCELED).exists())
+
+    def test_cancel_many(self):
+        self.tasks.bulk_cancel(self.admin)
+
+        self.assertEqual(3, self.tasks.filter(status=STATUS.CANCELED).count())
+        for process in Process.objects.filter(flow_class=BulkTestFlow):
+            self.assertEqual(0, process.active_task_count)
+
+    def test_custom_save_not_batched(self):
+        saved, original_save = set(), Task.save
+
+        def save(task, *args, **kwargs):
+            saved.add(task.pk)
+            return original_save(task, *args, **kwargs)
+
+        with mock.patch.object(Task, 'save', save):
+            self.tasks.bulk_assign(self.admin)
+
+        self.assertEqual(set(self.tasks.values_list('pk', flat=True)), saved)
+        self.assertEqual(3, self.tasks.filter(owner=self.admin, status=STATUS.ASSIGNED).count())
+
+    def test_task_error_reported(self):
+        failed = self.tasks.order_by('pk')[1]
+
+        original_save = Task.save
+
+        def save(task, *args, **kwargs):
+            if task.pk == failed.pk:
+                raise ValueError('Cancel failed')
+            return original_save(task, *args, **kwargs)
+
+        with mock.patch.object(Task, 'save', save):
+            results = self.tasks.bulk_cancel(self.admin)
+
+        self.assertEqual('Cancel failed', results.pop(failed.pk))
+        self.assertEqual([None, None], list(results.values()))
+        self.assertEqual(2, self.tasks.filter(status=STATUS.CANCELED).count())
+
+    def test_lock_failure_reported(self):
+        def lock_impl(flow):
+            def lock(flow_class, process_pk):
+                raise FlowLockFailed('Lock failed')
+            return lock
+
+        with mock.patch.object(BulkTestFlow, 'lock_impl', lock_impl):
+            results = perform_task_actions(self.tasks, 'assign', self.admin, chunk_size=2)
+
+        self.assertEqual(['Lock failed'] * 3, list(results.values()))
+
+    def test_lock_conflict_retried(self):
+        with mock.patch.object(BulkTestFlow, 'lock_impl', conflicting_lock_impl(conflicts=1)):
+            results = perform_task_actions(self.tasks, 'assign', self.admin)
+
+        self.assertEqual(dict.fromkeys(self.tasks.values_list('pk', flat=True)), results)
+        self.assertEqual(3, self.tasks.filter(status=STATUS.ASSIGNED).count())
+
+
+class TestCancelProcesses(TestCase):
+    def setUp(self):
+        self.processes = [CancelTestFlow.start.run().process for _ in range(3)]
+
+    def test_plan_loaded_by_two_queries(self):
+        with self.assertNumQueries(2):
+            plan = CancelPlan(CancelTestFlow, [process.pk for process in self.processes])
+
+        self.assertEqual(6, len(plan.tasks))  # two views per process
+        self.assertEqual([], plan.uncancelable)
+        self.assertEqual({'cancel'}, set(plan.actions.values()))
+
+    def test_cancel_many(self):
+        results = Process.objects.filter(flow_class=CancelTestFlow).bulk_cancel(chunk_size=2)
+
+        self.assertEqual(dict.fromkeys(process.pk for process in self.processes), results)
+        for process in self.processes:
+            process.refresh_from_db()
+            self.assertEqual(STATUS.CANCELED, process.status)
+            self.assertIsNotNone(process.finished)
+            self.assertEqual(0, process.active_task_count)
+            self.assertFalse(process.task_set.filter(finished__isnull=True).exists())
+            self.assertEqual(2, process.task_set.filter(status=STATUS.CANCELED).count())
+
+    def test_process_version_incremented(self):
+        versions = {process.pk: process.version for process in Process.objects.filter(flow_class=CancelTestFlow)}
+
+        CancelPlan(CancelTestFlow, list(versions)).apply()
+
+        for process in Process.objects.filter(flow_class=CancelTestFlow):
+            self.assertEqual(versions[process.pk] + 1, process.version)
+
+    def test_custom_process_save_called(self):
+        saved, original_save = [], Process.save
+
+        def save(process, *args, **kwargs):
+            saved.append(process.status)
+            return original_save(process, *args, **kwargs)
+
+        with mock.patch.object(Process, 'save', save):
+            CancelPlan(CancelTestFlow, [process.pk for process in self.processes]).apply()
+
+        self.assertEqual([STATUS.CANCELED] * 3, saved)
+        self.assertEqual(3, Process.objects.filter(status=STATUS.CANCELED).count())
+
+    def test_uncancelable_process_untouched(self):
+        user = User.objects.create(username='admin', is_superuser=True)
+        task = Task.objects.get(process=self.processes[0], flow_task=CancelTestFlow.first)
+        task.activate().assign(user)
+
+        results = Process.objects.filter(flow_class=CancelTestFlow).bulk_cancel()
+
+        self.assertEqual("Can't cancel {}".format(task), results[self.processes[0].pk])
+        self.assertIsNone(results[self.processes[1].pk])
+        self.processes[0].refresh_from_db()
+        self.assertEqual(STATUS.NEW, self.processes[0].status)
+        self.assertFalse(Task.objects.filter(process=self.processes[0], status=STATUS.CANCELED).exists())
+
+    def test_undo_before_cancel(self):
+        process = BulkFuncTestFlow.start.run().process
+        task = Task.objects.create(
+            process=process, flow_task=BulkFuncTestFlow.task, status=STATUS.ERROR, finished=now())
+
+        plan = CancelPlan(BulkFuncTestFlow, [process.pk])
+        self.assertEqual({task.pk: 'undo'}, plan.actions)
+
+        plan.apply()
+        task.refresh_from_db()
+        self.assertEqual(STATUS.CANCELED, task.status)
+
+    def test_finished_process_reported(self):
+        process = BulkFuncTestFlow.start.run().process
+
+        results = Process.objects.filter(pk=process.pk).bulk_cancel()
+        self.assertEqual({process.pk: "Process in 'DONE' status can't be canceled"}, results)
+
+    def test_lock_conflict_retried(self):
+        with mock.patch.object(CancelTestFlow, 'lock_impl', conflicting_lock_impl(conflicts=1)):
+            results = Process.objects.filter(flow_class=CancelTestFlow).bulk_cancel()
+
+        self.assertEqual(dict.fromkeys(process.pk for process in self.processes), results)
+        self.assertEqual(3, Process.objects.filter(status=STATUS.CANCELED).count())
+
+    def test_process_error_reported(self):
+        failed = self.processes[1]
+
+        original_cancel_plain = CancelPlan._cancel_plain
+
+        def cancel_plain(plan, tasks, finished):
+            if failed.pk in [task.process_id for task in tasks]:
+                raise ValueError('Cancel failed')
+            return original_cancel_plain(plan, tasks, finished)
+
+        with mock.patch.object(CancelPlan, '_cancel_plain', cancel_plain):
+            results = Process.objects.filter(flow_class=CancelTestFlow).bulk_cancel()
+
+        self.assertEqual('Cancel failed', results.pop(failed.pk))
+        self.assertEqual([None, None], list(results.values()))
+        self.assertEqual(2, Process.objects.filter(status=STATUS.CANCELED).count())
+        failed.refresh_from_db()
+        self.assertEqual(STATUS.NEW, failed.status)
+
+    def test_command(self):
+        stdout = StringIO()
+        call_command('cancel_processes', flow='tests/test_flow_bulk.CancelTestFlow', stdout=stdout)
+
+        self.assertEqual('3 processes canceled\n', stdout.getvalue())
+        self.assertEqual(3, Process.objects.filter(status=STATUS.CANCELED).count())
+
+
+def conflicting_lock_impl(conflicts):
+    """
+    Lock that fails with the optimistic lock conflict `conflicts` times
+    """
+    def lock_impl(flow):
+        def lock(flow_class, process_pk):
+            if len(raised) < conflicts:
+                raised.append(process_pk)
+                raise FlowLockConflict('Concurrent modification')
+            return no_lock(flow)(flow_class, process_pk)
+        lock.retries = conflicts
+        return lock
+    raised = []
+    return lock_impl
+
+
+class BulkTestFlow(Flow):
+    start = flow.StartFunction().Next(this.task)
+    task = flow.View(lambda request: None).Next(this.end)
+    end = flow.End()
+
+
+class BulkFuncTestFlow(Flow):
+    start = flow.StartFunction().Next(this.task)
+    task = flow.Handler(lambda activation: None).Next(this.end)
+    end = flow.End()
+
+
+class CustomStartActivation(StartActivation):
+    @Activation.status.super()
+    def done(self):
+        self.task.comments = 'custom'
+        super(CustomStartActivation, self).done.original()
+
+
+class CustomStartTestFlow(Flow):
+    start = flow.StartFunction(activation_class=CustomStartActivation).Next(this.task)
+    task = flow.View(lambda request: None).Next(this.end)
+    end = flow.End()
+
+
+class CustomNextActivation(ViewActivation):
+    @classmethod
+    def activate(cls, flow_task, prev_activation, token):
+        activation = super(CustomNextActivation, cls).activate(flow_task, prev_activation, token)
+        activation.task.comments = 'custom'
+        activation.task.save()
+        return activation
+
+
+class CustomNextTestFlow(Flow):
+    start = flow.StartFunction().Next(this.task)
+    task = flow.View(lambda request: None, activation_class=CustomNextActivation).Next(this.end)
+    end = flow.End()
+
+
+class CancelTestFlow(Flow):
+    start = flow.StartFunction().Next(this.split)
+    split = flow.Split().Next(this.first).Next(this.second)
+    first = flow.View(lambda request: None).Next(this.join)
+    second = flow.View(lambda request: None).Next(this.join)
+    join = flow.Join().Next(this.end)
+    end = flow.End()
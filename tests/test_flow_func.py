@@ -7,6 +7,7 @@ from viewflow.base import this
 from viewflow.compat import mock
 from viewflow.activation import FuncActivation
 from viewflow.nodes.handler import HandlerActivation
+from viewflow.token import Token
 
 
 class Test(TestCase):
@@ -170,6 +171,7 @@ class Test(TestCase):
 
 class ProcessStub(object):
     _default_manager = mock.Mock()
+    active_task_count = None
 
     def __init__(self, flow_class=None):
         self.flow_class = flow_class
@@ -190,6 +192,7 @@ class TaskStub(object):
         self.process_id = 1
         self.pk = 1
         self.status = STATUS.NEW
+        self.token = Token('start')
         self.started = None
 
     @property
@@ -6,6 +6,7 @@ from viewflow.activation import STATUS
 from viewflow.flow import If, Switch
 from viewflow.nodes.ifgate import IfActivation
 from viewflow.nodes.switch import SwitchActivation
+from viewflow.token import Token
 
 
 class Test(TestCase):
@@ -69,6 +70,7 @@ class Test(TestCase):
 
 class ProcessStub(object):
     _default_manager = mock.Mock()
+    active_task_count = None
 
     def __init__(self, flow_class=None):
         self.flow_class = flow_class
@@ -88,7 +90,7 @@ class TaskStub(object):
         self.process_id = 1
         self.pk = 1
         self.status = STATUS.NEW
-        self.token = token
+        self.token = Token(token)
         self.started = None
 
     @property
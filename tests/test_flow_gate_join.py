@@ -1,6 +1,9 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from viewflow import flow
+from viewflow.activation import STATUS
 from viewflow.base import this, Flow
 
 
@@ -28,6 +31,61 @@ class Test(TestCase):
         self.assertEqual(6, tasks.count())
         self.assertTrue(all(task.finished is not None for task in tasks))
 
+    def test_join_counters(self):
+        act = WideJoinTestFlow.start.run()
+        WideJoinTestFlow.task1.run(act.process.get_task(WideJoinTestFlow.task1))
+
+        join_task = act.process.get_task(WideJoinTestFlow.join, status=[STATUS.STARTED])
+        self.assertEqual(3, join_task.join_expected)
+        self.assertEqual(1, join_task.join_arrived)
+
+        WideJoinTestFlow.task2.run(act.process.get_task(WideJoinTestFlow.task2))
+
+        join_task.refresh_from_db()
+        self.assertEqual(STATUS.STARTED, join_task.status)
+        self.assertEqual(2, join_task.join_arrived)
+
+        # no branch prefix scans on regular arrival
+        task3 = act.process.get_task(WideJoinTestFlow.task3)
+        with CaptureQueriesContext(connection) as queries:
+            WideJoinTestFlow.task3.run(task3)
+        self.assertFalse(any('LIKE' in query['sql'] for query in queries.captured_queries))
+
+        join_task.refresh_from_db()
+        self.assertEqual(STATUS.DONE, join_task.status)
+        self.assertEqual(3, join_task.join_arrived)
+
+    def test_join_counters_canceled_branch(self):
+        act = WideJoinTestFlow.start.run()
+        WideJoinTestFlow.task1.run(act.process.get_task(WideJoinTestFlow.task1))
+
+        # cancel second branch after join started
+        act.process.get_task(WideJoinTestFlow.task2).activate().cancel()
+        join_task = act.process.get_task(WideJoinTestFlow.join, status=[STATUS.STARTED])
+        self.assertIsNone(join_task.join_arrived)
+
+        WideJoinTestFlow.task3.run(act.process.get_task(WideJoinTestFlow.task3))
+
+        join_task.refresh_from_db()
+        self.assertEqual(STATUS.DONE, join_task.status)
+        self.assertEqual(2, join_task.join_expected)
+
+    def test_join_legacy_task_recount(self):
+        act = WideJoinTestFlow.start.run()
+        WideJoinTestFlow.task1.run(act.process.get_task(WideJoinTestFlow.task1))
+        WideJoinTestFlow.task2.run(act.process.get_task(WideJoinTestFlow.task2))
+
+        # join started before counters were introduced
+        join_task = act.process.get_task(WideJoinTestFlow.join, status=[STATUS.STARTED])
+        WideJoinTestFlow.task_class.objects.filter(pk=join_task.pk).update(join_expected=None, join_arrived=None)
+
+        WideJoinTestFlow.task3.run(act.process.get_task(WideJoinTestFlow.task3))
+
+        join_task.refresh_from_db()
+        self.assertEqual(STATUS.DONE, join_task.status)
+        self.assertEqual(3, join_task.join_expected)
+        self.assertEqual(3, join_task.join_arrived)
+
 
 @flow.flow_func
 def func(activation, task):
@@ -42,3 +100,13 @@ class JoinTestFlow(Flow):
     task2 = flow.Function(func, task_loader=lambda flow_task, task: task).Next(this.join)
     join = flow.Join().Next(this.end)
     end = flow.End()
+
+
+class WideJoinTestFlow(Flow):
+    start = flow.StartFunction().Next(this.split)
+    split = flow.Split().Next(this.task1).Next(this.task2).Next(this.task3)
+    task1 = flow.Function(func, task_loader=lambda flow_task, task: task).Next(this.join)
+    task2 = flow.Function(func, task_loader=lambda flow_task, task: task).Next(this.join)
+    task3 = flow.Function(func, task_loader=lambda flow_task, task: task).Next(this.join)
+    join = flow.Join().Next(this.end)
+    end = flow.End()
@@ -1,11 +1,12 @@
 from django.test import TestCase
 
-from viewflow import flow
+from viewflow import flow, signals
 from viewflow.activation import context, Context, STATUS
 from viewflow.fields import get_task_ref
 from viewflow.activation import AbstractJobActivation
 from viewflow.base import this, Flow
 from viewflow.flow import AbstractJob
+from viewflow.models import Task
 
 
 class Test(TestCase):
@@ -41,6 +42,88 @@ class Test(TestCase):
         self.assertIn('Expected test error', job_task.comments)
 
 
+class TestOptimistic(TestCase):
+    def setUp(self):
+        OptimisticJobTestFlow.job._average_duration = None
+        self.locks = []
+        signals.lock_stats.connect(self.on_lock, sender=OptimisticJobTestFlow)
+
+    def tearDown(self):
+        signals.lock_stats.disconnect(self.on_lock, sender=OptimisticJobTestFlow)
+
+    def on_lock(self, sender, outcome, **kwargs):
+        self.locks.append(outcome)
+
+    def run_job(self, throw_error=False):
+        act = OptimisticJobTestFlow.start.run()
+        task = act.process.get_task(OptimisticJobTestFlow.job, status=[STATUS.SCHEDULED])
+        self.locks = []
+
+        with Context(throw_test_error=throw_error):
+            job_handler(get_task_ref(OptimisticJobTestFlow.job), act.process.pk, task.pk)
+        return act.process, task
+
+    def test_short_job_single_lock(self):
+        process, task = self.run_job()
+
+        task.refresh_from_db()
+        self.assertEqual(STATUS.DONE, task.status)
+        self.assertIsNotNone(task.started)
+        self.assertIsNotNone(task.finished)
+        self.assertEqual(['released'], self.locks)
+        self.assertEqual(STATUS.DONE, OptimisticJobTestFlow.process_class.objects.get(pk=process.pk).status)
+
+    def test_short_job_error(self):
+        with self.assertRaises(ValueError):
+            self.run_job(throw_error=True)
+
+        job_task = Task.objects.get(flow_task=OptimisticJobTestFlow.job, status=STATUS.ERROR)
+        self.assertIn('Expected test error', job_task.comments)
+        self.assertEqual(['released'], self.locks)
+
+    def test_long_job_locked_twice(self):
+        OptimisticJobTestFlow.job.observe_duration(5)
+        self.assertFalse(OptimisticJobTestFlow.job.use_optimistic())
+
+        _, task = self.run_job()
+
+        task.refresh_from_db()
+        self.assertEqual(STATUS.DONE, task.status)
+        self.assertEqual(['released', 'released'], self.locks)
+
+    def test_canceled_during_execution(self):
+        act = OptimisticJobTestFlow.start.run()
+        task = act.process.get_task(OptimisticJobTestFlow.job, status=[STATUS.SCHEDULED])
+
+        @flow.flow_job
+        def cancel_handler(activation):
+            Task.objects.filter(pk=activation.task.pk).update(status=STATUS.CANCELED)
+
+        cancel_handler(get_task_ref(OptimisticJobTestFlow.job), act.process.pk, task.pk)
+
+        task.refresh_from_db()
+        self.assertEqual(STATUS.CANCELED, task.status)
+        self.assertFalse(Task.objects.filter(flow_task=OptimisticJobTestFlow.end).exists())
+
+
+    def test_duplicate_delivery_skipped(self):
+        act = OptimisticJobTestFlow.start.run()
+        task = act.process.get_task(OptimisticJobTestFlow.job, status=[STATUS.SCHEDULED])
+        executions = []
+
+        @flow.flow_job
+        def redelivered_handler(activation):
+            executions.append(Task.objects.get(pk=activation.task.pk).status)
+            if len(executions) == 1:
+                # the same message delivered to another worker during the execution
+                redelivered_handler(get_task_ref(OptimisticJobTestFlow.job), act.process.pk, task.pk)
+
+        redelivered_handler(get_task_ref(OptimisticJobTestFlow.job), act.process.pk, task.pk)
+
+        self.assertEqual([STATUS.STARTED], executions)
+        task.refresh_from_db()
+        self.assertEqual(STATUS.DONE, task.status)
+
 @flow.flow_job
 def job_handler(activation):
     if context.throw_test_error:
@@ -56,3 +139,9 @@ class JobTestFlow(Flow):
     start = flow.StartFunction().Next(this.job)
     job = AbstractJob(job_handler, activation_class=JobActivation).Next(this.end)
     end = flow.End()
+
+
+class OptimisticJobTestFlow(Flow):
+    start = flow.StartFunction().Next(this.job)
+    job = AbstractJob(job_handler, activation_class=JobActivation).Optimistic(1).Next(this.end)
+    end = flow.End()
@@ -3,12 +3,15 @@ from datetime import datetime
 
 from django.contrib.auth.models import User, Permission
 from django.contrib.contenttypes.models import ContentType
+from django.db import models
 from django.test import TestCase, RequestFactory
 
-from viewflow import flow
+from viewflow import flow, lock, signals
 from viewflow.base import Flow
 from viewflow.activation import STATUS
-from viewflow.decorators import flow_view
+from viewflow.compat import mock
+from viewflow.decorators import flow_view, retry_on_conflict
+from viewflow.exceptions import FlowLockConflict
 from viewflow.flow.activation import ManagedViewActivation
 from viewflow.models import Process, Task
 
@@ -29,6 +32,105 @@ class Test(TestCase):
         act = test_view(request, TaskTestFlow, TaskTestFlow.task, process.pk, task.pk)
         self.assertEqual(act.task.status, STATUS.DONE)
 
+    def test_flow_view_read_only_request(self):
+        process = Process.objects.create(flow_class=TaskTestFlow)
+        task = Task.objects.create(process=process, flow_task=TaskTestFlow.task, status=STATUS.ASSIGNED)
+        locks = []
+
+        @flow_view
+        def test_view(request):
+            request.activation.prepare()
+            return locks[:]
+
+        def on_lock(sender, outcome, **kwargs):
+            locks.append(outcome)
+
+        signals.lock_stats.connect(on_lock, sender=TaskTestFlow)
+        try:
+            result = test_view(RequestFactory().get(''), TaskTestFlow, TaskTestFlow.task, process.pk, task.pk)
+            self.assertEqual([], result)
+            self.assertEqual([], locks)
+
+            test_view(RequestFactory().post(''), TaskTestFlow, TaskTestFlow.task, process.pk, task.pk)
+            self.assertEqual(['released'], locks)
+        finally:
+            signals.lock_stats.disconnect(on_lock, sender=TaskTestFlow)
+
+    def test_flow_view_deferred_lock(self):
+        process = Process.objects.create(flow_class=TaskTestFlow)
+        task = Task.objects.create(process=process, flow_task=TaskTestFlow.task)
+        locks = []
+
+        @flow_view
+        def test_view(request):
+            locked_before = len(locks)
+            request.activation.assign()
+            return locked_before
+
+        def on_lock(sender, outcome, **kwargs):
+            locks.append(outcome)
+
+        signals.lock_stats.connect(on_lock, sender=TaskTestFlow)
+        try:
+            result = test_view(RequestFactory().get(''), TaskTestFlow, TaskTestFlow.task, process.pk, task.pk)
+            self.assertEqual(0, result)
+        finally:
+            signals.lock_stats.disconnect(on_lock, sender=TaskTestFlow)
+
+        self.assertEqual(['released'], locks)
+        self.assertEqual(STATUS.ASSIGNED, Task.objects.get(pk=task.pk).status)
+
+    def test_flow_view_deferred_lock_conflict(self):
+        process = Process.objects.create(flow_class=TaskTestFlow)
+        task = Task.objects.create(process=process, flow_task=TaskTestFlow.task)
+
+        @flow_view
+        def test_view(request):
+            # concurrent request
+            Task.objects.filter(pk=task.pk).update(status=STATUS.CANCELED)
+            request.activation.assign()
+
+        request = RequestFactory().get('')
+        self.assertRaises(FlowLockConflict, test_view, request, TaskTestFlow, TaskTestFlow.task, process.pk, task.pk)
+        self.assertEqual(STATUS.CANCELED, Task.objects.get(pk=task.pk).status)
+
+    def test_flow_view_deferred_lock_process_conflict(self):
+        process = Process.objects.create(flow_class=TaskTestFlow)
+        task = Task.objects.create(process=process, flow_task=TaskTestFlow.task)
+
+        @flow_view
+        def test_view(request):
+            # concurrent request, task status is kept
+            Process.objects.filter(pk=process.pk).update(status=STATUS.CANCELED)
+            request.activation.assign()
+
+        request = RequestFactory().get('')
+        self.assertRaises(FlowLockConflict, test_view, request, TaskTestFlow, TaskTestFlow.task, process.pk, task.pk)
+        self.assertEqual(STATUS.NEW, Task.objects.get(pk=task.pk).status)
+
+    def test_flow_view_post_not_retried(self):
+        process = Process.objects.create(flow_class=TaskTestFlow)
+        task = Task.objects.create(process=process, flow_task=TaskTestFlow.task)
+        calls = []
+
+        def test_view(request):
+            calls.append(request.method)
+            if len(calls) == 1:
+                # concurrent modification
+                Process.objects.filter(pk=process.pk).update(version=models.F('version') + 1)
+            request.activation.assign()
+
+        with mock.patch.object(TaskTestFlow, 'lock_impl', lock.optimistic_lock):
+            self.assertRaises(FlowLockConflict, flow_view(test_view),
+                              RequestFactory().post(''), TaskTestFlow, TaskTestFlow.task, process.pk, task.pk)
+            self.assertEqual(['POST'], calls)
+            self.assertEqual(STATUS.NEW, Task.objects.get(pk=task.pk).status)
+
+            flow_view(retry_on_conflict(test_view))(
+                RequestFactory().post(''), TaskTestFlow, TaskTestFlow.task, process.pk, task.pk)
+            self.assertEqual(['POST', 'POST'], calls)
+            self.assertEqual(STATUS.ASSIGNED, Task.objects.get(pk=task.pk).status)
+
     def test_managed_view_activation_prepare(self):
         process = Process.objects.create(flow_class=TaskTestFlow)
         task = Task.objects.create(process=process, flow_task=TaskTestFlow.task)
@@ -1,4 +1,6 @@
 import unittest
+import weakref
+
 from viewflow.fsm import State, TransitionNotAllowed
 
 
@@ -85,6 +87,37 @@ class Test(unittest.TestCase):
         self.assertEqual('initial', state_setter.real_state)
         self.assertTrue(state_setter.done.can_proceed())
 
+    def test_transition_table(self):
+        table = Child.state.get_table(Child)
+        self.assertIs(table, Child.state.get_table(Child))
+
+        descriptor, transitions = table.methods['start']
+        self.assertIs(Child.start, descriptor)
+        self.assertEqual('started', transitions['prepared'].target)
+        self.assertEqual([Child.done], [descriptor for descriptor, _ in table.available['started']])
+
+    def test_bound_method_without_reference_cycles(self):
+        child = Child()
+        child.prepare.can_proceed()
+        child.prepare()
+
+        ref = weakref.ref(child)
+        del child
+        self.assertIsNone(ref())
+
+        child = Child()
+        child.prepare()
+        child.start()
+        self.assertTrue(child.done.can_proceed())
+        self.assertTrue(super(Child, child).done.can_proceed())
+        self.assertFalse(super(Child, child).prepare.can_proceed())
+
+    def test_on_transition(self):
+        notified = Notified()
+        notified.prepare()
+        notified.start()
+        self.assertEqual([('initial', 'prepare'), ('prepared', 'start')], notified.notified)
+
 
 class Base(object):
     state = State(default='initial')
@@ -145,3 +178,22 @@ class StateSetter(object):
     @state.transition(source='initial', target='done')
     def done(self):
         pass
+
+
+class Notified(object):
+    state = State(default='initial')
+
+    def __init__(self):
+        self.notified = []
+
+    @state.on_transition()
+    def on_transition(self, name):
+        self.notified.append((self.state, name))
+
+    @state.transition(source='initial', target='prepared')
+    def prepare(self):
+        pass
+
+    @state.transition(source='prepared', target='started')
+    def start(self):
+        pass
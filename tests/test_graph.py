@@ -0,0 +1,79 @@
+from django.test import TestCase
+
+from viewflow import flow
+from viewflow.activation import STATUS
+from viewflow.base import Flow, this
+from viewflow.flow.views import DetailProcessView
+from viewflow.graph import ProcessGraph
+from viewflow.lock import no_lock
+from viewflow.models import Task
+
+
+class Test(TestCase):
+    def setUp(self):
+        self.process = GraphTestFlow.start.run().process
+        self.start = Task.objects.get(process=self.process, flow_task=GraphTestFlow.start)
+        self.split = Task.objects.get(process=self.process, flow_task=GraphTestFlow.split)
+        self.first = Task.objects.get(process=self.process, flow_task=GraphTestFlow.first)
+        self.second = Task.objects.get(process=self.process, flow_task=GraphTestFlow.second)
+
+    def test_graph_loaded_by_two_queries(self):
+        with self.assertNumQueries(2):
+            graph = ProcessGraph.get(GraphTestFlow, self.process.pk)
+
+        with self.assertNumQueries(0):
+            self.assertEqual([self.start, self.split, self.first, self.second], graph.tasks)
+            self.assertEqual([self.split], graph.previous(self.first))
+            self.assertEqual({self.first, self.second}, set(graph.leading(self.split)))
+            self.assertEqual([self.first, self.second], graph.active())
+            self.assertEqual([self.first, self.second], graph.by_status()[STATUS.NEW])
+            self.assertEqual(STATUS.DONE, graph.statuses()[self.start.pk])
+            self.assertEqual(3, len(graph.by_token()))
+            self.assertFalse(graph.all_leading_canceled(self.split))
+            self.assertEqual(self.process, graph.tasks[0].process)
+
+    def test_graph_cached_while_locked(self):
+        with no_lock(GraphTestFlow)(GraphTestFlow, self.process.pk):
+            graph = ProcessGraph.get(GraphTestFlow, self.process.pk)
+            with self.assertNumQueries(0):
+                self.assertIs(graph, ProcessGraph.get(GraphTestFlow, self.process.pk))
+
+            activation = self.first.activate()
+            activation.cancel()
+            self.assertIsNone(ProcessGraph.cached(GraphTestFlow, self.process.pk))
+
+            graph = ProcessGraph.get(GraphTestFlow, self.process.pk)
+            self.second.previous.add(self.start)
+            self.assertIsNone(ProcessGraph.cached(GraphTestFlow, self.process.pk))
+
+        self.assertIsNone(ProcessGraph.cached(GraphTestFlow, self.process.pk))
+        self.assertNotEqual(graph, ProcessGraph.get(GraphTestFlow, self.process.pk))
+
+    def test_leading_condition_uses_cached_graph(self):
+        activation = self.split.activate()
+
+        with no_lock(GraphTestFlow)(GraphTestFlow, self.process.pk):
+            ProcessGraph.get(GraphTestFlow, self.process.pk)
+            with self.assertNumQueries(0):
+                self.assertFalse(activation.undo.can_proceed())
+
+    def test_detail_view_task_list(self):
+        view = DetailProcessView(flow_class=GraphTestFlow, object=self.process)
+
+        with self.assertNumQueries(1):
+            tasks = list(view.get_context_data()['task_list'])
+        self.assertEqual([self.start, self.split, self.first, self.second], tasks)
+
+        with no_lock(GraphTestFlow)(GraphTestFlow, self.process.pk):
+            graph = ProcessGraph.get(GraphTestFlow, self.process.pk)
+            with self.assertNumQueries(0):
+                self.assertIs(graph.tasks, view.get_context_data()['task_list'])
+
+
+class GraphTestFlow(Flow):
+    start = flow.StartFunction().Next(this.split)
+    split = flow.Split().Next(this.first).Next(this.second)
+    first = flow.View(lambda request: None).Next(this.join)
+    second = flow.View(lambda request: None).Next(this.join)
+    join = flow.Join().Next(this.end)
+    end = flow.End()
@@ -0,0 +1,87 @@
+import unittest
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+
+from viewflow import flow
+from viewflow.activation import STATUS
+from viewflow.base import Flow, this
+from viewflow.indexes import TASK_INDEX_TOGETHER
+from viewflow.models import Process, Task
+
+
+@unittest.skipUnless(connection.vendor in ('sqlite', 'postgresql'),
+                     'EXPLAIN parsing implemented for sqlite and postgresql')
+class Test(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='test', is_superuser=True)
+        self.process = Process.objects.create(flow_class=IndexTestFlow)
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                return [row[-1] for row in cursor.fetchall()]
+            else:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql, params)
+                return [row[0] for row in cursor.fetchall()]
+
+    def index_names(self, fields, partial=None):
+        """
+        Names of the `TASK_INDEX_TOGETHER` index on the fields, and of the partial index
+        """
+        self.assertIn(fields, TASK_INDEX_TOGETHER)
+        table = Task._meta.db_table
+        columns = [Task._meta.get_field(field).column for field in fields]
+
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, table)
+        names = [name for name, constraint in constraints.items()
+                 if constraint['index'] and constraint['columns'] == columns]
+        self.assertTrue(names, 'No index on {}'.format(columns))
+        if partial is not None:
+            names.append('{}_{}_partial'.format(table, partial))
+        return names
+
+    def assertIndexUsed(self, queryset, fields, partial=None):
+        plan = self.explain(queryset)
+        task_steps = [step for step in plan if 'viewflow_task ' in step + ' ']
+        self.assertTrue(task_steps, plan)
+
+        names = self.index_names(fields, partial)
+        for step in task_steps:
+            if connection.vendor == 'sqlite':
+                used = any('USING INDEX {} '.format(name) in step + ' ' for name in names)
+            else:
+                used = any('using {} on viewflow_task'.format(name) in step for name in names)
+            self.assertTrue(used, 'None of {} used: {}'.format(names, plan))
+
+    def test_inbox_uses_index(self):
+        self.assertIndexUsed(Task.objects.inbox([IndexTestFlow], self.user), ('owner', 'status'), 'inbox')
+
+    def test_queue_uses_index(self):
+        self.assertIndexUsed(
+            Task.objects.queue([IndexTestFlow], self.user), ('flow_task_type', 'status', 'owner_permission'), 'queue')
+
+    def test_archive_uses_index(self):
+        self.assertIndexUsed(Task.objects.user_archive(self.user), ('owner', 'finished'))
+        self.assertIndexUsed(Task.objects.archive([IndexTestFlow], self.user), ('owner', 'finished'))
+
+    def test_join_lookup_uses_index(self):
+        self.assertIndexUsed(Task.objects.filter(
+            flow_task=IndexTestFlow.join,
+            process=self.process,
+            status=STATUS.STARTED), ('process', 'flow_task', 'status'))
+
+
+class IndexTestFlow(Flow):
+    start = flow.StartFunction().Next(this.split)
+    split = flow.Split().Next(this.task1).Next(this.task2)
+    task1 = flow.View(lambda request: None).Next(this.join)
+    task2 = flow.View(lambda request: None).Next(this.join)
+    join = flow.Join().Next(this.end)
+    end = flow.End()
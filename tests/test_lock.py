@@ -4,12 +4,15 @@ import threading
 import time
 import unittest
 
-from django.db import connection
-from django.test import skipUnlessDBFeature, TransactionTestCase
+from django.db import connection, models, OperationalError
+from django.test import skipUnlessDBFeature, TestCase, TransactionTestCase
 
 from viewflow import flow, lock
 from viewflow.base import Flow, this
-from viewflow.exceptions import FlowLockFailed
+from viewflow.compat import mock
+from viewflow.decorators import flow_func
+from viewflow.exceptions import FlowLockConflict, FlowLockFailed
+from viewflow.models import Process, Task
 
 
 @unittest.skipUnless('DATABASE_URL' in os.environ, 'Lock test requires specific database config')
@@ -81,6 +84,42 @@ class Test(TransactionTestCase):
         except queue.Empty:
             pass
 
+    def test_advisory_lock(self):
+        thread1 = threading.Thread(target=self.run_with_lock, args=[lock.advisory_lock(Test.TestFlow, timeout=1)])
+        thread2 = threading.Thread(target=self.run_with_lock, args=[lock.advisory_lock(Test.TestFlow, timeout=1)])
+
+        thread1.start()
+        thread2.start()
+
+        try:
+            self.exception_queue.get(True, 10)
+        except queue.Empty:
+            self.fail('No thread was blocked')
+        finally:
+            self.finished = True
+
+        thread1.join()
+        thread2.join()
+
+    def test_advisory_lock_waits_for_release(self):
+        thread1 = threading.Thread(
+            target=self.run_with_lock_and_release,
+            args=[lock.advisory_lock(Test.TestFlow, timeout=5)])
+        thread2 = threading.Thread(
+            target=self.run_with_lock_and_release,
+            args=[lock.advisory_lock(Test.TestFlow, timeout=5)])
+
+        thread1.start()
+        thread2.start()
+        thread1.join()
+        thread2.join()
+
+        try:
+            self.exception_queue.get(True, 1)
+            self.fail('Thread was blocked')
+        except queue.Empty:
+            pass
+
     def test_cache_lock(self):
         thread1 = threading.Thread(target=self.run_with_lock, args=[lock.cache_lock(Test.TestFlow, attempts=1)])
         thread2 = threading.Thread(target=self.run_with_lock, args=[lock.cache_lock(Test.TestFlow, attempts=1)])
@@ -97,3 +136,117 @@ class Test(TransactionTestCase):
 
         thread1.join()
         thread2.join()
+
+
+class TestAdvisoryLock(TransactionTestCase):
+    class TestFlow(Flow):
+        start = flow.Start().Next(this.end)
+        end = flow.End()
+
+    def test_lock_key(self):
+        key = lock.get_advisory_lock_key(TestAdvisoryLock.TestFlow, 2 ** 40 + 1)
+        self.assertEqual(key, lock.get_advisory_lock_key(TestAdvisoryLock.TestFlow, 2 ** 40 + 1))
+        self.assertTrue(all(-2 ** 31 <= part < 2 ** 31 for part in key))
+        self.assertEqual(1, key[1])
+
+    def test_lock_acquired(self):
+        process = TestAdvisoryLock.TestFlow.process_class.objects.create(flow_class=TestAdvisoryLock.TestFlow)
+        lock_impl = lock.advisory_lock(TestAdvisoryLock.TestFlow)
+
+        with lock_impl(TestAdvisoryLock.TestFlow, process.pk):
+            self.assertTrue(connection.in_atomic_block)
+
+    def test_mysql_lock_released_after_commit(self):
+        process = TestAdvisoryLock.TestFlow.process_class.objects.create(flow_class=TestAdvisoryLock.TestFlow)
+        lock_impl = lock.advisory_lock(TestAdvisoryLock.TestFlow)
+        statements = []
+
+        cursor = mock.MagicMock()
+        cursor.__enter__.return_value = cursor
+        cursor.execute.side_effect = lambda sql, params=None: '_LOCK' in sql and statements.append(sql.split('(')[0])
+        cursor.fetchone.return_value = (1,)
+        commit = connection.commit
+
+        def record_commit():
+            statements.append('COMMIT')
+            commit()
+
+        with mock.patch.object(connection, 'vendor', 'mysql'), \
+                mock.patch.object(connection, 'cursor', return_value=cursor), \
+                mock.patch.object(connection, 'commit', record_commit):
+            with lock_impl(TestAdvisoryLock.TestFlow, process.pk):
+                self.assertEqual(['SELECT GET_LOCK'], statements)
+
+        self.assertEqual(['SELECT GET_LOCK', 'COMMIT', 'SELECT RELEASE_LOCK'], statements)
+
+
+class TestOptimisticLock(TestCase):
+    def setUp(self):
+        OptimisticTestFlow.start.run()
+        self.task = Task.objects.get(flow_task=OptimisticTestFlow.task)
+        self.process = self.task.process
+        self.process.refresh_from_db()
+
+    def test_version_incremented(self):
+        lock_impl = lock.optimistic_lock(OptimisticTestFlow)
+        version = self.process.version
+
+        with lock_impl(OptimisticTestFlow, self.process.pk):
+            pass
+
+        self.process.refresh_from_db()
+        self.assertEqual(version + 1, self.process.version)
+
+    def test_conflict_rolls_back(self):
+        lock_impl = lock.optimistic_lock(OptimisticTestFlow)
+
+        with self.assertRaises(FlowLockConflict):
+            with lock_impl(OptimisticTestFlow, self.process.pk):
+                Task.objects.filter(pk=self.task.pk).update(comments='changed')
+                Process.objects.filter(pk=self.process.pk).update(version=models.F('version') + 1)
+
+        self.assertIsNone(Task.objects.get(pk=self.task.pk).comments)
+
+    def test_database_error_not_converted(self):
+        lock_impl = lock.optimistic_lock(OptimisticTestFlow)
+
+        with self.assertRaises(OperationalError):
+            with lock_impl(OptimisticTestFlow, self.process.pk):
+                raise OperationalError('deadlock detected')
+
+    def test_process_save_keeps_version(self):
+        Process.objects.filter(pk=self.process.pk).update(version=10)
+        self.process.save()
+
+        self.process.refresh_from_db()
+        self.assertEqual(10, self.process.version)
+
+    def test_flow_func_retried_on_conflict(self):
+        calls = []
+
+        @flow_func
+        def touch(activation):
+            calls.append(activation.process.pk)
+            if len(calls) == 1:
+                # concurrent modification
+                Process.objects.filter(pk=activation.process.pk).update(version=models.F('version') + 1)
+
+        touch(self.task)
+        self.assertEqual(2, len(calls))
+
+    def test_flow_func_retries_limited(self):
+        @flow_func
+        def touch(activation):
+            Process.objects.filter(pk=activation.process.pk).update(version=models.F('version') + 1)
+
+        lock_impl = lambda flow: lock.optimistic_lock(flow, retries=1)  # NOQA
+        with mock.patch.object(OptimisticTestFlow, 'lock_impl', lock_impl):
+            self.assertRaises(FlowLockConflict, touch, self.task)
+
+
+class OptimisticTestFlow(Flow):
+    lock_impl = lock.optimistic_lock
+
+    start = flow.StartFunction().Next(this.task)
+    task = flow.View(lambda request: None).Next(this.end)
+    end = flow.End()
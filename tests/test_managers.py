@@ -1,9 +1,11 @@
 import sqlparse
 
+from django.contrib.auth.models import Permission, User
 from django.db import models
 from django.test import TestCase
 from viewflow import flow, managers
-from viewflow.base import Flow
+from viewflow.activation import STATUS
+from viewflow.base import Flow, this
 from viewflow.models import Process, Task
 
 
@@ -15,7 +17,10 @@ class Test(TestCase):
 
         self.assertEqual(str(queryset.query).strip(),
                          'SELECT "viewflow_process"."id", "viewflow_process"."flow_class", "viewflow_process"."status",'
-                         ' "viewflow_process"."created", "viewflow_process"."finished" FROM "viewflow_process"'
+                         ' "viewflow_process"."created", "viewflow_process"."finished",'
+                         ' "viewflow_process"."creator_id", "viewflow_process"."active_task_count",'
+                         ' "viewflow_process"."version",'
+                         ' "viewflow_process"."rendered_summary" FROM "viewflow_process"'
                          ' WHERE "viewflow_process"."flow_class" = tests/test_managers.ChildFlow')
 
     def test_process_queryset_cource_for_query(self):
@@ -28,10 +33,15 @@ class Test(TestCase):
             '       "viewflow_process"."status",\n'
             '       "viewflow_process"."created",\n'
             '       "viewflow_process"."finished",\n'
+            '       "viewflow_process"."creator_id",\n'
+            '       "viewflow_process"."active_task_count",\n'
+            '       "viewflow_process"."version",\n'
+            '       "viewflow_process"."rendered_summary",\n'
             '       "tests_childprocess"."process_ptr_id",\n'
             '       "tests_childprocess"."comment"\n'
             'FROM "viewflow_process"\n'
-            'LEFT OUTER JOIN "tests_childprocess" ON ("viewflow_process"."id" = "tests_childprocess"."process_ptr_id")\n'
+            'LEFT OUTER JOIN "tests_childprocess"'
+            ' ON ("viewflow_process"."id" = "tests_childprocess"."process_ptr_id")\n'
             'WHERE "viewflow_process"."flow_class" IN (tests/test_managers.ChildFlow)')
 
     def test_process_queryset_coerce_classes(self):
@@ -43,6 +53,23 @@ class Test(TestCase):
             queryset = managers.ProcessQuerySet(model=Process).coerce_for([GrandChildFlow, ChildFlow, Flow])
             self.assertEqual(set(queryset), set([process1, process2, process3]))
 
+    def test_process_queryset_coerce_classes_batched(self):
+        process1 = Process.objects.create(flow_class=Flow)
+        process2 = ChildProcess.objects.create(flow_class=ChildFlow)
+        process3 = GrandChildProcess.objects.create(flow_class=GrandChildFlow)
+
+        queryset = managers.ProcessQuerySet(model=Process).coerce_for([GrandChildFlow, ChildFlow, Flow], batched=True)
+        self.assertEqual(queryset.query.select_related, False)
+
+        with self.assertNumQueries(3):
+            processes = list(queryset.order_by('pk'))
+        self.assertEqual(processes, [process1, process2, process3])
+        self.assertEqual([type(process) for process in processes], [Process, ChildProcess, GrandChildProcess])
+
+    def test_related_path_cached(self):
+        self.assertEqual(managers._get_related_path(GrandChildProcess, Process), 'childprocess__grandchildprocess')
+        self.assertEqual(managers._related_path_cache[(GrandChildProcess, Process)], 'childprocess__grandchildprocess')
+
     def test_process_queryset_cource_values_list(self):
         process = ChildProcess.objects.create(flow_class=ChildFlow)
 
@@ -55,9 +82,11 @@ class Test(TestCase):
         self.assertEqual(str(queryset.query).strip(),
                          'SELECT "viewflow_task"."id", "viewflow_task"."flow_task", "viewflow_task"."flow_task_type",'
                          ' "viewflow_task"."status", "viewflow_task"."created", "viewflow_task"."started",'
-                         ' "viewflow_task"."finished", "viewflow_task"."token", "viewflow_task"."process_id",'
-                         ' "viewflow_task"."owner_id", "viewflow_task"."external_task_id",'
-                         ' "viewflow_task"."owner_permission", "viewflow_task"."comments" FROM "viewflow_task"'
+                         ' "viewflow_task"."finished", "viewflow_task"."token", "viewflow_task"."join_expected",'
+                         ' "viewflow_task"."join_arrived", "viewflow_task"."rendered_summary",'
+                         ' "viewflow_task"."process_id", "viewflow_task"."owner_id",'
+                         ' "viewflow_task"."external_task_id", "viewflow_task"."owner_permission",'
+                         ' "viewflow_task"."comments" FROM "viewflow_task"'
                          ' WHERE "viewflow_task"."flow_task" = tests/test_managers.ChildFlow.start')
 
     def test_task_queryset_cource_for_query(self):
@@ -75,10 +104,13 @@ class Test(TestCase):
                          ' "viewflow_task"."owner_id", "viewflow_task"."external_task_id",'
                          ' "viewflow_task"."owner_permission", "viewflow_task"."comments", "viewflow_process"."id",'
                          ' "viewflow_process"."flow_class", "viewflow_process"."status", "viewflow_process"."created",'
-                         ' "viewflow_process"."finished", "tests_childtask"."task_ptr_id", "tests_childtask"."due_date"'
+                         ' "viewflow_process"."finished", "viewflow_process"."creator_id",'
+                         ' "viewflow_process"."active_task_count", "viewflow_process"."version",'
+                         ' "tests_childtask"."task_ptr_id", "tests_childtask"."due_date"'
                          ' FROM "viewflow_task"'
                          ' INNER JOIN "viewflow_process" ON ( "viewflow_task"."process_id" = "viewflow_process"."id" )'
-                         ' LEFT OUTER JOIN "tests_childtask" ON ( "viewflow_task"."id" = "tests_childtask"."task_ptr_id" )'
+                         ' LEFT OUTER JOIN "tests_childtask"'
+                         ' ON ( "viewflow_task"."id" = "tests_childtask"."task_ptr_id" )'
                          ' WHERE "viewflow_process"."flow_class" IN (tests/test_managers.ChildFlow)')
         """
 
@@ -93,6 +125,55 @@ class Test(TestCase):
             queryset = managers.TaskQuerySet(model=Task).coerce_for([GrandChildFlow, ChildFlow])
             self.assertEqual(set(queryset), set([task1, task2]))
 
+    def test_task_queryset_coerce_classes_batched(self):
+        process1 = ChildProcess.objects.create(flow_class=ChildFlow)
+        process2 = GrandChildProcess.objects.create(flow_class=GrandChildFlow)
+
+        task1 = ChildTask.objects.create(process=process1, flow_task=ChildFlow.start)
+        task2 = Task.objects.create(process=process2, flow_task=GrandChildFlow.start)
+
+        queryset = managers.TaskQuerySet(model=Task).coerce_for([GrandChildFlow, ChildFlow], batched=True)
+        self.assertEqual(queryset.query.select_related, {'process': {}})
+
+        with self.assertNumQueries(2):
+            tasks = list(queryset.order_by('pk'))
+            self.assertEqual(tasks, [task1, task2])
+            self.assertEqual([type(task) for task in tasks], [ChildTask, Task])
+            self.assertEqual([task.process.pk for task in tasks], [process1.pk, process2.pk])
+
+    def test_task_queryset_coerce_batched_keeps_query_settings(self):
+        process = ChildProcess.objects.create(flow_class=ChildFlow, creator=User.objects.create(username='creator'))
+        task = ChildTask.objects.create(process=process, flow_task=ChildFlow.start, comments='child comments')
+
+        queryset = managers.TaskQuerySet(model=Task).coerce_for([ChildFlow], batched=True) \
+            .select_related('process__creator') \
+            .annotate(process_version=models.F('process__version')) \
+            .extra(select={'one': '1'}) \
+            .defer('comments')
+
+        with self.assertNumQueries(2):
+            [coerced] = list(queryset)
+            self.assertEqual((ChildTask, task.pk), (type(coerced), coerced.pk))
+            self.assertEqual('creator', coerced.process.creator.username)
+            self.assertEqual(process.version, coerced.process_version)
+            self.assertEqual(1, coerced.one)
+        self.assertIn('comments', coerced.get_deferred_fields())
+        self.assertEqual('child comments', coerced.comments)
+
+    def test_filter_available_batched(self):
+        user = User.objects.create(username='admin', is_superuser=True)
+        process = ChildProcess.objects.create(flow_class=ChildFlow)
+        task = ChildTask.objects.create(process=process, flow_task=ChildFlow.start)
+
+        queryset = Task.objects.filter_available([ChildFlow], user)
+        self.assertEqual(queryset.query.select_related, {'process': {}})
+        self.assertEqual([task], list(queryset))
+        self.assertEqual([ChildTask], [type(task) for task in queryset])
+
+        queryset = Process.objects.filter_available([ChildFlow], user)
+        self.assertEqual(queryset.query.select_related, False)
+        self.assertEqual([ChildProcess], [type(process) for process in queryset])
+
     def test_task_queryset_cource_values_list(self):
         process = ChildProcess.objects.create(flow_class=ChildFlow)
         task = ChildTask.objects.create(process=process, flow_task=ChildFlow.start)
@@ -101,6 +182,57 @@ class Test(TestCase):
         self.assertEqual([(task.pk,)], list(queryset))
 
 
+class TestClaim(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='claimer', is_superuser=True)
+        self.tasks = []
+        for _ in range(3):
+            ClaimTestFlow.start.run()
+            self.tasks.append(Task.objects.filter(flow_task=ClaimTestFlow.task).latest('pk'))
+
+    def test_claim_oldest_tasks(self):
+        claimed = Task.objects.claim_next(self.user, [ClaimTestFlow], n=2)
+        self.assertEqual([task.pk for task in self.tasks[:2]], [task.pk for task in claimed])
+
+        for task in claimed:
+            task.refresh_from_db()
+            self.assertEqual(STATUS.ASSIGNED, task.status)
+            self.assertEqual(self.user, task.owner)
+
+        claimed = Task.objects.claim_next(self.user, [ClaimTestFlow], n=2)
+        self.assertEqual([self.tasks[2].pk], [task.pk for task in claimed])
+        self.assertEqual([], Task.objects.claim_next(self.user, [ClaimTestFlow]))
+
+    def test_claim_respects_user_queue(self):
+        user = User.objects.create(username='operator')
+        user.user_permissions.add(Permission.objects.get(codename='view_process'))
+        Task.objects.filter(pk=self.tasks[0].pk).update(owner_permission='auth.missing_permission')
+
+        claimed = Task.objects.claim_next(user, [ClaimTestFlow], n=3)
+        self.assertEqual([task.pk for task in self.tasks[1:]], [task.pk for task in claimed])
+        self.assertEqual(STATUS.NEW, Task.objects.get(pk=self.tasks[0].pk).status)
+
+    def test_claim_resets_rendered_summary(self):
+        Task.objects.filter(pk__in=[task.pk for task in self.tasks]).update(rendered_summary='New task')
+
+        claimed = Task.objects.claim_next(self.user, [ClaimTestFlow], n=3)
+        self.assertEqual(3, len(claimed))
+        self.assertEqual(
+            [None] * 3, list(Task.objects.filter(pk__in=[task.pk for task in claimed]).values_list(
+                'rendered_summary', flat=True)))
+
+    def test_claim_increments_process_version(self):
+        versions = dict(Process.objects.values_list('pk', 'version'))
+
+        claimed = Task.objects.claim_next(self.user, [ClaimTestFlow], n=2)
+        self.assertEqual(
+            {task.process_id: versions[task.process_id] + 1 for task in claimed},
+            dict(Process.objects.filter(pk__in=[task.process_id for task in claimed]).values_list('pk', 'version')))
+        self.assertEqual(
+            versions[self.tasks[2].process_id],
+            Process.objects.get(pk=self.tasks[2].process_id).version)
+
+
 class ChildProcess(Process):
     comment = models.CharField(max_length=50)
 
@@ -124,3 +256,9 @@ class GrandChildFlow(Flow):
     process_class = GrandChildProcess
 
     start = flow.Start(lambda request: None)
+
+
+class ClaimTestFlow(Flow):
+    start = flow.StartFunction().Next(this.task)
+    task = flow.View(lambda request: None).Next(this.end)
+    end = flow.End()
@@ -0,0 +1,90 @@
+from django.test import RequestFactory, TestCase
+
+from viewflow import flow, lock, signals
+from viewflow.base import Flow, this
+from viewflow.metrics import LockMetrics
+
+
+class Test(TestCase):
+    def setUp(self):
+        self.reports = []
+        signals.lock_stats.connect(self.receiver)
+
+    def tearDown(self):
+        signals.lock_stats.disconnect(self.receiver)
+
+    def receiver(self, sender, **kwargs):
+        self.reports.append(kwargs)
+
+    def test_lock_reports_stats(self):
+        lock_impl = lock.no_lock(MetricsTestFlow)
+        with lock_impl(MetricsTestFlow, 1):
+            pass
+
+        self.assertEqual(1, len(self.reports))
+        report = self.reports[0]
+        self.assertEqual('test_metrics/metricstest', report['flow_label'])
+        self.assertEqual(1, report['process_pk'])
+        self.assertEqual(1, report['attempts'])
+        self.assertEqual('released', report['outcome'])
+        self.assertTrue(report['wait_time'] >= 0)
+        self.assertTrue(report['hold_time'] >= 0)
+
+    def test_lock_reports_error(self):
+        lock_impl = lock.no_lock(MetricsTestFlow)
+        with self.assertRaises(ValueError):
+            with lock_impl(MetricsTestFlow, 1):
+                raise ValueError()
+
+        self.assertEqual(['error'], [report['outcome'] for report in self.reports])
+
+    def test_flow_start_reports_stats(self):
+        MetricsTestFlow.start.run()
+        self.assertEqual(['released'], [report['outcome'] for report in self.reports])
+
+
+class TestLockMetrics(TestCase):
+    def test_exposition(self):
+        metrics = LockMetrics(buckets=(0.1, 1))
+        metrics.connect()
+        try:
+            lock_impl = lock.no_lock(MetricsTestFlow)
+            with lock_impl(MetricsTestFlow, 1):
+                pass
+            signals.lock_stats.send(
+                sender=MetricsTestFlow, flow_label='test_metrics/metricstest', process_pk=2,
+                wait_time=0.5, attempts=3, hold_time=0, outcome='failed')
+        finally:
+            metrics.disconnect()
+
+        self.assertEqual([(('test_metrics/metricstest', 2), 0.5)], metrics.hot_processes()[:1])
+
+        response = metrics.view(RequestFactory().get('/metrics/'))
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+        lines = response.content.decode('utf-8').splitlines()
+        self.assertIn('# TYPE viewflow_lock_wait_seconds histogram', lines)
+        self.assertIn(
+            'viewflow_lock_wait_seconds_bucket{flow="test_metrics/metricstest",le="0.1",outcome="released"} 1', lines)
+        self.assertIn(
+            'viewflow_lock_wait_seconds_bucket{flow="test_metrics/metricstest",le="1",outcome="failed"} 1', lines)
+        self.assertIn('viewflow_lock_wait_seconds_count{flow="test_metrics/metricstest",outcome="failed"} 1', lines)
+        self.assertIn('viewflow_lock_hold_seconds_count{flow="test_metrics/metricstest",outcome="released"} 1', lines)
+        self.assertIn('viewflow_lock_attempts_total{flow="test_metrics/metricstest",outcome="failed"} 3', lines)
+        self.assertIn('# TYPE viewflow_lock_process_wait_seconds gauge', lines)
+        self.assertIn('viewflow_lock_process_wait_seconds{flow="test_metrics/metricstest",process="2"} 0.5', lines)
+
+    def test_process_wait_bounded(self):
+        metrics = LockMetrics(top_processes=2, tracked_processes=3)
+        for process_pk in [1, 2, 3, 1, 4]:
+            metrics.receiver(flow_label='test', process_pk=process_pk, wait_time=1.0,
+                             attempts=1, hold_time=0, outcome='released')
+
+        self.assertEqual([('test', 3), ('test', 1), ('test', 4)], list(metrics.process_wait))
+        self.assertEqual([(('test', 1), 2.0)], metrics.hot_processes()[:1])
+
+
+class MetricsTestFlow(Flow):
+    start = flow.StartFunction().Next(this.end)
+    end = flow.End()
@@ -1,9 +1,13 @@
 from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import six
 from django.utils.timezone import now
 
 from viewflow import flow
-from viewflow.base import Flow
+from viewflow.activation import STATUS
+from viewflow.base import Flow, this
+from viewflow import models
 from viewflow.models import Process, Task
 
 
@@ -46,3 +50,160 @@ class GrandChildFlow(Flow):
     process_class = TestModelsGrandChildProcess
 
     start = flow.Start(lambda rewquest: None)
+
+
+class TestDenormalizedState(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='Test')
+
+    def start_process(self):
+        act = DenormalizedTestFlow.start.activation_class()
+        act.initialize(DenormalizedTestFlow.start, None)
+        act.prepare(user=self.user)
+        act.done()
+        act.lock.__exit__(None, None, None)
+        return Process.objects.get(pk=act.process.pk)
+
+    def complete(self, task):
+        act = task.activate()
+        act.assign(self.user)
+        act.prepare(user=self.user)
+        act.done()
+
+    def assertActiveCountValid(self, process):
+        process.refresh_from_db()
+        self.assertEqual(process.active_task_count, process.active_tasks().count())
+
+    def test_created_by_denormalized(self):
+        process = self.start_process()
+        self.assertEqual(process.creator, self.user)
+
+        process = Process.objects.select_related('creator').get(pk=process.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(process.created_by, self.user)
+
+    def test_active_task_count_maintained(self):
+        process = self.start_process()
+        self.assertEqual(process.active_task_count, 2)
+
+        self.complete(process.get_task(DenormalizedTestFlow.task1))
+        self.assertActiveCountValid(process)
+
+        self.complete(process.get_task(DenormalizedTestFlow.task2))
+        self.assertActiveCountValid(process)
+        self.assertEqual(process.active_task_count, 0)
+        self.assertEqual(process.status, STATUS.DONE)
+
+    def test_process_save_keeps_active_task_count(self):
+        process = self.start_process()
+        stale = Process.objects.get(pk=process.pk)
+
+        self.complete(process.get_task(DenormalizedTestFlow.task1))
+        stale.save()
+        self.assertActiveCountValid(stale)
+
+    def test_process_save_inserts_missing_row(self):
+        process = self.start_process()
+        Process.objects.filter(pk=process.pk).update(version=5)
+        stale = Process.objects.get(pk=process.pk)
+        Task.objects.filter(process=process).delete()
+        Process.objects.filter(pk=process.pk).delete()
+
+        stale.status = STATUS.CANCELED
+        stale.save()
+
+        process = Process.objects.get(pk=process.pk)
+        self.assertEqual((STATUS.CANCELED, 5, 2), (process.status, process.version, process.active_task_count))
+
+    def test_child_process_save(self):
+        process = TestModelsChildProcess.objects.create(flow_class=GrandChildFlow)
+        Process.objects.filter(pk=process.pk).update(active_task_count=3, version=7)
+
+        process.status = STATUS.DONE
+        process.save()
+
+        process = TestModelsChildProcess.objects.get(pk=process.pk)
+        self.assertEqual((STATUS.DONE, 7, 3), (process.status, process.version, process.active_task_count))
+
+    def test_deferred_finished_not_loaded(self):
+        process = self.start_process()
+
+        with self.assertNumQueries(1):
+            tasks = list(Task.objects.filter(process=process).only('pk', 'status'))
+        self.assertEqual(Task.objects.filter(process=process).count(), len(tasks))
+
+        for task in Task.objects.filter(process=process, finished__isnull=True).defer('finished'):
+            task.finished = now()
+            task.save()
+        self.assertActiveCountValid(process)
+        self.assertEqual(0, process.active_task_count)
+
+    def test_rebuild_command(self):
+        process = self.start_process()
+        Process.objects.filter(pk=process.pk).update(active_task_count=None, creator=None)
+
+        call_command('rebuild_process_counters', stdout=six.StringIO())
+
+        process.refresh_from_db()
+        self.assertEqual(process.active_task_count, 2)
+        self.assertEqual(process.creator, self.user)
+
+
+class DenormalizedTestFlow(Flow):
+    start = flow.Start(lambda request: None).Next(this.split)
+    split = flow.Split().Next(this.task1).Next(this.task2)
+    task1 = flow.View(lambda request: None).Next(this.join)
+    task2 = flow.View(lambda request: None).Next(this.join)
+    join = flow.Join().Next(this.end)
+    end = flow.End()
+
+
+class TestSummary(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='Test')
+
+    def start_process(self):
+        act = SummaryTestFlow.start.activation_class()
+        act.initialize(SummaryTestFlow.start, None)
+        act.prepare(user=self.user)
+        act.done()
+        act.lock.__exit__(None, None, None)
+        return Process.objects.get(pk=act.process.pk)
+
+    def test_template_compiled_once(self):
+        source = SummaryTestFlow.summary_template
+        self.assertIs(models.get_summary_template(source), models.get_summary_template(source))
+
+    def test_summary_materialized(self):
+        process = self.start_process()
+        task = Task.objects.get(process=process, flow_task=SummaryTestFlow.start)
+
+        self.assertEqual(process.rendered_summary, 'Summary test - NEW')
+        self.assertEqual(task.rendered_summary, 'Started by Test')
+        self.assertEqual(task.summary(), 'Started by Test')
+
+        process.status = STATUS.DONE
+        self.assertEqual(process.summary(), 'Summary test - NEW')
+        process.save()
+        self.assertEqual(process.summary(), 'Summary test - DONE')
+
+    def test_summary_rendered_if_not_materialized(self):
+        process = self.start_process()
+        Process.objects.filter(pk=process.pk).update(rendered_summary=None, status=STATUS.CANCELED)
+
+        process.refresh_from_db()
+        self.assertEqual(process.summary(), 'Summary test - CANCELED')
+
+    def test_summary_not_materialized_by_default(self):
+        process = Process.objects.create(flow_class=DenormalizedTestFlow)
+        self.assertIsNone(process.rendered_summary)
+        self.assertEqual(process.summary(), 'Denormalized Test - NEW')
+
+
+class SummaryTestFlow(Flow):
+    process_title = 'Summary test'
+    materialize_summary = True
+
+    start = flow.Start(lambda request: None, task_result_summary='Started by {{ task.owner }}').Next(this.task)
+    task = flow.View(lambda request: None).Next(this.end)
+    end = flow.End()
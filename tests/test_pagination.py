@@ -0,0 +1,63 @@
+from django.test import TestCase
+from django.utils.timezone import now
+
+from viewflow.base import Flow
+from viewflow.flow.views.pagination import (
+    InvalidCursor, count_capped, decode_cursor, encode_cursor, paginate_keyset
+)
+from viewflow.models import Process
+
+
+class Test(TestCase):
+    def setUp(self):
+        for _ in range(7):
+            Process.objects.create(flow_class=Flow)
+        # rows with the same creation time are ordered by pk
+        Process.objects.filter(pk__in=Process.objects.order_by('pk').values_list('pk', flat=True)[2:5]) \
+            .update(created=now())
+        self.expected = list(Process.objects.order_by('-created', '-pk'))
+
+    def test_cursor_roundtrip(self):
+        process = self.expected[0]
+        self.assertEqual(('n', process.created, process.pk),
+                         decode_cursor(encode_cursor('n', process.created, process.pk)))
+
+        for cursor in ['', 'garbage', encode_cursor('x', process.created, process.pk)]:
+            self.assertRaises(InvalidCursor, decode_cursor, cursor)
+
+    def test_pages_forward_and_back(self):
+        queryset = Process.objects.all()
+        pages, cursor = [], None
+        while True:
+            page = paginate_keyset(queryset, cursor, per_page=3)
+            pages.append(page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+
+        self.assertEqual(self.expected, [process for page in pages for process in page])
+        self.assertEqual([3, 3, 1], [len(page) for page in pages])
+        self.assertFalse(pages[0].has_previous())
+        self.assertIsNone(pages[-1].next_cursor)
+
+        previous = paginate_keyset(queryset, pages[-1].previous_cursor, per_page=3)
+        self.assertEqual(pages[1].object_list, previous.object_list)
+        self.assertTrue(previous.has_next())
+        self.assertTrue(previous.has_previous())
+
+        first = paginate_keyset(queryset, previous.previous_cursor, per_page=3)
+        self.assertEqual(pages[0].object_list, first.object_list)
+        self.assertFalse(first.has_previous())
+
+    def test_page_queries(self):
+        with self.assertNumQueries(1):
+            page = paginate_keyset(Process.objects.all(), None, per_page=3)
+        with self.assertNumQueries(2):
+            page = paginate_keyset(Process.objects.all(), page.next_cursor, per_page=3, count=True)
+        self.assertEqual(7, page.count)
+        self.assertTrue(page.count_exact)
+
+    def test_count_capped(self):
+        self.assertEqual((7, True), count_capped(Process.objects.all(), None))
+        self.assertEqual((7, True), count_capped(Process.objects.all(), 7))
+        self.assertEqual((5, False), count_capped(Process.objects.all(), 5))
@@ -0,0 +1,104 @@
+import functools
+import inspect
+
+from django.test import TestCase, TransactionTestCase
+
+from viewflow import flow, scheduler, signals
+from viewflow.activation import STATUS
+from viewflow.base import Flow, this
+from viewflow.compat import mock
+from viewflow.exceptions import FlowRuntimeError
+from viewflow.models import Task
+
+
+class Test(TestCase):
+    def test_loop_runs_on_constant_stack_depth(self):
+        act = SchedulerTestFlow.start.run()
+
+        act.process.refresh_from_db()
+        self.assertEqual(STATUS.DONE, act.process.status)
+        self.assertEqual(SchedulerTestFlow.iterations, len(SchedulerTestFlow.instance.stack_depth))
+        self.assertEqual(1, len(set(SchedulerTestFlow.instance.stack_depth)))
+
+    def test_recursive_activation_stack_grows(self):
+        with mock.patch.object(SchedulerTestFlow, 'scheduler_impl', None), \
+                mock.patch.object(SchedulerTestFlow, 'iterations', 5):
+            SchedulerTestFlow.start.run()
+
+        stack_depth = SchedulerTestFlow.instance.stack_depth
+        self.assertTrue(stack_depth[0] < stack_depth[-1])
+
+    def test_steps_limit_exceeded(self):
+        scheduler_impl = functools.partial(scheduler.Scheduler, max_steps=5)
+        with mock.patch.object(SchedulerTestFlow, 'scheduler_impl', scheduler_impl):
+            self.assertRaises(FlowRuntimeError, SchedulerTestFlow.start.run)
+
+    def test_activate_returns_activation(self):
+        act = SchedulerTestFlow.start.run()
+        step = SchedulerTestFlow.step.activate(act, act.task.token)
+        self.assertIsNotNone(step)
+        self.assertEqual(SchedulerTestFlow.step, step.task.flow_task)
+
+
+class TestContinuation(TransactionTestCase):
+    def test_rest_of_queue_continued(self):
+        continuations = []
+        scheduler_impl = functools.partial(scheduler.Scheduler, max_steps=5, continuation=continuations.append)
+
+        with mock.patch.object(SchedulerTestFlow, 'scheduler_impl', scheduler_impl):
+            act = SchedulerTestFlow.start.run()
+
+            self.assertEqual(1, len(continuations))
+            self.assertEqual(3, Task.objects.filter(process=act.process, flow_task=SchedulerTestFlow.step).count())
+
+            while continuations:
+                scheduler.resume(continuations.pop())
+
+        act.process.refresh_from_db()
+        self.assertEqual(STATUS.DONE, act.process.status)
+        self.assertEqual(SchedulerTestFlow.iterations,
+                         Task.objects.filter(process=act.process, flow_task=SchedulerTestFlow.step).count())
+
+    def test_resume_locks_each_process(self):
+        continuations, locked = [], []
+        scheduler_impl = functools.partial(scheduler.Scheduler, max_steps=5, continuation=continuations.append)
+
+        def on_lock(sender, process_pk, outcome, **kwargs):
+            locked.append(process_pk)
+
+        with mock.patch.object(SchedulerTestFlow, 'scheduler_impl', scheduler_impl):
+            processes = [SchedulerTestFlow.start.run().process for _ in range(2)]
+            self.assertEqual(2, len(continuations))
+
+            signals.lock_stats.connect(on_lock, sender=SchedulerTestFlow)
+            try:
+                scheduler.resume(continuations.pop() + continuations.pop())
+            finally:
+                signals.lock_stats.disconnect(on_lock, sender=SchedulerTestFlow)
+
+        self.assertEqual({process.pk for process in processes}, set(locked))
+        self.assertEqual(2, len(locked))
+
+
+class SchedulerTestFlow(Flow):
+    iterations = 50
+    scheduler_impl = scheduler.Scheduler
+
+    start = flow.StartFunction().Next(this.step)
+    step = flow.Handler(this.step_handler).Next(this.check)
+    check = flow.If(lambda activation: activation.flow_class.instance.is_incomplete(activation)) \
+        .Then(this.step).Else(this.end)
+    end = flow.End()
+
+    def __init__(self):
+        self.stack_depth = []
+
+    def step_handler(self, activation):
+        if activation.task.previous.filter(flow_task=SchedulerTestFlow.start).exists():
+            self.stack_depth = []
+        self.stack_depth.append(len(inspect.stack(0)))
+
+    def is_incomplete(self, activation):
+        return Task.objects.filter(
+            process=activation.process,
+            flow_task=SchedulerTestFlow.step).count() < self.iterations
@@ -0,0 +1,65 @@
+from django.conf.urls import include, url
+from django.test import TestCase, RequestFactory, override_settings
+
+from viewflow import flow
+from viewflow.base import Flow, this
+from viewflow.models import Process, Task
+from viewflow.serializers import TaskSerializer
+
+
+@override_settings(ROOT_URLCONF='tests.test_serializers')
+class Test(TestCase):
+    def setUp(self):
+        for _ in range(3):
+            SerializerTestFlow.start.run()
+
+    def serialize(self):
+        tasks = Task.objects.filter(flow_task=SerializerTestFlow.task).order_by('pk')
+        return TaskSerializer(tasks, many=True, request=RequestFactory().get('/')).data
+
+    def test_task_list_queries(self):
+        with self.assertNumQueries(2):
+            self.serialize()
+
+        for _ in range(3):
+            SerializerTestFlow.start.run()
+        with self.assertNumQueries(2):
+            self.assertEqual(6, len(self.serialize()))
+
+    def test_task_list_data(self):
+        tasks = Task.objects.filter(flow_task=SerializerTestFlow.task).order_by('pk')
+        request = RequestFactory().get('/')
+
+        self.assertEqual(
+            [TaskSerializer(task, request=request).data for task in tasks.all()],
+            self.serialize())
+
+        task = tasks[0]
+        self.assertEqual(
+            'http://testserver/rest/{}/task/{}/assign/'.format(task.process_id, task.pk),
+            self.serialize()[0]['links']['assign'])
+        self.assertIsInstance(task.flow_process, SerializerTestProcess)
+
+
+class SerializerTestProcess(Process):
+    pass
+
+
+class SerializerTestFlow(Flow):
+    process_class = SerializerTestProcess
+
+    start = flow.StartFunction().Next(this.task)
+    task = flow.View(lambda request: None).Next(this.end)
+    end = flow.End()
+
+
+def view(request, **kwargs):
+    pass
+
+
+urlpatterns = [
+    url(r'^rest/', include([
+        url(r'^(?P<process_pk>\d+)/task/(?P<task_pk>\d+)/$', view, name='task'),
+        url(r'^(?P<process_pk>\d+)/task/(?P<task_pk>\d+)/assign/$', view, name='task__assign'),
+    ], namespace='rest_viewflow_app_tests'))
+]
@@ -0,0 +1,108 @@
+from django.db import transaction
+from django.test import TransactionTestCase
+
+from viewflow import flow, signals
+from viewflow.base import Flow, this
+from viewflow.compat import mock
+
+
+class Test(TransactionTestCase):
+    def setUp(self):
+        self.received = []
+        signals.task_started.connect(self.receiver)
+        signals.task_finished.connect(self.receiver)
+        signals.flow_finished.connect(self.receiver)
+
+    def tearDown(self):
+        signals.task_started.disconnect(self.receiver)
+        signals.task_finished.disconnect(self.receiver)
+        signals.flow_finished.disconnect(self.receiver)
+
+    def receiver(self, sender, process, task, signal, **kwargs):
+        self.received.append((process.pk, task.flow_task.name, signal))
+
+    def test_signals_sent_after_commit(self):
+        dispatcher = signals.OnCommitDispatcher()
+        with mock.patch.object(SignalsTestFlow, 'signal_dispatcher', dispatcher):
+            with transaction.atomic():
+                act = SignalsTestFlow.start.run()
+                self.assertEqual([], self.received)
+
+        pk = act.process.pk
+        self.assertEqual([
+            (pk, 'start', signals.task_started),
+            (pk, 'start', signals.task_finished),
+            (pk, 'task', signals.task_started),
+            (pk, 'task', signals.task_finished),
+            (pk, 'end', signals.task_started),
+            (pk, 'end', signals.task_finished),
+            (pk, 'end', signals.flow_finished)], self.received)
+
+    def test_signals_discarded_on_rollback(self):
+        dispatcher = signals.OnCommitDispatcher()
+        with mock.patch.object(SignalsTestFlow, 'signal_dispatcher', dispatcher):
+            try:
+                with transaction.atomic():
+                    SignalsTestFlow.start.run()
+                    raise ValueError()
+            except ValueError:
+                pass
+
+        self.assertEqual([], self.received)
+
+    def test_thread_pool_preserves_process_order(self):
+        dispatcher = signals.OnCommitDispatcher(max_workers=2)
+        with mock.patch.object(SignalsTestFlow, 'signal_dispatcher', dispatcher):
+            processes = [SignalsTestFlow.start.run().process for _ in range(4)]
+        dispatcher.shutdown()
+
+        self.assertEqual(7 * len(processes), len(self.received))
+        for process in processes:
+            received = [(name, signal) for pk, name, signal in self.received if pk == process.pk]
+            self.assertEqual((u'start', signals.task_started), received[0])
+            self.assertEqual((u'end', signals.flow_finished), received[-1])
+
+    def test_thread_pool_receivers_get_copies(self):
+        instances = []
+
+        def receiver(sender, process, task, **kwargs):
+            instances.append((process, task))
+
+        dispatcher = signals.OnCommitDispatcher(max_workers=2)
+        signals.flow_finished.connect(receiver)
+        try:
+            with mock.patch.object(SignalsTestFlow, 'signal_dispatcher', dispatcher), \
+                    mock.patch('viewflow.signals.close_old_connections') as close_old_connections:
+                act = SignalsTestFlow.start.run()
+                dispatcher.shutdown()
+        finally:
+            signals.flow_finished.disconnect(receiver)
+
+        [(process, task)] = instances
+        self.assertEqual(act.process.pk, process.pk)
+        self.assertIsNot(act.process, process)
+        self.assertIsNot(act.process._state, process._state)
+        self.assertTrue(close_old_connections.called)
+
+    def test_thread_pool_receiver_error_logged(self):
+        def receiver(sender, **kwargs):
+            raise ValueError('Receiver failed')
+
+        dispatcher = signals.OnCommitDispatcher(max_workers=2)
+        signals.flow_finished.connect(receiver)
+        try:
+            with mock.patch.object(SignalsTestFlow, 'signal_dispatcher', dispatcher), \
+                    mock.patch.object(signals.logger, 'exception') as log_exception:
+                SignalsTestFlow.start.run()
+                dispatcher.shutdown()
+        finally:
+            signals.flow_finished.disconnect(receiver)
+
+        self.assertEqual(1, log_exception.call_count)
+        self.assertEqual(7, len(self.received))
+
+
+class SignalsTestFlow(Flow):
+    start = flow.StartFunction().Next(this.task)
+    task = flow.Handler(lambda activation: None).Next(this.end)
+    end = flow.End()
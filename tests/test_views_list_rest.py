@@ -0,0 +1,217 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from viewflow import flow
+from viewflow.activation import STATUS
+from viewflow.base import Flow, this
+from viewflow.compat import mock
+from viewflow.fields import get_task_ref
+from viewflow.flow.views import list_rest
+from viewflow.flow.views.list import TaskFilter, get_flow_task_choices
+from viewflow.models import Process, Task
+
+
+class Test(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='claimer', is_superuser=True)
+        for _ in range(3):
+            ClaimRestTestFlow.start.run()
+
+    def claim(self, data):
+        request = RequestFactory().post('/', data)
+        request.user = self.user
+        view = list_rest.AllQueueClaimRestView.as_view(ns_map={'claimresttest': ClaimRestTestFlow})
+
+        with mock.patch.object(Task, 'get_url', return_value=None):
+            return view(request)
+
+    def test_claim_tasks(self):
+        response = self.claim({'n': 2})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(2, len(response.data))
+        self.assertEqual(2, Task.objects.filter(owner=self.user, status=STATUS.ASSIGNED).count())
+
+    def test_claim_count_validated(self):
+        response = self.claim({'n': 'all'})
+
+        self.assertEqual(400, response.status_code)
+        self.assertFalse(Task.objects.filter(owner=self.user).exists())
+
+
+class TestTaskAction(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='admin', is_superuser=True)
+        for _ in range(2):
+            ClaimRestTestFlow.start.run()
+        self.tasks = Task.objects.filter(flow_task=ClaimRestTestFlow.task)
+
+    def perform(self, data):
+        request = RequestFactory().post('/', data, content_type='application/json')
+        request.user = self.user
+        view = list_rest.AllTaskActionRestView.as_view(ns_map={'claimresttest': ClaimRestTestFlow})
+        return view(request)
+
+    def test_assign_tasks(self):
+        task_pks = list(self.tasks.values_list('pk', flat=True))
+        response = self.perform(json.dumps({'action': 'assign', 'tasks': task_pks + [0]}))
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            [{'task': pk, 'result': 'ok', 'message': None} for pk in task_pks] +
+            [{'task': 0, 'result': 'error', 'message': 'Task not found'}],
+            response.data)
+        self.assertEqual(2, self.tasks.filter(owner=self.user, status=STATUS.ASSIGNED).count())
+
+    def test_action_validated(self):
+        response = self.perform(json.dumps({'action': 'delete', 'tasks': [1]}))
+        self.assertEqual(400, response.status_code)
+
+
+class TestProcessCancel(TestCase):
+    def setUp(self):
+        self.processes = [ClaimRestTestFlow.start.run().process for _ in range(2)]
+
+    def cancel(self, user, process_pks):
+        request = RequestFactory().post(
+            '/', json.dumps({'processes': process_pks}), content_type='application/json')
+        request.user = user
+        view = list_rest.AllProcessCancelRestView.as_view(ns_map={'claimresttest': ClaimRestTestFlow})
+        return view(request)
+
+    def test_cancel_processes(self):
+        user = User.objects.create(username='admin', is_superuser=True)
+        response = self.cancel(user, [process.pk for process in self.processes])
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(['ok', 'ok'], [result['result'] for result in response.data])
+        self.assertEqual(2, Process.objects.filter(status=STATUS.CANCELED).count())
+
+    def test_manage_permission_required(self):
+        user = User.objects.create(username='user')
+        response = self.cancel(user, [self.processes[0].pk])
+
+        self.assertEqual('Process not found', response.data[0]['message'])
+        self.assertFalse(Process.objects.filter(status=STATUS.CANCELED).exists())
+
+
+class TestKeysetPagination(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='admin', is_superuser=True)
+        for _ in range(5):
+            ClaimRestTestFlow.start.run()
+
+    def get_queue(self, paginate_keyset=True, **params):
+        request = RequestFactory().get('/', params)
+        request.user = self.user
+        view = list_rest.AllQueueListRestView.as_view(
+            ns_map={'claimresttest': ClaimRestTestFlow}, paginate_by=3, paginate_count=True,
+            paginate_keyset=paginate_keyset, stream_chunk_size=2)
+
+        with mock.patch.object(Task, 'get_url', return_value=None):
+            response = view(request)
+        if response.streaming:
+            with mock.patch.object(Task, 'get_url', return_value=None):
+                return json.loads(b''.join(response.streaming_content).decode('utf-8'))
+        return response
+
+    def test_pages(self):
+        self.assertEqual(5, len(self.get_queue(paginate_keyset=False).data))
+
+        first = self.get_queue().data
+        self.assertEqual(3, len(first['results']))
+        self.assertEqual(5, first['count'])
+        self.assertIsNone(first['previous'])
+
+        second = self.get_queue(cursor=first['next']).data
+        self.assertEqual(2, len(second['results']))
+        self.assertIsNone(second['next'])
+
+        self.assertEqual(
+            list(Task.objects.filter(flow_task=ClaimRestTestFlow.task).order_by('-created', '-pk')
+                 .values_list('pk', flat=True)),
+            [task['id'] for task in first['results'] + second['results']])
+        self.assertEqual(first['results'], self.get_queue(cursor=second['previous']).data['results'])
+
+    def test_page_size(self):
+        self.assertEqual(4, len(self.get_queue(page_size=4).data['results']))
+        self.assertEqual(400, self.get_queue(page_size=1001).status_code)
+
+    def test_page_queries_constant(self):
+        with CaptureQueriesContext(connection) as small:
+            self.get_queue(page_size=1)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(5, len(self.get_queue(page_size=5).data['results']))
+        self.assertEqual(len(small), len(large))
+
+    def test_invalid_cursor(self):
+        self.assertEqual(400, self.get_queue(cursor='garbage').status_code)
+
+    def test_stream(self):
+        tasks = self.get_queue(stream=1)
+
+        self.assertEqual(
+            list(Task.objects.filter(flow_task=ClaimRestTestFlow.task).order_by('-created', '-pk')
+                 .values_list('pk', flat=True)),
+            [task['id'] for task in tasks])
+        self.assertEqual([], json.loads(''.join(list_rest.iter_json_list([[]], list))))
+
+
+class TestTaskFilter(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='admin', is_superuser=True)
+        self.process = ClaimRestTestFlow.start.run().process
+
+    def test_filter_without_queries(self):
+        with self.assertNumQueries(0):
+            task_filter = TaskFilter({}, Task.objects.all(), flow_classes=[ClaimRestTestFlow])
+            str(task_filter.form)
+
+        self.assertEqual(
+            [(None, 'All'), (get_task_ref(ClaimRestTestFlow.task), 'Claim Rest Test/Task')],
+            task_filter.filters['flow_task'].field.choices)
+
+    def test_choices_ordered_by_name(self):
+        choices = get_flow_task_choices([ClaimRestTestFlow, ChoicesTestFlow])
+        self.assertEqual(
+            ['Choices Test/Alpha', 'Choices Test/Zeta', 'Claim Rest Test/Task'],
+            [name for _, name in choices])
+
+    def test_filter_by_process(self):
+        task_filter = TaskFilter({'process': self.process.pk}, Task.objects.all(), flow_classes=[ClaimRestTestFlow])
+        self.assertEqual(
+            set(Task.objects.filter(process=self.process)), set(task_filter.qs))
+
+        task_filter = TaskFilter({'process': self.process.pk}, Task.objects.all(), flow_classes=[])
+        self.assertEqual([], list(task_filter.qs))
+
+    def test_cached_choices(self):
+        cache.delete('test_cached_choices')
+        queryset = Task.objects.filter(owner=self.user)
+
+        with self.assertNumQueries(1):
+            TaskFilter({}, queryset, flow_classes=[ClaimRestTestFlow], choices_cache_key='test_cached_choices')
+        with self.assertNumQueries(0):
+            task_filter = TaskFilter(
+                {}, queryset, flow_classes=[ClaimRestTestFlow], choices_cache_key='test_cached_choices')
+
+        self.assertEqual([(None, 'All')], task_filter.filters['flow_task'].field.choices)
+        cache.delete('test_cached_choices')
+
+
+class ChoicesTestFlow(Flow):
+    start = flow.StartFunction().Next(this.zeta)
+    zeta = flow.View(lambda request: None).Next(this.alpha)
+    alpha = flow.View(lambda request: None).Next(this.end)
+    end = flow.End()
+
+
+class ClaimRestTestFlow(Flow):
+    start = flow.StartFunction().Next(this.task)
+    task = flow.View(lambda request: None).Next(this.end)
+    end = flow.End()
@@ -1,4 +1,4 @@
-from .activation import STATUS
+from .activation import STATUS, Context, context
 
 
 class ThisObject(object):
@@ -113,6 +113,13 @@ class Node(object):
 
     def activate(self, prev_activation, token):
         """Creates task activation."""
+        scheduler = context.scheduler
+        if scheduler is None and self.flow_class.scheduler_impl is not None:
+            scheduler = self.flow_class.scheduler_impl(self.flow_class)
+            with Context(scheduler=scheduler):
+                return scheduler.activate(self, prev_activation, token)
+        elif scheduler is not None:
+            return scheduler.activate(self, prev_activation, token)
         return self.activation_class.activate(self, prev_activation, token)
 
 
@@ -26,10 +26,28 @@ _context_stack = threading.local()
 
 
 def all_leading_canceled(activation):
+    from .graph import ProcessGraph
+
+    graph = ProcessGraph.cached(activation.flow_class, activation.task.process_id)
+    if graph is not None and activation.task in graph:
+        return graph.all_leading_canceled(activation.task)
+
     non_canceled_count = activation.task.leading.exclude(status=STATUS.CANCELED).count()
     return non_canceled_count == 0
 
 
+def reset_join_counters(activation):
+    """
+    Split branch task changed its state outside of regular flow,
+    active joins of the process would recount its branches on next check.
+    """
+    if activation.task.token.is_split_token():
+        activation.flow_class.task_class._default_manager.filter(
+            process_id=activation.task.process_id,
+            flow_task_type='JOIN',
+            status=STATUS.STARTED).update(join_arrived=None)
+
+
 class Context(object):
     """Thread-local activation context, dynamically scoped
 
@@ -38,6 +56,8 @@ class Context(object):
                                   previous activalion, if False,
                                   current task activation would be
                                   marked as failed
+    :keyword scheduler: Queue for node activations, see :mod:`viewflow.scheduler`.
+                        If None, next nodes are activated recursively
 
 
     Usage ::
@@ -79,7 +99,7 @@ class Context(object):
         return Context(default=kwargs)
 
 
-context = Context.create(propagate_exception=True)
+context = Context.create(propagate_exception=True, scheduler=None)
 
 
 class Activation(object):
@@ -104,6 +124,12 @@ class Activation(object):
     """
     status = fsm.State()
 
+    #: Transitions that don't change the database state
+    safe_transitions = ('prepare',)
+
+    #: Flow lock of a read-only request, acquired on the first transition
+    deferred_lock = None
+
     def __init__(self, *args, **kwargs):
         """
         Activation should be available for instantiate without any
@@ -125,6 +151,12 @@ class Activation(object):
             return self.task.status
         return STATUS.UNRIPE
 
+    @status.on_transition()
+    def lock_on_transition(self, name):
+        if self.deferred_lock is not None and name not in self.safe_transitions:
+            deferred_lock, self.deferred_lock = self.deferred_lock, None
+            deferred_lock.acquire(self)
+
     def get_available_transtions(self):
         return self.__class__.status.get_available_transtions(self)
 
@@ -135,11 +167,17 @@ class Activation(object):
         """
         @contextmanager
         def guard():
+            persisted_active = self.task.__dict__.get('_persisted_active') if self.task is not None else None
             try:
                 with transaction.atomic(savepoint=True):
                     yield
             except Exception as exc:
                 if not context.propagate_exception:
+                    # task changes inside the savepoint are rolled back
+                    if persisted_active is not None:
+                        self.task._persisted_active = persisted_active
+                    else:
+                        self.task.__dict__.pop('_persisted_active', None)
                     self.task.comments = "{}\n{}".format(exc, traceback.format_exc())
                     self.task.finished = now()
                     self.set_status(STATUS.ERROR)
@@ -159,7 +197,14 @@ class Activation(object):
         and bounds activation and task instances.  """
         self.flow_task, self.flow_class = flow_task, flow_task.flow_class
 
-        self.process = self.flow_class.process_class._default_manager.get(flow_class=self.flow_class, pk=task.process_id)
+        process = None
+        if getattr(task, 'pk', None) is None:
+            # not yet saved task, created for an already loaded process
+            process = getattr(task, 'process', None)
+        if not isinstance(process, self.flow_class.process_class):
+            process = self.flow_class.process_class._default_manager.get(flow_class=self.flow_class, pk=task.process_id)
+
+        self.process = process
         self.task = task
 
     @status.transition(source=STATUS.DONE, target=STATUS.NEW, conditions=[all_leading_canceled])
@@ -171,6 +216,7 @@ class Activation(object):
         """
         self.task.finished = None
         self.task.save()
+        reset_join_counters(self)
 
         # call custom undo handler
         handler_name = '{}_undo'.format(self.flow_task.name)
@@ -185,6 +231,7 @@ class Activation(object):
         """
         self.task.finished = now()
         self.task.save()
+        reset_join_counters(self)
 
     @classmethod
     def activate(cls, flow_task, prev_activation, token):
@@ -248,6 +295,7 @@ class StartActivation(Activation):
         """
         signals.task_started.send(sender=self.flow_class, process=self.process, task=self.task)
 
+        self.process.creator = getattr(self.task, 'owner', None)
         self.process.save()
 
         lock_impl = self.flow_class.lock_impl(self.flow_class.instance)
@@ -569,6 +617,7 @@ class AbstractJobActivation(Activation):
            ASSIGNED -> SCHEDULED [label="schedule"]
            ASSIGNED -> ERROR [label="schedule"]
            SCHEDULED -> STARTED [label="start"]
+           STARTED -> DONE [label="complete"]
            STARTED -> DONE [label="done"]
            STARTED -> ERROR [label="error"]
            SCHEDULED -> SCHEDULED [label="retry"]
@@ -651,6 +700,26 @@ class AbstractJobActivation(Activation):
 
         self.activate_next()
 
+    @Activation.status.transition(source=STATUS.STARTED, target=STATUS.DONE)
+    def complete(self):
+        """
+        Mark short job task, claimed as started without lock, as done
+
+        .. seealso::
+            :data:`viewflow.signals.task_started`
+
+        .. seealso::
+            :data:`viewflow.signals.task_finished`
+
+        """
+        self.task.finished = now()
+        self.task.save()
+
+        signals.task_started.send(sender=self.flow_class, process=self.process, task=self.task)
+        signals.task_finished.send(sender=self.flow_class, process=self.process, task=self.task)
+
+        self.activate_next()
+
     @Activation.status.transition(source=STATUS.STARTED, target=STATUS.ERROR)
     def error(self, comments=""):
         """
@@ -754,10 +823,13 @@ class EndActivation(Activation):
 
             signals.task_started.send(sender=self.flow_class, process=self.process, task=self.task)
 
-            for task in self.process.active_tasks():
-                if task != self.task:
-                    break
+            if self.process.active_task_count is not None:
+                # this task is the only one active
+                process_finished = self.process.active_task_count <= 1
             else:
+                process_finished = all(task == self.task for task in self.process.active_tasks())
+
+            if process_finished:
                 self.process.status = STATUS.DONE
                 self.process.finished = now()
                 self.process.save()
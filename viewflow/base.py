@@ -9,7 +9,9 @@ import six
 from django.conf.urls import include, url
 
 from . import Node, ThisObject, This, lock, models, forms
+from .bulk import start_processes
 from .compat import get_containing_app_data
+from .fields import register_flow
 
 
 class _Resolver(object):
@@ -160,6 +162,9 @@ class FlowMetaClass(type):
         for name, node in nodes.items():
             node.ready()
 
+        # flow and task references lookup
+        register_flow(new_class)
+
         return new_class
 
 
@@ -172,12 +177,19 @@ class Flow(object):
     :keyword task_class: Defines model class for Task
     :keyword management_form_class: Defines form class for task state tracking over GET requests
     :keyword lock_impl: Locking implementation for flow
+    :keyword scheduler_impl: Queue for automatic activations, see :mod:`viewflow.scheduler`
+    :keyword signal_dispatcher: Flow signals dispatch mode, see :mod:`viewflow.signals`
+    :keyword materialize_summary: Store rendered process and task summaries
+                                  on save, to read them without rendering
 
     """
     process_class = models.Process
     task_class = models.Task
     management_form_class = forms.ActivationDataForm
     lock_impl = lock.no_lock
+    scheduler_impl = None
+    signal_dispatcher = None
+    materialize_summary = False
 
     process_title = None
     process_description = None
@@ -194,6 +206,16 @@ class Flow(object):
 
         return url('^', include(node_urls), {'flow_class': self})
 
+    @classmethod
+    def start_many(cls, flow_task, data, chunk_size=500):
+        """
+        Start a process per each item of `data` with bulk inserts.
+
+        Items are dicts of process field values, see
+        :func:`viewflow.bulk.start_processes`
+        """
+        return start_processes(flow_task, data, chunk_size=chunk_size)
+
     @property
     def view_permission_name(self):
         opts = self.process_class._meta
@@ -0,0 +1,589 @@
+"""
+Bulk operations over many flow processes.
+"""
+import sys
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.db.models.signals import post_save, pre_save
+from django.utils import six
+from django.utils.timezone import now
+
+from . import Node, fsm, graph, signals
+from .activation import (
+    STATUS, Activation, AbstractJobActivation, StartActivation, ViewActivation,
+    all_leading_canceled)
+from .decorators import _retry_on_conflict
+from .exceptions import FlowLockFailed, FlowRuntimeError
+from .fields import import_flow_by_ref
+from .models import AbstractProcess, AbstractTask
+
+
+def _can_bulk_create(model):
+    """
+    Multi-table inherited models can't be bulk created, and created
+    instances get primary keys only on backends that returns them.
+    """
+    connection = connections[router.db_for_write(model)]
+    return not model._meta.parents and \
+        getattr(connection.features, 'can_return_ids_from_bulk_insert', False)
+
+
+def _create_all(model, instances):
+    if _can_bulk_create(model):
+        for instance in instances:
+            instance.refresh_summary()
+        model._default_manager.bulk_create(instances)
+    else:
+        for instance in instances:
+            instance.save()
+    return instances
+
+
+def _link_previous(task_class, pairs):
+    """
+    Create `previous` relation rows for (task, previous_task) pairs with single query
+    """
+    through = task_class.previous.through
+    through._default_manager.bulk_create([
+        through(from_task_id=task.pk, to_task_id=previous.pk)
+        for task, previous in pairs
+    ])
+
+
+def _start_chunk(flow_task, chunk):
+    flow_class = flow_task.flow_class
+    process_class, task_class = flow_class.process_class, flow_class.task_class
+    next_task = flow_task._next
+
+    # processes
+    processes = [process_class(flow_class=flow_class, active_task_count=0, **kwargs) for kwargs in chunk]
+    _create_all(process_class, processes)
+
+    # start tasks
+    finished = now()
+    start_tasks = [
+        task_class(process=process, flow_task=flow_task, flow_task_type=flow_task.task_type,
+                   status=STATUS.DONE, started=finished, finished=finished)
+        for process in processes
+    ]
+    _create_all(task_class, start_tasks)
+
+    # first level tasks
+    if next_task is not None:
+        activations = []
+        for task in start_tasks:
+            activation = flow_task.activation_class()
+            activation.initialize(flow_task, task)
+            activations.append(activation)
+
+        if hasattr(next_task.activation_class, 'create_task'):
+            next_tasks = [
+                next_task.activation_class.create_task(next_task, activation, activation.task.token)
+                for activation in activations
+            ]
+            for task in next_tasks:
+                task.flow_task_type = next_task.task_type
+            _create_all(task_class, next_tasks)
+            _link_previous(task_class, zip(next_tasks, start_tasks))
+
+            if _can_bulk_create(task_class):
+                # bulk created tasks are not counted by Task.save
+                process_class._default_manager \
+                    .filter(pk__in=[process.pk for process in processes]) \
+                    .update(active_task_count=F('active_task_count') + 1)
+        else:
+            # node have to be executed, activate it regular way
+            for activation in activations:
+                next_task.activate(prev_activation=activation, token=activation.task.token)
+
+    signals.flow_started_bulk.send(sender=flow_class, processes=processes, tasks=start_tasks)
+
+    return processes
+
+
+def _is_plain_start(flow_task):
+    """
+    Start activations without custom activate, prepare or done code,
+    followed by a node without custom activation code,
+    that could be replaced by bulk inserts
+    """
+    from .flow.activation import ManagedStartViewActivation
+
+    activation_class = flow_task.activation_class
+    plain = (StartActivation, ManagedStartViewActivation)
+    return activation_class.activate.__func__ is Activation.activate.__func__ \
+        and activation_class.prepare.func in [cls.prepare.func for cls in plain] \
+        and activation_class.done.func is StartActivation.done.func \
+        and _is_plain_next(flow_task._next)
+
+
+def _is_plain_next(next_task):
+    """
+    The node is activated by the regular way, or its tasks
+    could be created by `create_task` without custom activate code
+    """
+    if next_task is None or not hasattr(next_task.activation_class, 'create_task'):
+        return True
+    return six.get_unbound_function(type(next_task).activate) is six.get_unbound_function(Node.activate) \
+        and next_task.activation_class.activate.__func__ is ViewActivation.activate.__func__
+
+
+def _start_each(flow_task, chunk):
+    """
+    Start processes one by one, with the start node activation
+    """
+    processes = []
+    for kwargs in chunk:
+        activation = flow_task.activation_class()
+        activation.initialize(flow_task, None)
+        for name, value in kwargs.items():
+            setattr(activation.process, name, value)
+        try:
+            activation.prepare()
+            activation.done()
+        finally:
+            if activation.lock:
+                activation.lock.__exit__(*sys.exc_info())
+        processes.append(activation.process)
+    return processes
+
+
+def start_processes(flow_task, data, chunk_size=500):
+    """
+    Start a flow process per each item of `data`.
+
+    Each item is a dict of process model field values. Processes,
+    start tasks and the first level tasks are created with
+    `bulk_create` per chunk, within a single transaction per chunk.
+
+    Instead of per-process `task_started`, `task_finished` and
+    `flow_started` signals, `flow_started_bulk` signal is sent once
+    per chunk. If the start node activation class has custom `activate`,
+    `prepare` or `done` code, or the next node has custom activation
+    code, processes are started one by one, with the regular signals.
+
+    New processes are not visible to other transactions before
+    the chunk is committed, so bulk inserts acquire no flow locks.
+    """
+    if flow_task.task_type != 'START':
+        raise FlowRuntimeError('{} is not a start node'.format(flow_task.name))
+
+    start_chunk = _start_chunk if _is_plain_start(flow_task) else _start_each
+    processes, chunk = [], []
+
+    for kwargs in data:
+        chunk.append(kwargs)
+        if len(chunk) >= chunk_size:
+            with transaction.atomic():
+                processes.extend(start_chunk(flow_task, chunk))
+            chunk = []
+
+    if chunk:
+        with transaction.atomic():
+            processes.extend(start_chunk(flow_task, chunk))
+
+    return processes
+
+
+TASK_ACTIONS = ('assign', 'unassign', 'cancel', 'undo')
+
+
+def _exit_all(contexts, exc_info):
+    error = None
+    for context in reversed(contexts):
+        try:
+            context.__exit__(*exc_info)
+        except Exception:
+            exc_info = error = sys.exc_info()
+    if error:
+        six.reraise(*error)
+
+
+@contextmanager
+def _lock_all(keys):
+    """
+    Acquire flow locks for the (flow_class, process_pk) pairs
+    """
+    locks = []
+    try:
+        for flow_class, process_pk in keys:
+            lock = flow_class.lock_impl(flow_class.instance)(flow_class, process_pk)
+            lock.__enter__()
+            locks.append(lock)
+        yield
+    except Exception:
+        _exit_all(locks, sys.exc_info())
+        raise
+    else:
+        _exit_all(locks, (None, None, None))
+
+
+def _retry_chunk(keys, func):
+    """
+    Run `func` in a transaction under the flow locks of the (flow_class, process_pk)
+    pairs, retried on the optimistic lock conflict, as flow decorators do.
+    """
+    lock = max(
+        (flow_class.lock_impl(flow_class.instance) for flow_class in set(key[0] for key in keys)),
+        key=lambda lock: getattr(lock, 'retries', 0))
+
+    def _call():
+        with _lock_all(keys):
+            return func()
+    return _retry_on_conflict(lock, _call)
+
+
+def _check_task_action(activation, action, user, owner):
+    """
+    Return an error message if the `action` can't be performed, or None
+    """
+    flow_task, task = activation.flow_task, activation.task
+
+    if not getattr(activation, action).can_proceed():
+        return "Task in '{}' status can't be {}".format(task.status, action)
+
+    can_manage = user.has_perm(activation.flow_class.instance.manage_permission_name)
+
+    if action == 'assign':
+        if owner != user and not can_manage:
+            return 'Permission denied'
+        if not hasattr(flow_task, 'can_assign') or not flow_task.can_assign(owner, task):
+            return "Task can't be assigned to {}".format(owner)
+    elif action == 'unassign':
+        if not hasattr(flow_task, 'can_unassign') or not flow_task.can_unassign(user, task):
+            return 'Permission denied'
+    elif not can_manage:
+        return 'Permission denied'
+
+
+def _is_stock_save(model, base_model):
+    """
+    Model rows could be updated in bulk, skipping `save` and the save signals
+    """
+    return six.get_unbound_function(model.save) is six.get_unbound_function(base_model.save) \
+        and not pre_save.has_listeners(model) and not post_save.has_listeners(model)
+
+
+def _is_batched(activation, action):
+    """
+    Default assign/unassign transitions of the stock tasks are performed with a single update
+    """
+    return action in ('assign', 'unassign') and \
+        getattr(type(activation), action) is getattr(ViewActivation, action) and \
+        _is_stock_save(type(activation.task), AbstractTask)
+
+
+def _perform_task_action(activation, action, owner):
+    """
+    Perform the action in a savepoint, return an error message or None
+    """
+    try:
+        with transaction.atomic():
+            if action == 'assign':
+                activation.assign(owner)
+            else:
+                getattr(activation, action)()
+    except FlowLockFailed:
+        raise
+    except Exception as exc:
+        return str(exc)
+
+
+def _perform_chunk(flow_processes, action, user, owner):
+    results, batched = {}, defaultdict(list)  # task_class -> pks
+
+    for flow_class, processes in flow_processes.items():
+        task_pks = [pk for task_pks in processes.values() for pk in task_pks]
+        tasks = flow_class.task_class._default_manager.filter(pk__in=task_pks).order_by('pk')
+
+        for task in tasks:
+            activation = task.flow_task.activation_class()
+            activation.initialize(task.flow_task, task)
+
+            results[task.pk] = _check_task_action(activation, action, user, owner)
+            if results[task.pk] is not None:
+                continue
+
+            if _is_batched(activation, action):
+                batched[flow_class.task_class].append(task.pk)
+            else:
+                results[task.pk] = _perform_task_action(activation, action, owner)
+
+    for task_class, pks in batched.items():
+        if action == 'assign':
+            values = dict(owner=owner, status=STATUS.ASSIGNED, rendered_summary=None)
+        else:
+            values = dict(owner=None, status=STATUS.NEW, rendered_summary=None)
+        try:
+            with transaction.atomic():
+                task_class._default_manager.filter(pk__in=pks).update(**values)
+        except Exception as exc:
+            results.update(dict.fromkeys(pks, str(exc)))
+
+    for processes in flow_processes.values():
+        for process_pk in processes:
+            graph.invalidate(process_pk)
+
+    return results
+
+
+def perform_task_actions(tasks, action, user, owner=None, chunk_size=100):
+    """
+    Perform `action` (assign, unassign, cancel or undo) on each task of the queryset.
+
+    Tasks are grouped by process. Process locks are acquired once per process,
+    in (flow, process pk) order, up to `chunk_size` processes per transaction.
+    Chunks are retried on the optimistic lock conflict. Transitions are
+    checked by the task activation, default assign and unassign transitions
+    are applied with a single update per chunk. An error of a task action
+    is reported for the task, and does not abort the rest of the chunk.
+
+    Returns {task_pk: error message or None}.
+    """
+    if action not in TASK_ACTIONS:
+        raise FlowRuntimeError('Unknown task action {}'.format(action))
+    if owner is None:
+        owner = user
+
+    groups = defaultdict(list)  # (flow_ref, process_pk) -> task pks
+    for task_pk, process_pk, flow_ref in tasks.values_list('pk', 'process_id', 'process__flow_class'):
+        groups[(flow_ref, process_pk)].append(task_pk)
+    keys = sorted(groups.keys())
+
+    results = {}
+    for start in range(0, len(keys), chunk_size):
+        chunk = keys[start:start + chunk_size]
+
+        flow_processes = defaultdict(dict)  # flow_class -> {process_pk: task pks}
+        lock_keys = []
+        for flow_ref, process_pk in chunk:
+            flow_class = import_flow_by_ref(flow_ref)
+            flow_processes[flow_class][process_pk] = groups[(flow_ref, process_pk)]
+            lock_keys.append((flow_class, process_pk))
+
+        try:
+            chunk_results = _retry_chunk(
+                lock_keys, lambda: _perform_chunk(flow_processes, action, user, owner))
+        except Exception as exc:  # lock failure, or unexpected error outside the task actions
+            chunk_results = {pk: str(exc) for key in chunk for pk in groups[key]}
+
+        for key in chunk:
+            for pk in groups[key]:
+                results[pk] = chunk_results.get(pk, 'Task not found')
+
+    return results
+
+
+def _is_plain_cancel(activation_class):
+    """
+    Cancel transitions that only finish the task, and could be applied by a bulk update
+    """
+    return activation_class.cancel.func in (Activation.cancel.func, AbstractJobActivation.cancel.func)
+
+
+class CancelPlan(object):
+    """
+    Cancellation of the processes active tasks.
+
+    Process graphs are loaded by two queries, and each active task
+    gets an action decided in memory: 'cancel', 'undo' (undo, then
+    cancel), or None if the task could not be canceled.
+    """
+    def __init__(self, flow_class, process_pks):
+        self.flow_class = flow_class
+        self.process_pks = list(process_pks)
+
+        self.graphs = graph.ProcessGraph.get_many(flow_class, self.process_pks)
+        self.tasks = [task for process_pk in self.process_pks for task in self.graphs[process_pk].active()]
+        self.actions = {task.pk: self.decide(task) for task in self.tasks}
+
+    def get_transition(self, activation, name, status):
+        descriptor = getattr(type(activation), name, None)
+        if isinstance(descriptor, fsm.TransitionDescriptor):
+            return descriptor.get_transition(status, activation)
+
+    def conditions_met(self, task, transition):
+        for condition in transition.conditions:
+            if condition is all_leading_canceled:
+                met = self.graphs[task.process_id].all_leading_canceled(task)
+            else:
+                met = condition(task.activate())
+            if not met:
+                return False
+        return True
+
+    def decide(self, task):
+        activation = task.flow_task.activation_class()
+        activation.flow_task, activation.flow_class, activation.task = task.flow_task, self.flow_class, task
+
+        def can_proceed(name, status):
+            transition = self.get_transition(activation, name, status)
+            return transition is not None and self.conditions_met(task, transition)
+
+        if can_proceed('cancel', task.status):
+            return 'cancel'
+
+        undo = self.get_transition(activation, 'undo', task.status)
+        if undo is not None and undo.target and self.conditions_met(task, undo) \
+                and can_proceed('cancel', undo.target):
+            return 'undo'
+
+    @property
+    def uncancelable(self):
+        return [task for task in self.tasks if self.actions[task.pk] is None]
+
+    def apply(self, process_pks=None):
+        """
+        Cancel active tasks and the processes, inside the processes locks.
+
+        Tasks with plain cancel transitions are canceled by bulk updates,
+        others through the task activation. Processes are canceled by
+        a single update, that increments the version, unless the process
+        model has custom `save` or save signal receivers.
+        """
+        if process_pks is None:
+            process_pks = self.process_pks
+        process_pks = set(process_pks)
+        tasks = [task for task in self.tasks if task.process_id in process_pks]
+
+        for task in tasks:
+            if self.actions[task.pk] is None:
+                raise FlowRuntimeError("Can't cancel {}".format(task))
+
+        plain = [task for task in tasks
+                 if self.actions[task.pk] == 'cancel' and _is_plain_cancel(task.flow_task.activation_class)]
+        plain_pks = {task.pk for task in plain}
+        finished = now()
+
+        if plain:
+            self._cancel_plain(plain, finished)
+
+        for task in tasks:
+            if task.pk not in plain_pks:
+                activation = task.activate()
+                if self.actions[task.pk] == 'undo':
+                    activation.undo()
+                activation.cancel()
+
+        process_class = self.flow_class.process_class
+        processes = process_class._default_manager.filter(pk__in=process_pks)
+        if _is_stock_save(process_class, AbstractProcess):
+            processes.update(
+                status=STATUS.CANCELED, finished=finished, rendered_summary=None, version=F('version') + 1)
+        else:
+            for process in processes:
+                process.status, process.finished = STATUS.CANCELED, finished
+                process.save()
+            processes.update(version=F('version') + 1)
+
+    def _cancel_plain(self, tasks, finished):
+        task_manager = self.flow_class.task_class._default_manager
+
+        split_processes = {task.process_id for task in tasks if task.token.is_split_token()}
+        if split_processes:
+            task_manager.filter(
+                process_id__in=split_processes,
+                flow_task_type='JOIN',
+                status=STATUS.STARTED).update(join_arrived=None)
+
+        task_manager.filter(pk__in=[task.pk for task in tasks]).update(
+            status=STATUS.CANCELED, finished=finished, rendered_summary=None)
+        for process_pk in {task.process_id for task in tasks}:
+            graph.invalidate(process_pk)
+
+        # keep process active task counters in sync, one update per distinct delta
+        finished_counts = Counter(task.process_id for task in tasks if task.finished is None)
+        processes_by_count = defaultdict(list)
+        for process_pk, count in finished_counts.items():
+            processes_by_count[count].append(process_pk)
+
+        process_class = self.flow_class.process_class
+        process_class = process_class._meta.get_field('active_task_count').model
+        for count, process_pks in processes_by_count.items():
+            process_class._default_manager \
+                .filter(pk__in=process_pks) \
+                .update(active_task_count=F('active_task_count') - count)
+
+        for task in tasks:
+            task.status, task.finished, task._persisted_active = STATUS.CANCELED, finished, False
+
+
+def cancel_processes(processes, chunk_size=100):
+    """
+    Cancel processes of the queryset, with all active tasks.
+
+    Process locks are acquired in (flow, process pk) order, up to
+    `chunk_size` processes per transaction, chunks are retried on the
+    optimistic lock conflict. A process with a task that could not be
+    canceled is left untouched. An unexpected error is reported for the
+    process it was raised for.
+
+    Returns {process_pk: error message or None}.
+    """
+    groups = defaultdict(list)  # flow ref -> process pks
+    for process_pk, flow_ref in processes.values_list('pk', 'flow_class'):
+        groups[flow_ref].append(process_pk)
+    keys = sorted((flow_ref, process_pk) for flow_ref, process_pks in groups.items() for process_pk in process_pks)
+
+    results = {}
+    for start in range(0, len(keys), chunk_size):
+        results.update(_cancel_keys(keys[start:start + chunk_size]))
+
+    return results
+
+
+def _cancel_keys(chunk):
+    """
+    Cancel (flow_ref, process_pk) processes in a single transaction.
+
+    If the chunk fails with an unexpected error, processes are canceled
+    one by one, to report the error for the failed process only.
+    """
+    flow_processes = defaultdict(list)  # flow_class -> process pks
+    lock_keys = []
+    for flow_ref, process_pk in chunk:
+        flow_class = import_flow_by_ref(flow_ref)
+        flow_processes[flow_class].append(process_pk)
+        lock_keys.append((flow_class, process_pk))
+
+    def _cancel_all():
+        chunk_results = {}
+        for flow_class, process_pks in flow_processes.items():
+            chunk_results.update(_cancel_chunk(flow_class, process_pks))
+        return chunk_results
+
+    try:
+        return _retry_chunk(lock_keys, _cancel_all)
+    except FlowLockFailed as exc:
+        return {process_pk: str(exc) for _, process_pk in chunk}
+    except Exception as exc:
+        if len(chunk) == 1:
+            return {process_pk: str(exc) for _, process_pk in chunk}
+        results = {}
+        for key in chunk:
+            results.update(_cancel_keys([key]))
+        return results
+
+
+def _cancel_chunk(flow_class, process_pks):
+    results = {}
+    statuses = flow_class.process_class._default_manager \
+        .filter(pk__in=process_pks).values_list('pk', 'status')
+    for process_pk, status in statuses:
+        if status in [STATUS.DONE, STATUS.CANCELED]:
+            results[process_pk] = "Process in '{}' status can't be canceled".format(status)
+        else:
+            results[process_pk] = None
+
+    plan = CancelPlan(flow_class, [pk for pk, error in results.items() if error is None])
+    for task in plan.uncancelable:
+        results[task.process_id] = "Can't cancel {}".format(task)
+
+    plan.apply([pk for pk, error in results.items() if error is None])
+
+    for process_pk in process_pks:
+        results.setdefault(process_pk, 'Process not found')
+    return results
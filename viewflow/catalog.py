@@ -0,0 +1,143 @@
+"""
+Persisted catalog of flow and task references.
+
+Compact reference fields store the catalog entry id instead of the
+`app_label/path.to.Flowcls[.task_name]` string. Catalog entries are
+immutable, so the id <-> reference mapping is cached process-wide.
+"""
+import threading
+
+from django.db import transaction
+
+
+UNKNOWN_ID = -1  # never assigned to a catalog entry, matches no rows
+
+_id_by_ref = {}  # reference -> catalog id
+_ref_by_id = {}  # catalog id -> reference
+
+_local = threading.local()
+
+
+def _created_refs():
+    """
+    References of the entries created by not yet committed transactions of the thread
+    """
+    if not hasattr(_local, 'created'):
+        _local.created = set()
+    return _local.created
+
+
+def _remember(ref_id, ref):
+    _id_by_ref[ref] = ref_id
+    _ref_by_id[ref_id] = ref
+
+
+def _remember_created(ref_id, ref):
+    """
+    Cache created entries only when the transaction succeed,
+    rolled back catalog ids could be reused by the database.
+    """
+    if hasattr(transaction, 'on_commit'):
+        created = _created_refs()
+        created.add(ref)
+
+        def _commit():
+            created.discard(ref)
+            _remember(ref_id, ref)
+        transaction.on_commit(_commit)
+    else:
+        # django 1.6/1.8
+        _remember(ref_id, ref)
+
+
+def _remember_existing(ref_id, ref):
+    """
+    Cache an entry read from the database at once, unless
+    it was created earlier in the same transaction.
+    """
+    created = _created_refs()
+    if ref in created and not transaction.get_connection().in_atomic_block:
+        # the creating transaction was rolled back
+        created.discard(ref)
+    if ref not in created:
+        _remember(ref_id, ref)
+
+
+def get_catalog_id(ref, create=True):
+    """
+    Return catalog id for a flow or task reference, creates the entry if required.
+
+    With `create=False` returns `UNKNOWN_ID` for an unknown reference.
+    """
+    ref_id = _id_by_ref.get(ref)
+    if ref_id is None:
+        from .models import FlowCatalog
+
+        if not create:
+            ref_id = FlowCatalog._default_manager.filter(ref=ref).values_list('pk', flat=True).first()
+            if ref_id is None:
+                return UNKNOWN_ID
+            _remember_existing(ref_id, ref)
+            return ref_id
+
+        entry, created = FlowCatalog._default_manager.get_or_create(ref=ref)
+        ref_id = entry.pk
+        if created:
+            _remember_created(ref_id, ref)
+        else:
+            _remember_existing(ref_id, ref)
+    return ref_id
+
+
+def get_catalog_ref(ref_id):
+    """
+    Return flow or task reference for the catalog id.
+    """
+    ref = _ref_by_id.get(ref_id)
+    if ref is None:
+        from .models import FlowCatalog
+
+        ref = FlowCatalog._default_manager.values_list('ref', flat=True).get(pk=ref_id)
+        _remember_existing(ref_id, ref)
+    return ref
+
+
+def compact_references(app_label, model_name, ref_field, id_field):
+    """
+    Data migration that fills catalog ids from the existing reference column.
+
+    Expects that `id_field` is already added to the model.
+    Usage, for a custom task model::
+
+        operations = [
+            migrations.AddField('mytask', 'flow_task_id', models.IntegerField(null=True)),
+            compact_references('myapp', 'MyTask', 'flow_task', 'flow_task_id'),
+            migrations.RemoveField('mytask', 'flow_task'),
+            migrations.RenameField('mytask', 'flow_task_id', 'flow_task'),
+            migrations.AlterField('mytask', 'flow_task', viewflow.fields.CompactTaskReferenceField()),
+        ]
+
+    The migration should depend on `('viewflow', '0006_flowcatalog')`.
+    """
+    from django.db import migrations
+
+    def forwards(apps, schema_editor):
+        model = apps.get_model(app_label, model_name)
+        catalog = apps.get_model('viewflow', 'FlowCatalog')
+        manager = model._default_manager
+
+        refs = manager.exclude(**{ref_field: ''}).values_list(ref_field, flat=True).distinct()
+        for ref in list(refs):
+            entry, _ = catalog._default_manager.get_or_create(ref=ref)
+            manager.filter(**{ref_field: ref}).update(**{id_field: entry.pk})
+
+    def backwards(apps, schema_editor):
+        model = apps.get_model(app_label, model_name)
+        catalog = apps.get_model('viewflow', 'FlowCatalog')
+        manager = model._default_manager
+
+        ids = manager.exclude(**{id_field: None}).values_list(id_field, flat=True).distinct()
+        for entry in catalog._default_manager.filter(pk__in=list(ids)):
+            manager.filter(**{id_field: entry.pk}).update(**{ref_field: entry.ref})
+
+    return migrations.RunPython(forwards, backwards)
@@ -4,9 +4,11 @@ from ..activation import Activation, AbstractJobActivation, STATUS
 from ..compat import mock
 from ..fields import get_task_ref
 from ..flow import AbstractJob
+from ..scheduler import resume
 from .. import test as flow_test
 
 
+from celery import shared_task
 from celery.task.control import revoke
 
 
@@ -78,3 +80,11 @@ def flow_do(flow_node, test_task, **post_kwargs):
 @flow_test.flow_patch_manager.register(Job)
 def flow_patch_manager(flow_node):
     return mock.patch.object(flow_node._job, 'apply_async')
+
+
+@shared_task
+def continue_activations(items):
+    """
+    Background continuation for :class:`viewflow.scheduler.Scheduler`
+    """
+    resume(items)
@@ -1,19 +1,26 @@
 import time
 import random
+import threading
+import uuid
 from contextlib import contextmanager
 
 from django.core.cache import cache as default_cache
 from django.db import transaction
 
 from viewflow.exceptions import FlowLockFailed
+from viewflow.lock import LockStats
 
 
 try:
     import django_redis  # NOQA
+    from redis.exceptions import WatchError
 except ImportError:
     raise ImportError('django-redis required')
 
 
+NOTIFY_TIMEOUT = 1  # seconds, a waiter rechecks the lock at least that often
+
+
 class RedisLock(object):
     """
     Task lock based on redis' cache capabilities.
@@ -40,8 +47,10 @@ class RedisLock(object):
         @contextmanager
         def lock(flow_class, process_pk):
             key = 'django-viewflow-lock-{}/{}'.format(flow_class._meta.flow_label, process_pk)
+            stats = LockStats(flow_class, process_pk)
 
             for i in range(attempts):
+                stats.attempt()
                 process = flow_class.process_class._default_manager.filter(pk=process_pk)
                 if process.exists():
                     lock = cache.lock(key, timeout=expires)
@@ -52,10 +61,11 @@ class RedisLock(object):
                     sleep_time = (((i + 1) * random.random()) + 2 ** i) / 2.5
                     time.sleep(sleep_time)
             else:
+                stats.report('failed')
                 raise FlowLockFailed('Lock failed for {}'.format(flow_class))
 
             try:
-                with transaction.atomic():
+                with stats.held(), transaction.atomic():
                     yield
             finally:
                 lock.release()
@@ -63,5 +73,129 @@ class RedisLock(object):
         return lock
 
 
+class RedisNotifyLock(object):
+    """
+    Redis lock that wakes up waiters as soon as the lock released.
+
+    The lock key holds an unique token with a `lease` expiration, renewed
+    by a background thread while the lock is held. Waiters block on
+    a per-key notification list (`BLPOP`), the holder pushes to it on release.
+    A notification expires in `NOTIFY_TIMEOUT`, and a waiter retries
+    `SET NX` after every wakeup, or at least each `NOTIFY_TIMEOUT`, so
+    a notification taken by a waiter that already left, is not waited for.
+
+    Example::
+
+        class MyFlow(Flow):
+            lock_impl = RedisNotifyLock(timeout=10, lease=30)
+
+    :keyword client: redis client, by default the ``django-redis`` cache client
+    :keyword timeout: Seconds to wait for the lock
+    :keyword lease: Seconds before an abandoned lock expires
+    """
+
+    def __init__(self, cache=default_cache, client=None, timeout=10, lease=30):
+        self.cache = cache
+        self.client = client
+        self.timeout = timeout
+        self.lease = lease
+
+    def get_client(self):
+        if self.client is not None:
+            return self.client
+        return self.cache.client.get_client(write=True)
+
+    def __call__(self, flow, timeout=None, lease=None):
+        timeout = timeout if timeout is not None else self.timeout
+        lease = lease if lease is not None else self.lease
+
+        @contextmanager
+        def lock(flow_class, process_pk):
+            client = self.get_client()
+            key = 'django-viewflow-lock-{}/{}'.format(flow_class._meta.flow_label, process_pk)
+            notify_key = '{}/notify'.format(key)
+            token = uuid.uuid4().hex.encode('ascii')
+            stats = LockStats(flow_class, process_pk)
+
+            deadline = time.time() + timeout
+            while True:
+                stats.attempt()
+                if client.set(key, token, nx=True, px=int(lease * 1000)):
+                    break
+
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    stats.report('failed')
+                    raise FlowLockFailed('Lock failed for {}'.format(flow_class))
+
+                # wake up on release, or recheck a lost notification and an expired lease
+                client.blpop([notify_key], timeout=NOTIFY_TIMEOUT)
+
+            renewal = _LeaseRenewal(client, key, token, lease)
+            renewal.start()
+            try:
+                with stats.held(), transaction.atomic():
+                    yield
+            finally:
+                renewal.stop()
+                _release(client, key, notify_key, token)
+
+        return lock
+
+
+def _release(client, key, notify_key, token):
+    """
+    Delete the lock key if it still ours, and wake up a waiter
+    """
+    with client.pipeline() as pipe:
+        while True:
+            try:
+                pipe.watch(key)
+                if pipe.get(key) == token:
+                    pipe.multi()
+                    pipe.delete(key)
+                    pipe.delete(notify_key)
+                    pipe.lpush(notify_key, 1)
+                    pipe.pexpire(notify_key, NOTIFY_TIMEOUT * 1000)
+                    pipe.execute()
+                else:
+                    pipe.unwatch()
+                return
+            except WatchError:
+                # the key changed between WATCH and EXEC, check the owner again
+                continue
+
+
+class _LeaseRenewal(threading.Thread):
+    """
+    Prolong the lock key expiration while the lock is held
+    """
+    def __init__(self, client, key, token, lease):
+        super(_LeaseRenewal, self).__init__()
+        self.daemon = True
+        self.client, self.key, self.token, self.lease = client, key, token, lease
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.lease / 3.0):
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(self.key)
+                    if pipe.get(self.key) != self.token:
+                        return
+                    pipe.multi()
+                    pipe.pexpire(self.key, int(self.lease * 1000))
+                    pipe.execute()
+                except WatchError:
+                    pass
+
+    def stop(self):
+        """
+        Stop the renewal, and wait for a renewal in flight
+        """
+        self.stopped.set()
+        self.join()
+
+
 redis_lock = RedisLock()
 """Task lock requires the default cache config to use a ``django-redis`` cache backend."""
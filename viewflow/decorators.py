@@ -1,14 +1,39 @@
 import sys
+import time
+import random
 import traceback
 import functools
 
-from django.db import transaction
+from django.db import models, transaction
 from django.shortcuts import get_object_or_404
+from django.utils import six
+from django.utils.timezone import now
 
+from . import signals
 from .activation import STATUS
+from .exceptions import FlowLockConflict
 from .fields import import_task_by_ref
 
 
+def _retry_on_conflict(lock, func, atomic=True, retries=None):
+    """
+    Run `func` in a transaction, retry it on the optimistic lock conflict
+    up to the `lock.retries` times, with a randomized backoff.
+    """
+    if retries is None:
+        retries = getattr(lock, 'retries', 0)
+    for attempt in range(retries + 1):
+        try:
+            if not atomic:
+                return func()
+            with transaction.atomic():
+                return func()
+        except FlowLockConflict:
+            if attempt == retries:
+                raise
+            time.sleep(random.random() * 0.01 * 2 ** attempt)
+
+
 def flow_start_func(func):
     @transaction.atomic
     @functools.wraps(func)
@@ -30,18 +55,19 @@ def flow_func(func):
     Expect function that gets activation instance as the first parameter,
     Returns function that expects task instance as the first parameter instead
     """
-    @transaction.atomic
     @functools.wraps(func)
     def _wrapper(task, *args, **kwargs):
         flow_task = task.flow_task
         flow_class = flow_task.flow_class
 
         lock = flow_class.lock_impl(flow_class.instance)
-        with lock(flow_class, task.process_id):
-            task = flow_class.task_class._default_manager.get(pk=task.pk)
-            activation = flow_task.activation_class()
-            activation.initialize(flow_task, task)
-            return func(activation, *args, **kwargs)
+
+        def _call():
+            with lock(flow_class, task.process_id):
+                activation = flow_task.activation_class()
+                activation.initialize(flow_task, flow_class.task_class._default_manager.get(pk=task.pk))
+                return func(activation, *args, **kwargs)
+        return _retry_on_conflict(lock, _call)
     return _wrapper
 
 
@@ -58,6 +84,13 @@ def flow_job(func):
 
     Process instance is locked only before and after the function execution.
     Please avoid any process state modification during the celery job.
+
+    Lock conflicts of the optimistic lock are retried, the job function
+    itself is not.
+
+    For :meth:`viewflow.nodes.AbstractJob.Optimistic` jobs, expected to be
+    short, the task is claimed as started by a conditional update, and
+    the lock is acquired only once, after the function execution.
     """
     @functools.wraps(func)
     def _wrapper(*args, **kwargs):
@@ -68,48 +101,142 @@ def flow_job(func):
 
         lock = flow_task.flow_class.lock_impl(flow_task.flow_class.instance)
 
-        # start
-        with transaction.atomic(), lock(flow_task.flow_class, process_pk):
+        if flow_task.use_optimistic():
             try:
                 task = flow_task.flow_class.task_class.objects.get(pk=task_pk)
-                if task.status == STATUS.CANCELED:
-                    return
             except flow_task.flow_class.task_class.DoesNotExist:
-                # There was rollback on job task created transaction,
-                # we don't need to do the job
                 return
-            else:
-                activation = flow_task.activation_class()
-                activation.initialize(flow_task, task)
-                if task.status == STATUS.SCHEDULED:
-                    activation.start()
+            if task.status in [STATUS.CANCELED, STATUS.STARTED]:
+                # started task is executed by a concurrent delivery
+                return
+            if task.status == STATUS.SCHEDULED:
+                return _flow_job_optimistic(func, flow_task, lock, task, kwargs)
+
+        # start
+        def _start():
+            with lock(flow_task.flow_class, process_pk):
+                try:
+                    task = flow_task.flow_class.task_class.objects.get(pk=task_pk)
+                    if task.status == STATUS.CANCELED:
+                        return
+                except flow_task.flow_class.task_class.DoesNotExist:
+                    # There was rollback on job task created transaction,
+                    # we don't need to do the job
+                    return
                 else:
-                    activation.restart()
+                    activation = flow_task.activation_class()
+                    activation.initialize(flow_task, task)
+                    if task.status == STATUS.SCHEDULED:
+                        activation.start()
+                    else:
+                        activation.restart()
+                    return activation
+
+        activation = _retry_on_conflict(lock, _start)
+        if activation is None:
+            return
 
         # execute
+        timer = time.time()
         try:
             result = func(activation, **kwargs)
         except Exception as exc:
+            flow_task.observe_duration(time.time() - timer)
+
             # mark as error
-            with transaction.atomic(), lock(flow_task.flow_class, process_pk):
-                task = flow_task.flow_class.task_class.objects.get(pk=task_pk)
-                activation = flow_task.activation_class()
-                activation.initialize(flow_task, task)
-                activation.error(comments="{}\n{}".format(exc, traceback.format_exc()))
+            comments = "{}\n{}".format(exc, traceback.format_exc())
+
+            def _error():
+                with lock(flow_task.flow_class, process_pk):
+                    task = flow_task.flow_class.task_class.objects.get(pk=task_pk)
+                    activation = flow_task.activation_class()
+                    activation.initialize(flow_task, task)
+                    activation.error(comments=comments)
+
+            _retry_on_conflict(lock, _error)
             raise
         else:
-            # mark as done
-            with transaction.atomic(), lock(flow_task.flow_class, process_pk):
-                task = flow_task.flow_class.task_class.objects.get(pk=task_pk)
-                activation = flow_task.activation_class()
-                activation.initialize(flow_task, task)
-                activation.done()
+            flow_task.observe_duration(time.time() - timer)
 
+            # mark as done
+            def _done():
+                with lock(flow_task.flow_class, process_pk):
+                    task = flow_task.flow_class.task_class.objects.get(pk=task_pk)
+                    activation = flow_task.activation_class()
+                    activation.initialize(flow_task, task)
+                    activation.done()
+
+            _retry_on_conflict(lock, _done)
             return result
 
     return _wrapper
 
 
+def _claim_job_task(flow_class, task, started):
+    """
+    Mark the scheduled task as started, with a single conditional update.
+
+    The process version is incremented in the same transaction, as
+    `claim_next` does. Returns False, if the task is not scheduled anymore.
+    """
+    with transaction.atomic():
+        flow_class.process_class._default_manager \
+            .filter(pk=task.process_id).update(version=models.F('version') + 1)
+        claimed = flow_class.task_class._default_manager \
+            .filter(pk=task.pk, status=STATUS.SCHEDULED).update(status=STATUS.STARTED, started=started)
+        if not claimed:
+            transaction.set_rollback(True)
+    return bool(claimed)
+
+
+def _flow_job_optimistic(func, flow_task, lock, task, kwargs):
+    """
+    Run the job on the task and process snapshot, loaded without lock.
+
+    The task is claimed as started before the execution, concurrent
+    deliveries of the same job are skipped. The task is finished under
+    the single lock acquisition, if it was not changed during the job
+    execution.
+    """
+    flow_class = flow_task.flow_class
+
+    started = now()
+    if not _claim_job_task(flow_class, task, started):
+        return
+    task.status, task.started = STATUS.STARTED, started
+
+    activation = flow_task.activation_class()
+    activation.initialize(flow_task, task)
+
+    def _commit(action):
+        with lock(flow_class, task.process_id):
+            current = flow_class.task_class.objects.get(pk=task.pk)
+            if current.status != STATUS.STARTED:
+                # task was canceled, undone or rescheduled during the execution
+                return
+            activation.task = current
+            activation.process.refresh_from_db()
+            action()
+
+    timer = time.time()
+    try:
+        result = func(activation, **kwargs)
+    except Exception as exc:
+        flow_task.observe_duration(time.time() - timer)
+        comments = "{}\n{}".format(exc, traceback.format_exc())
+
+        def _error():
+            signals.task_started.send(sender=flow_class, process=activation.process, task=activation.task)
+            activation.error(comments=comments)
+
+        _retry_on_conflict(lock, lambda: _commit(_error))
+        raise
+    else:
+        flow_task.observe_duration(time.time() - timer)
+        _retry_on_conflict(lock, lambda: _commit(activation.complete))
+        return result
+
+
 def flow_start_signal(handler):
     @transaction.atomic
     @functools.wraps(handler)
@@ -128,18 +255,19 @@ def flow_signal(handler):
     """
     Decorator providing a flow signal receiver with the activation.
     """
-    @transaction.atomic
     @functools.wraps(handler)
     def _wrapper(sender, task=None, **signal_kwargs):
         flow_task = task.flow_task
         flow_class = flow_task.flow_class
 
         lock = flow_class.lock_impl(flow_class.instance)
-        with lock(flow_class, task.process_id):
-            task = flow_class.task_class._default_manager.get(pk=task.pk)
-            activation = flow_task.activation_class()
-            activation.initialize(flow_task, task)
-            return handler(sender=sender, activation=activation, **signal_kwargs)
+
+        def _call():
+            with lock(flow_class, task.process_id):
+                activation = flow_task.activation_class()
+                activation.initialize(flow_task, flow_class.task_class._default_manager.get(pk=task.pk))
+                return handler(sender=sender, activation=activation, **signal_kwargs)
+        return _retry_on_conflict(lock, _call)
     return _wrapper
 
 
@@ -168,26 +296,129 @@ def flow_start_view(view):
     return _wrapper
 
 
+def _row_state(instance):
+    """
+    Values of the loaded concrete fields of the model instance
+    """
+    deferred = instance.get_deferred_fields() if hasattr(instance, 'get_deferred_fields') else ()
+    return [
+        (field.attname, getattr(instance, field.attname))
+        for field in instance._meta.concrete_fields
+        if field.attname not in deferred
+    ]
+
+
+class DeferredLock(object):
+    """
+    Flow lock of a read-only request.
+
+    Acquired with a transaction on the first activation transition,
+    if the task and process rows were not changed since they were loaded.
+    """
+    def __init__(self, lock, flow_class, process_pk, task, process):
+        self.lock = lock
+        self.flow_class = flow_class
+        self.process_pk = process_pk
+        self.task_state = _row_state(task)
+        self.process_state = _row_state(process)
+        self.entered = []
+
+    def acquire(self, activation):
+        for context in [transaction.atomic(), self.lock(self.flow_class, self.process_pk)]:
+            context.__enter__()
+            self.entered.append(context)
+
+        task = self.flow_class.task_class._default_manager.filter(pk=activation.task.pk).first()
+        process = self.flow_class.process_class._default_manager.filter(pk=self.process_pk).first()
+        if task is None or process is None or \
+                _row_state(task) != self.task_state or _row_state(process) != self.process_state:
+            raise FlowLockConflict('Task #{} was changed concurrently'.format(activation.task.pk))
+
+    def release(self, exc_type=None, exc_value=None, traceback=None):
+        error = None
+        while self.entered:
+            context = self.entered.pop()
+            try:
+                context.__exit__(exc_type, exc_value, traceback)
+            except Exception:
+                exc_type, exc_value, traceback = error = sys.exc_info()
+        if error:
+            six.reraise(*error)
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def retry_on_conflict(view):
+    """
+    Mark the flow view as safe to be called again on the optimistic lock conflict.
+
+    A view could have side effects outside of the database transaction,
+    so unsafe method requests are not retried, unless the view is marked.
+    """
+    view.retry_on_conflict = True
+    return view
+
+
 def flow_view(view):
     """
     Decorator that locks and runs the flow view in transaction.
 
+    On the optimistic lock conflict, a safe method request, or a view
+    marked with `retry_on_conflict`, is called again.
+
+    Requests with safe methods (GET, HEAD, OPTIONS) are read-only,
+    the task and process are loaded without lock. If the view invokes
+    an activation transition, the lock is acquired just before it,
+    and released when the view returns, before the response rendering.
+    The transition fails with the lock conflict, if the task or process
+    rows were changed since they were loaded.
+
     Expects view with the signature `(request, **kwargs)`
     Returns view with the signature `(request, flow_class, flow_task, process_pk, task_pk, **kwargs)
     """
 
-    @transaction.atomic
+    def _read(request, flow_class, flow_task, process_pk, task_pk, lock, **kwargs):
+        task = get_object_or_404(flow_task.flow_class.task_class._default_manager, pk=task_pk)
+        activation = flow_task.activation_class()
+        activation.initialize(flow_task, task)
+        activation.deferred_lock = DeferredLock(lock, flow_class, process_pk, task, activation.process)
+
+        request.activation = activation
+        request.process = activation.process
+        request.task = activation.task
+
+        deferred_lock = activation.deferred_lock
+        try:
+            response = view(request, **kwargs)
+        except Exception:
+            deferred_lock.release(*sys.exc_info())
+            raise
+        else:
+            deferred_lock.release()
+            return response
+        finally:
+            activation.deferred_lock = None
+
     @functools.wraps(view)
     def _wrapper(request, flow_class, flow_task, process_pk, task_pk, **kwargs):
         lock = flow_task.flow_class.lock_impl(flow_class.instance)
-        with lock(flow_class, process_pk):
-            task = get_object_or_404(flow_task.flow_class.task_class._default_manager, pk=task_pk)
-            activation = flow_task.activation_class()
-            activation.initialize(flow_task, task)
 
-            request.activation = activation
-            request.process = activation.process
-            request.task = activation.task
+        if request.method in SAFE_METHODS:
+            return _retry_on_conflict(lock, lambda: _read(
+                request, flow_class, flow_task, process_pk, task_pk, lock, **kwargs), atomic=False)
 
-            return view(request, **kwargs)
+        def _call():
+            with lock(flow_class, process_pk):
+                task = get_object_or_404(flow_task.flow_class.task_class._default_manager, pk=task_pk)
+                activation = flow_task.activation_class()
+                activation.initialize(flow_task, task)
+
+                request.activation = activation
+                request.process = activation.process
+                request.task = activation.task
+
+                return view(request, **kwargs)
+        retries = None if getattr(view, 'retry_on_conflict', False) else 0
+        return _retry_on_conflict(lock, _call, retries=retries)
     return _wrapper
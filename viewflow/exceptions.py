@@ -8,3 +8,9 @@ class FlowLockFailed(Exception):
     """
     Flow lock failed
     """
+
+
+class FlowLockConflict(FlowLockFailed):
+    """
+    Process was concurrently modified, operation could be retried
+    """
@@ -2,17 +2,51 @@ from __future__ import unicode_literals
 import six
 
 from django.db import models
+from .catalog import get_catalog_id, get_catalog_ref
 from .compat import get_app_package, get_containing_app_data, import_string
 from .exceptions import FlowRuntimeError
 from .token import Token
 
 
-def import_flow_by_ref(flow_strref):
+_flow_class_by_ref = {}  # flow ref -> flow class
+_flow_ref_by_class = {}  # flow class -> flow ref
+_task_by_ref = {}  # task ref -> flow node
+_task_ref_by_node = {}  # (flow class, node name) -> task ref
+
+
+def register_flow(flow_class):
+    """
+    Register flow class and its nodes in the process-wide reference registry.
+
+    Called once per flow class on definition, so that reference
+    lookups for db rows become plain dict hits.
+    """
+    flow_ref = _get_flow_ref(flow_class)
+    _flow_class_by_ref[flow_ref] = flow_class
+    _flow_ref_by_class[flow_class] = flow_ref
+
+    for node in flow_class._meta.nodes():
+        task_ref = '{}.{}'.format(flow_ref, node.name)
+        _task_by_ref[task_ref] = node
+        _task_ref_by_node[(flow_class, node.name)] = task_ref
+
+
+def _import_flow_by_ref(flow_strref):
     app_label, flow_path = flow_strref.split('/')
     return import_string('{}.{}'.format(get_app_package(app_label), flow_path))
 
 
-def get_flow_ref(flow_class):
+def import_flow_by_ref(flow_strref):
+    """
+    Return flow class by reference like `app_label/path.to.Flowcls`
+    """
+    flow_class = _flow_class_by_ref.get(flow_strref)
+    if flow_class is None:
+        flow_class = _import_flow_by_ref(flow_strref)
+    return flow_class
+
+
+def _get_flow_ref(flow_class):
     module = "{}.{}".format(flow_class.__module__, flow_class.__name__)
     app_label, app_package = get_containing_app_data(module)
     if app_label is None:
@@ -22,17 +56,31 @@ def get_flow_ref(flow_class):
     return "{}/{}".format(app_label, subpath)
 
 
-def import_task_by_ref(task_strref):
-    """
-    Return flow task by reference like `app_label/path.to.Flowcls.task_name`
-    """
+def get_flow_ref(flow_class):
+    flow_ref = _flow_ref_by_class.get(flow_class)
+    if flow_ref is None:
+        flow_ref = _get_flow_ref(flow_class)
+    return flow_ref
+
+
+def _import_task_by_ref(task_strref):
     app_label, flow_path = task_strref.split('/')
     flow_path, task_name = flow_path.rsplit('.', 1)
     flow_class = import_string('{}.{}'.format(get_app_package(app_label), flow_path))
     return flow_class._meta.node(task_name)
 
 
-def get_task_ref(flow_task):
+def import_task_by_ref(task_strref):
+    """
+    Return flow task by reference like `app_label/path.to.Flowcls.task_name`
+    """
+    flow_task = _task_by_ref.get(task_strref)
+    if flow_task is None:
+        flow_task = _import_task_by_ref(task_strref)
+    return flow_task
+
+
+def _get_task_ref(flow_task):
     module = flow_task.flow_class.__module__
     app_label, app_package = get_containing_app_data(module)
     if app_label is None:
@@ -43,6 +91,13 @@ def get_task_ref(flow_task):
     return "{}/{}.{}.{}".format(app_label, subpath, flow_task.flow_class.__name__, flow_task.name)
 
 
+def get_task_ref(flow_task):
+    task_ref = _task_ref_by_node.get((flow_task.flow_class, flow_task.name))
+    if task_ref is None:
+        task_ref = _get_task_ref(flow_task)
+    return task_ref
+
+
 class ClassValueWrapper(object):
     """
     Wrapper to get around of passing cls objects callable to django
@@ -145,6 +200,86 @@ class TaskReferenceField(models.CharField):
         return self.get_prep_value(value)
 
 
+@six.add_metaclass(_SubfieldBase)
+class CompactFlowReferenceField(models.IntegerField):
+    description = """Flow class reference field,
+    stores flow as integer id of the `viewflow.FlowCatalog` entry"""
+
+    def to_python(self, value):
+        if isinstance(value, six.integer_types):
+            return import_flow_by_ref(get_catalog_ref(value))
+        elif isinstance(value, six.string_types) and value:
+            if value.isdigit():
+                return import_flow_by_ref(get_catalog_ref(int(value)))
+            return import_flow_by_ref(value)
+        return value
+
+    def get_ref(self, value):
+        if isinstance(value, six.string_types):
+            return value
+        elif isinstance(value, ClassValueWrapper):
+            value = value.cls
+        elif not isinstance(value, type):
+            # HACK: see FlowReferenceField.get_prep_value
+            value = value.__class__
+        return get_flow_ref(value)
+
+    def get_prep_value(self, value):
+        # lookups don't create catalog entries, unknown reference is prepared
+        # as an id that matches nothing, NULL would break `exclude` lookups
+        if value is None or value == '':
+            return None
+        elif isinstance(value, six.integer_types):
+            return value
+        return get_catalog_id(self.get_ref(value), create=False)
+
+    def get_db_prep_save(self, value, connection):
+        if value is not None and value != '' and not isinstance(value, six.integer_types):
+            value = get_catalog_id(self.get_ref(value))
+        return super(CompactFlowReferenceField, self).get_db_prep_save(value, connection)
+
+    def value_to_string(self, obj):
+        value = self._get_val_from_obj(obj)
+        return get_flow_ref(value) if value else value
+
+
+@six.add_metaclass(_SubfieldBase)
+class CompactTaskReferenceField(models.IntegerField):
+    description = """Flow task reference field,
+    stores task as integer id of the `viewflow.FlowCatalog` entry"""
+
+    def to_python(self, value):
+        if isinstance(value, six.integer_types):
+            return import_task_by_ref(get_catalog_ref(value))
+        elif isinstance(value, six.string_types) and value:
+            if value.isdigit():
+                return import_task_by_ref(get_catalog_ref(int(value)))
+            return import_task_by_ref(value)
+        return value
+
+    def get_ref(self, value):
+        if isinstance(value, six.string_types):
+            return value
+        return get_task_ref(value)
+
+    def get_prep_value(self, value):
+        # see CompactFlowReferenceField.get_prep_value
+        if value is None or value == '':
+            return None
+        elif isinstance(value, six.integer_types):
+            return value
+        return get_catalog_id(self.get_ref(value), create=False)
+
+    def get_db_prep_save(self, value, connection):
+        if value is not None and value != '' and not isinstance(value, six.integer_types):
+            value = get_catalog_id(self.get_ref(value))
+        return super(CompactTaskReferenceField, self).get_db_prep_save(value, connection)
+
+    def value_to_string(self, obj):
+        value = self._get_val_from_obj(obj)
+        return get_task_ref(value) if value else value
+
+
 @six.add_metaclass(_SubfieldBase)
 class TokenField(models.CharField):
     def __init__(self, *args, **kwargs):
@@ -172,6 +307,8 @@ try:
     """
     from south.modelsinspector import add_introspection_rules
     add_introspection_rules([], ["^viewflow\.fields\.FlowReferenceField"])
+    add_introspection_rules([], ["^viewflow\.fields\.CompactFlowReferenceField"])
+    add_introspection_rules([], ["^viewflow\.fields\.CompactTaskReferenceField"])
     add_introspection_rules([(
         (TaskReferenceField,),
         [],
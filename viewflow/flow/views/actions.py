@@ -4,14 +4,13 @@ from django.http import HttpResponseRedirect
 from django.shortcuts import redirect
 from django.utils.http import is_safe_url
 from django.utils.decorators import method_decorator
-from django.utils.timezone import now
 from django.views import generic
 from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext_lazy as _
 
 from ...activation import STATUS
+from ...bulk import CancelPlan
 from ...decorators import flow_view
-from ...exceptions import FlowRuntimeError
 from .mixins import (
     FlowManagePermissionMixin, FlowTaskManagePermissionMixin,
     MessageUserMixin
@@ -166,8 +165,7 @@ class CancelProcessView(FlowManagePermissionMixin, generic.DetailView):
             self.error('Process {process} can not be canceled.')
             return HttpResponseRedirect(self.get_success_url())
         elif '_cancel_process' in request.POST:
-            self._cancel_active_tasks()
-            self._cancel_process()
+            CancelPlan(self.flow_class, [self.object.pk]).apply()
             self.success('Process {process} has been canceled.')
             return HttpResponseRedirect(self.get_success_url())
         else:
@@ -182,44 +180,8 @@ class CancelProcessView(FlowManagePermissionMixin, generic.DetailView):
 
     def get_context_data(self, **kwargs):
         context = super(CancelProcessView, self).get_context_data(**kwargs)
-        context['active_tasks'] = self._get_task_list()
+        plan = CancelPlan(self.flow_class, [self.object.pk])
+        context['active_tasks'] = plan.tasks
         context['flow_class'] = self.flow_class
-        context['uncancelable_tasks'] = self._get_uncancelable_tasks(context['active_tasks'])
+        context['uncancelable_tasks'] = plan.uncancelable
         return context
-
-    def _get_task_list(self):
-        active_tasks = self.object.task_set.exclude(status__in=[STATUS.DONE, STATUS.CANCELED])
-        return active_tasks
-
-    def _get_uncancelable_tasks(self, tasks):
-        uncancelable = []
-
-        for task in tasks:
-            activation = task.activate()
-            can_cancel = hasattr(activation, 'cancel') and activation.cancel.can_proceed()
-            can_undo = hasattr(activation, 'undo') and activation.undo.can_proceed()
-
-            if not can_undo and not can_cancel:
-                uncancelable.append(task)
-
-        return uncancelable
-
-    def _cancel_active_tasks(self):
-        active_tasks = self._get_task_list()
-        for task in active_tasks:
-            activation = task.activate()
-            can_cancel = hasattr(activation, 'cancel') and activation.cancel.can_proceed()
-            can_undo = hasattr(activation, 'undo') and activation.undo.can_proceed()
-
-            if not can_cancel and can_undo:
-                activation.undo()
-                activation.cancel()
-            elif can_cancel:
-                activation.cancel()
-            else:
-                raise FlowRuntimeError("Can't cancel {}".format(task))
-
-    def _cancel_process(self):
-        self.object.status = STATUS.CANCELED
-        self.object.finished = now()
-        self.object.save()
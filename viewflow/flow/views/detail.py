@@ -3,6 +3,7 @@ from django.utils.decorators import method_decorator
 from django.core.exceptions import PermissionDenied
 
 from ...decorators import flow_view
+from ...graph import ProcessGraph
 from .mixins import FlowViewPermissionMixin
 
 
@@ -52,7 +53,11 @@ class DetailProcessView(FlowViewPermissionMixin, generic.DetailView):
 
     def get_context_data(self, **kwargs):
         context = super(DetailProcessView, self).get_context_data(**kwargs)
-        context['task_list'] = context['process'].task_set.all().order_by('created')
+        graph = ProcessGraph.cached(self.flow_class, context['process'].pk)
+        if graph is not None:
+            context['task_list'] = graph.tasks
+        else:
+            context['task_list'] = context['process'].task_set.all().order_by('created')
         return context
 
     def get_queryset(self):
@@ -1,42 +1,122 @@
+import hashlib
+
+from django import forms
+from django.core.cache import cache
 from django.views import generic
 from django.contrib.auth.decorators import login_required
+from django.utils import six
 from django.utils.decorators import method_decorator
 from django.utils.translation import ugettext_lazy as _
 from django_filters import FilterSet, ChoiceFilter, DateRangeFilter, ModelChoiceFilter
 
 from ... import activation, models
-from ...fields import import_task_by_ref
+from ...fields import get_flow_ref, get_task_ref, import_task_by_ref
 from .mixins import (
     LoginRequiredMixin, FlowViewPermissionMixin,
     FlowListMixin
 )
+from .pagination import KeysetPaginationMixin
+
+
+_flow_task_choices = {}  # flow classes -> [(task ref, task name)]
+
+
+def get_flow_task_choices(flow_classes):
+    """
+    Human task choices of the flows, built from the flows metadata,
+    ordered by the display name
+    """
+    key = tuple(flow_classes)
+    choices = _flow_task_choices.get(key)
+    if choices is None:
+        choices = _flow_task_choices[key] = sorted((
+            (get_task_ref(node), "{}/{}".format(flow_class.process_title, node.name.title()))
+            for flow_class in flow_classes
+            for node in flow_class._meta.nodes()
+            if node.task_type == 'HUMAN'), key=lambda choice: (choice[1], choice[0]))
+    return choices
 
 
 class TaskFilter(FilterSet):
+    """
+    Filter of the user task lists.
+
+    With `flow_classes`, the `flow_task` choices are taken from the flows
+    metadata, and building the filter costs no queries. Choices may be
+    narrowed to the tasks present in the queryset, cached under the
+    `choices_cache_key` for `choices_cache_timeout` seconds.
+
+    Processes are looked up by pk only when the process filter is used.
+    """
     flow_task = ChoiceFilter(help_text='')
     created = DateRangeFilter(help_text='')
-    process = ModelChoiceFilter(queryset=models.Process.objects.all(), help_text='')
+    process = ModelChoiceFilter(queryset=models.Process.objects.all(), widget=forms.TextInput, help_text='')
 
-    def __init__(self, data=None, queryset=None, prefix=None, strict=None):
+    def __init__(self, data=None, queryset=None, prefix=None, strict=None,
+                 flow_classes=None, choices_cache_key=None, choices_cache_timeout=300):
         super(TaskFilter, self).__init__(data=data, queryset=queryset, prefix=prefix, strict=strict)
-        self.filters['process'].field.queryset = \
-            models.Process.objects.filter(id__in=queryset.values_list('process', flat=True))
 
-        def task_name(task_ref):
-            flow_task = import_task_by_ref(task_ref)
-            return "{}/{}".format(flow_task.flow_class.process_title, flow_task.name.title())
-
-        tasks = [(task_ref, task_name(task_ref))
-                 for task_ref in queryset.order_by('flow_task').distinct().values_list('flow_task', flat=True)]
+        if flow_classes is not None:
+            flow_classes = list(flow_classes)
+            self.filters['process'].field.queryset = models.Process.objects.filter(flow_class__in=flow_classes)
+
+            tasks = get_flow_task_choices(flow_classes)
+            if choices_cache_key is not None:
+                present = cache.get(choices_cache_key)
+                if present is None:
+                    present = self.get_task_refs(queryset)
+                    cache.set(choices_cache_key, present, choices_cache_timeout)
+                tasks = [(task_ref, name) for task_ref, name in tasks if task_ref in present]
+        else:
+            self.filters['process'].field.queryset = \
+                models.Process.objects.filter(id__in=queryset.values_list('process', flat=True))
+
+            def task_name(task_ref):
+                flow_task = import_task_by_ref(task_ref)
+                return "{}/{}".format(flow_task.flow_class.process_title, flow_task.name.title())
+
+            tasks = sorted(
+                ((task_ref, task_name(task_ref)) for task_ref in self.get_task_refs(queryset)),
+                key=lambda choice: (choice[1], choice[0]))
 
         self.filters['flow_task'].field.choices = [(None, 'All')] + tasks
 
+    @staticmethod
+    def get_task_refs(queryset):
+        return set(
+            task_ref if isinstance(task_ref, six.string_types) else get_task_ref(task_ref)
+            for task_ref in queryset.order_by().values_list('flow_task', flat=True).distinct())
+
     class Meta:
         fields = ['process', 'flow_task', 'created']
         model = models.Task
 
 
-class AllProcessListView(LoginRequiredMixin, FlowListMixin, generic.ListView):
+class TaskFilterMixin(object):
+    """
+    Task filter for the list views of the `flows` tasks.
+
+    Set `filter_choices_cache_timeout` to show only the tasks present in
+    the user list, cached per user for the given number of seconds.
+    """
+    filter_choices_cache_timeout = None
+
+    def get_filter_choices_cache_key(self):
+        flow_refs = ','.join(sorted(get_flow_ref(flow_class) for flow_class in self.flows))
+        return 'viewflow.taskfilter.{}.{}.{}'.format(
+            type(self).__name__, self.request.user.pk,
+            hashlib.md5(flow_refs.encode('utf-8')).hexdigest())
+
+    def create_task_filter(self, queryset):
+        cache_key = None
+        if self.filter_choices_cache_timeout is not None:
+            cache_key = self.get_filter_choices_cache_key()
+        return TaskFilter(
+            self.request.GET, queryset, flow_classes=self.flows,
+            choices_cache_key=cache_key, choices_cache_timeout=self.filter_choices_cache_timeout)
+
+
+class AllProcessListView(LoginRequiredMixin, FlowListMixin, KeysetPaginationMixin, generic.ListView):
 
     """All process instances list available for current user."""
     paginate_by = 15
@@ -52,7 +132,7 @@ class AllProcessListView(LoginRequiredMixin, FlowListMixin, generic.ListView):
             .order_by('-created')
 
 
-class AllTaskListView(LoginRequiredMixin, FlowListMixin, generic.ListView):
+class AllTaskListView(LoginRequiredMixin, FlowListMixin, TaskFilterMixin, KeysetPaginationMixin, generic.ListView):
 
     """All tasks from all processes assigned to current user."""
 
@@ -73,14 +153,14 @@ class AllTaskListView(LoginRequiredMixin, FlowListMixin, generic.ListView):
     @property
     def filter(self):
         if self._filter is None:
-            self._filter = TaskFilter(self.request.GET, self.get_base_queryset(self.request.user))
+            self._filter = self.create_task_filter(self.get_base_queryset(self.request.user))
         return self._filter
 
     def get_base_queryset(self, user):
         return models.Task.objects.inbox(self.flows, user).order_by('-created')
 
 
-class AllQueueListView(LoginRequiredMixin, FlowListMixin, generic.ListView):
+class AllQueueListView(LoginRequiredMixin, FlowListMixin, TaskFilterMixin, KeysetPaginationMixin, generic.ListView):
 
     """All unassigned tasks available for current user."""
 
@@ -106,14 +186,14 @@ class AllQueueListView(LoginRequiredMixin, FlowListMixin, generic.ListView):
     @property
     def filter(self):
         if self._filter is None:
-            self._filter = TaskFilter(self.request.GET, self.get_base_queryset(self.request.user))
+            self._filter = self.create_task_filter(self.get_base_queryset(self.request.user))
         return self._filter
 
     def get_base_queryset(self, user):
         return models.Task.objects.queue(self.flows, user).order_by('-created')
 
 
-class AllArchiveListView(LoginRequiredMixin, FlowListMixin, generic.ListView):
+class AllArchiveListView(LoginRequiredMixin, FlowListMixin, KeysetPaginationMixin, generic.ListView):
 
     """All tasks from all processes assigned to current user."""
 
@@ -143,7 +223,7 @@ class ProcessFilter(FilterSet):
     finished = DateRangeFilter(help_text='')
 
 
-class ProcessListView(FlowViewPermissionMixin, generic.ListView):
+class ProcessListView(FlowViewPermissionMixin, KeysetPaginationMixin, generic.ListView):
     paginate_by = 15
     paginate_orphans = 5
     context_object_name = 'process_list'
@@ -179,7 +259,7 @@ class ProcessListView(FlowViewPermissionMixin, generic.ListView):
             .order_by('-created')
 
 
-class TaskListView(FlowViewPermissionMixin, generic.ListView):
+class TaskListView(FlowViewPermissionMixin, KeysetPaginationMixin, generic.ListView):
 
     """List of specific Flow tasks assigned to current user."""
 
@@ -207,7 +287,7 @@ class TaskListView(FlowViewPermissionMixin, generic.ListView):
             .order_by('-created')
 
 
-class QueueListView(FlowViewPermissionMixin, generic.ListView):
+class QueueListView(FlowViewPermissionMixin, KeysetPaginationMixin, generic.ListView):
 
     """List of specific Flow unassigned tasks available for current user."""
 
@@ -234,7 +314,7 @@ class QueueListView(FlowViewPermissionMixin, generic.ListView):
         return queryset
 
 
-class ArchiveListView(FlowViewPermissionMixin, generic.ListView):
+class ArchiveListView(FlowViewPermissionMixin, KeysetPaginationMixin, generic.ListView):
 
     """All tasks from all processes assigned to current user."""
 
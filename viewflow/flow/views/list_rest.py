@@ -1,29 +1,118 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.http import StreamingHttpResponse
 from django.views import generic
 
 from rest_framework import views as rest_views
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework import permissions
+from rest_framework.utils import encoders
 
 from viewflow.rest_views import APIViewWithoutCSRFEnforcement
-from .list import TaskFilter, ProcessFilter
+from .list import TaskFilterMixin, ProcessFilter
 
 from ... import serializers
 
-from ... import activation, models
+from ... import activation, bulk, models
 
 from .mixins import (
-    LoginRequiredMixin, FlowViewPermissionMixin,
-    FlowListMixin
+    LoginRequiredMixin, FlowManagePermissionMixin,
+    FlowViewPermissionMixin, FlowListMixin
 )
-
-
-class AllProcessListRestView(LoginRequiredMixin, FlowListMixin, APIViewWithoutCSRFEnforcement):
+from .pagination import InvalidCursor, iterate_keyset, paginate_keyset
+
+
+def iter_json_list(chunks, serialize):
+    """
+    Render JSON array of the serialized chunks of objects piece by piece
+    """
+    yield '['
+    first = True
+    for chunk in chunks:
+        data = [json.dumps(item, cls=encoders.JSONEncoder, separators=(',', ':')) for item in serialize(chunk)]
+        if data:
+            yield (',' if not first else '') + ','.join(data)
+            first = False
+    yield ']'
+
+
+class ListResponseMixin(object):
+    """
+    Bounded or streamed list responses for the REST list views.
+
+    By default a keyset page is returned::
+
+        {"results": [...], "next": cursor, "previous": cursor,
+         "count": total or null, "count_exact": true}
+
+    The `cursor` request parameter selects the page and `page_size`
+    overrides `paginate_by`, up to `max_paginate_by`.
+
+    With `stream=1` the whole list is streamed as a JSON array, read by
+    `stream_chunk_size` rows queries.
+    """
+    paginate_keyset = True
+    paginate_by = 100
+    max_paginate_by = 1000
+    paginate_count = False
+    paginate_count_limit = 1000
+    allow_stream = True
+    stream_chunk_size = 500
+
+    def get_page_size(self):
+        page_size = self.request.query_params.get('page_size')
+        if page_size is None:
+            return self.paginate_by
+        try:
+            page_size = int(page_size)
+        except ValueError:
+            page_size = 0
+        if not 0 < page_size <= self.max_paginate_by:
+            raise ValidationError({'page_size': 'Expected number between 1 and {}'.format(self.max_paginate_by)})
+        return page_size
+
+    def get_list_response(self, queryset, serialize):
+        params = self.request.query_params
+        if self.allow_stream and params.get('stream') in ('1', 'true'):
+            return StreamingHttpResponse(
+                iter_json_list(iterate_keyset(queryset, chunk_size=self.stream_chunk_size), serialize),
+                content_type='application/json')
+
+        cursor = params.get('cursor')
+        if not self.paginate_keyset and cursor is None:
+            return Response(serialize(queryset))
+
+        try:
+            page = paginate_keyset(
+                queryset, cursor, per_page=self.get_page_size(),
+                count=self.paginate_count, count_limit=self.paginate_count_limit)
+        except InvalidCursor:
+            raise ValidationError({'cursor': 'Invalid cursor'})
+
+        return Response({
+            'results': serialize(page.object_list),
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+            'count': page.count,
+            'count_exact': page.count_exact})
+
+    # serialized data is not kept by the serializer, to be freed right after rendering
+
+    def serialize_processes(self, processes):
+        return serializers.ProcessSerializer(many=True).to_representation(processes)
+
+    def serialize_tasks(self, tasks):
+        return serializers.TaskSerializer(many=True, request=self.request).to_representation(tasks)
+
+
+class AllProcessListRestView(LoginRequiredMixin, FlowListMixin, ListResponseMixin, APIViewWithoutCSRFEnforcement):
 
     """All process instances list available for current user."""
 
     def get(self, request, *args, **kwargs):
-        processes = [p for p in self.get_queryset()]
-        return Response([serializers.ProcessSerializer(p).data for p in processes])
+        return self.get_list_response(self.get_queryset(), self.serialize_processes)
 
     def get_queryset(self):
         return models.Process.objects \
@@ -31,7 +120,7 @@ class AllProcessListRestView(LoginRequiredMixin, FlowListMixin, APIViewWithoutCS
             .order_by('-created')
 
 
-class AllTaskListRestView(FlowListMixin, APIViewWithoutCSRFEnforcement):
+class AllTaskListRestView(FlowListMixin, TaskFilterMixin, ListResponseMixin, APIViewWithoutCSRFEnforcement):
 
     def __init__(self, *args, **kwargs):
         self._filter = None
@@ -42,20 +131,19 @@ class AllTaskListRestView(FlowListMixin, APIViewWithoutCSRFEnforcement):
         return perms
 
     def get(self, request, *args, **kwargs):
-        tasks = list(self.filter.qs)
-        return Response([serializers.TaskSerializer(task, request=request).data for task in tasks])
+        return self.get_list_response(self.filter.qs, self.serialize_tasks)
 
     @property
     def filter(self):
         if self._filter is None:
-            self._filter = TaskFilter(self.request.GET, self.get_base_queryset(self.request.user))
+            self._filter = self.create_task_filter(self.get_base_queryset(self.request.user))
         return self._filter
 
     def get_base_queryset(self, user):
         return models.Task.objects.inbox(self.flows, user).order_by('-created')
 
 
-class AllQueueListRestView(FlowListMixin, APIViewWithoutCSRFEnforcement):
+class AllQueueListRestView(FlowListMixin, TaskFilterMixin, ListResponseMixin, APIViewWithoutCSRFEnforcement):
 
     def __init__(self, *args, **kwargs):
         self._filter = None
@@ -67,18 +155,85 @@ class AllQueueListRestView(FlowListMixin, APIViewWithoutCSRFEnforcement):
     @property
     def filter(self):
         if self._filter is None:
-            self._filter = TaskFilter(self.request.GET, self.get_base_queryset(self.request.user))
+            self._filter = self.create_task_filter(self.get_base_queryset(self.request.user))
         return self._filter
 
     def get_base_queryset(self, user):
         return models.Task.objects.queue(self.flows, user).order_by('-created')
 
     def get(self, request, *args, **kwargs):
-        tasks = list(self.get_queryset())
+        return self.get_list_response(self.get_queryset(), self.serialize_tasks)
+
+
+def get_claim_count(request, max_count=100):
+    """
+    Number of tasks to claim, `n` request parameter
+    """
+    try:
+        count = int(request.data.get('n', request.query_params.get('n', 1)))
+    except (TypeError, ValueError):
+        count = 0
+    if not 0 < count <= max_count:
+        raise ValidationError({'n': 'Expected number between 1 and {}'.format(max_count)})
+    return count
+
+
+class AllQueueClaimRestView(LoginRequiredMixin, FlowListMixin, APIViewWithoutCSRFEnforcement):
+
+    """Assigns the oldest tasks from the user queue to the current user."""
+
+    def post(self, request, *args, **kwargs):
+        tasks = models.Task.objects.claim_next(request.user, self.flows, n=get_claim_count(request))
         return Response([serializers.TaskSerializer(task, request=request).data for task in tasks])
 
 
-class AllArchiveListRestView(LoginRequiredMixin, FlowListMixin, APIViewWithoutCSRFEnforcement):
+def perform_task_actions(request, queryset, max_count=1000):
+    """
+    Perform `action` request parameter on the `tasks` list of task pks.
+
+    Returns [{'task': pk, 'result': 'ok' or 'error', 'message': ...}]
+    """
+    action = request.data.get('action')
+    if action not in bulk.TASK_ACTIONS:
+        raise ValidationError({'action': 'Expected one of {}'.format(', '.join(bulk.TASK_ACTIONS))})
+
+    task_pks = request.data.get('tasks')
+    try:
+        task_pks = [int(task_pk) for task_pk in task_pks]
+    except (TypeError, ValueError):
+        task_pks = []
+    if not 0 < len(task_pks) <= max_count:
+        raise ValidationError({'tasks': 'Expected list of 1 to {} task ids'.format(max_count)})
+
+    owner = None
+    if action == 'assign' and request.data.get('owner') is not None:
+        owner = get_user_model()._default_manager.filter(pk=request.data['owner']).first()
+        if owner is None:
+            raise ValidationError({'owner': 'User not found'})
+
+    results = bulk.perform_task_actions(
+        queryset.filter(pk__in=task_pks), action, request.user, owner=owner)
+
+    response = []
+    for task_pk in task_pks:
+        message = results.get(task_pk, 'Task not found')
+        response.append({
+            'task': task_pk,
+            'result': 'ok' if message is None else 'error',
+            'message': message})
+    return response
+
+
+class AllTaskActionRestView(LoginRequiredMixin, FlowListMixin, APIViewWithoutCSRFEnforcement):
+
+    """Assign, unassign, cancel or undo many tasks at once."""
+
+    def post(self, request, *args, **kwargs):
+        return Response(perform_task_actions(request, models.Task.objects.filter(
+            process__flow_class__in=self.flows)))
+
+
+class AllArchiveListRestView(LoginRequiredMixin, FlowListMixin, ListResponseMixin, APIViewWithoutCSRFEnforcement):
 
     """All tasks from all processes assigned to current user."""
 
@@ -86,11 +241,46 @@ class AllArchiveListRestView(LoginRequiredMixin, FlowListMixin, APIViewWithoutCS
         return models.Task.objects.archive(self.flows, self.request.user).order_by('-created')
 
     def get(self, request, *args, **kwargs):
-        tasks = list(self.get_queryset())
-        return Response([serializers.TaskSerializer(task, request=request).data for task in tasks])
+        return self.get_list_response(self.get_queryset(), self.serialize_tasks)
+
 
+def perform_process_cancel(request, queryset, max_count=1000):
+    """
+    Cancel the `processes` list of process pks.
 
-class ProcessListRestView(FlowViewPermissionMixin, APIViewWithoutCSRFEnforcement):
+    Returns [{'process': pk, 'result': 'ok' or 'error', 'message': ...}]
+    """
+    process_pks = request.data.get('processes')
+    try:
+        process_pks = [int(process_pk) for process_pk in process_pks]
+    except (TypeError, ValueError):
+        process_pks = []
+    if not 0 < len(process_pks) <= max_count:
+        raise ValidationError({'processes': 'Expected list of 1 to {} process ids'.format(max_count)})
+
+    results = bulk.cancel_processes(queryset.filter(pk__in=process_pks))
+
+    response = []
+    for process_pk in process_pks:
+        message = results.get(process_pk, 'Process not found')
+        response.append({
+            'process': process_pk,
+            'result': 'ok' if message is None else 'error',
+            'message': message})
+    return response
+
+
+class AllProcessCancelRestView(LoginRequiredMixin, FlowListMixin, APIViewWithoutCSRFEnforcement):
+
+    """Cancel many processes of the flows managed by the current user."""
+
+    def post(self, request, *args, **kwargs):
+        flows = [flow_class for flow_class in self.flows
+                 if request.user.has_perm(flow_class.instance.manage_permission_name)]
+        return Response(perform_process_cancel(request, models.Process.objects.filter(flow_class__in=flows)))
+
+
+class ProcessListRestView(FlowViewPermissionMixin, ListResponseMixin, APIViewWithoutCSRFEnforcement):
 
     def __init__(self, **kwargs):
         self._filter = None
@@ -111,11 +301,19 @@ class ProcessListRestView(FlowViewPermissionMixin, APIViewWithoutCSRFEnforcement
             .order_by('-created')
 
     def get(self, request, *args, **kwargs):
-        processes = [p for p in self.filter.qs]
-        return Response([serializers.ProcessSerializer(p).data for p in processes])
+        return self.get_list_response(self.filter.qs, self.serialize_processes)
+
+
+class ProcessCancelRestView(FlowManagePermissionMixin, APIViewWithoutCSRFEnforcement):
+
+    """Cancel many processes of the flow."""
 
+    def post(self, request, *args, **kwargs):
+        return Response(perform_process_cancel(
+            request, self.flow_class.process_class._default_manager.filter(flow_class=self.flow_class)))
 
-class TaskListRestView(FlowViewPermissionMixin, APIViewWithoutCSRFEnforcement):
+
+class TaskListRestView(FlowViewPermissionMixin, ListResponseMixin, APIViewWithoutCSRFEnforcement):
 
     def get_queryset(self):
         return self.flow_class.task_class.objects \
@@ -125,11 +323,10 @@ class TaskListRestView(FlowViewPermissionMixin, APIViewWithoutCSRFEnforcement):
             .order_by('-created')
 
     def get(self, request, *args, **kwargs):
-        tasks = [t for t in self.get_queryset()]
-        return Response([serializers.TaskSerializer(task, request=request).data for task in tasks])
+        return self.get_list_response(self.get_queryset(), self.serialize_tasks)
 
 
-class QueueListRestView(FlowViewPermissionMixin, APIViewWithoutCSRFEnforcement):
+class QueueListRestView(FlowViewPermissionMixin, ListResponseMixin, APIViewWithoutCSRFEnforcement):
 
     def get_queryset(self):
         queryset = self.flow_class.task_class.objects.user_queue(self.request.user, flow_class=self.flow_class) \
@@ -138,11 +335,29 @@ class QueueListRestView(FlowViewPermissionMixin, APIViewWithoutCSRFEnforcement):
         return queryset
 
     def get(self, request, *args, **kwargs):
-        tasks = [t for t in self.get_queryset()]
+        return self.get_list_response(self.get_queryset(), self.serialize_tasks)
+
+
+class QueueClaimRestView(FlowViewPermissionMixin, APIViewWithoutCSRFEnforcement):
+
+    """Assigns the oldest tasks of the flow from the user queue to the current user."""
+
+    def post(self, request, *args, **kwargs):
+        tasks = self.flow_class.task_class._default_manager.claim_next(
+            request.user, [self.flow_class], n=get_claim_count(request))
         return Response([serializers.TaskSerializer(task, request=request).data for task in tasks])
 
 
-class ArchiveListRestView(FlowViewPermissionMixin, APIViewWithoutCSRFEnforcement):
+class TaskActionRestView(FlowViewPermissionMixin, APIViewWithoutCSRFEnforcement):
+
+    """Assign, unassign, cancel or undo many tasks of the flow at once."""
+
+    def post(self, request, *args, **kwargs):
+        return Response(perform_task_actions(request, self.flow_class.task_class._default_manager.filter(
+            process__flow_class=self.flow_class)))
+
+
+class ArchiveListRestView(FlowViewPermissionMixin, ListResponseMixin, APIViewWithoutCSRFEnforcement):
 
     """All tasks from all processes assigned to current user."""
 
@@ -155,5 +370,4 @@ class ArchiveListRestView(FlowViewPermissionMixin, APIViewWithoutCSRFEnforcement
         ).order_by('-created')
 
     def get(self, request, *args, **kwargs):
-        tasks = [t for t in self.get_queryset()]
-        return Response([serializers.TaskSerializer(task, request=request).data for task in tasks])
+        return self.get_list_response(self.get_queryset(), self.serialize_tasks)
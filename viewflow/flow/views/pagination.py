@@ -0,0 +1,171 @@
+"""
+Keyset pagination over `(created, pk)`.
+
+Pages are selected by a `WHERE (created, pk) < (...)` condition on the
+last seen row instead of OFFSET, so deep pages cost the same as the first
+one. Positions are passed as opaque cursors::
+
+    page = paginate_keyset(queryset, request.GET.get('cursor'), per_page=15)
+    page.object_list, page.next_cursor, page.previous_cursor
+
+Total count is optional. With `count_limit` at most `count_limit + 1`
+rows are counted, and larger results are reported as approximate.
+
+Whole querysets are walked by bounded queries with :func:`iterate_keyset`.
+"""
+import base64
+
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_text
+from django.utils.translation import ugettext as _
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(direction, created, pk):
+    """
+    Opaque cursor for the position before (`p`) or after (`n`) the row
+    """
+    value = '{}|{}|{}'.format(direction, created.isoformat(), pk)
+    return force_text(base64.urlsafe_b64encode(force_bytes(value))).rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Returns (direction, created, pk), raises InvalidCursor
+    """
+    try:
+        value = force_text(base64.urlsafe_b64decode(force_bytes(cursor + '=' * (-len(cursor) % 4))))
+        direction, created, pk = value.split('|')
+        created, pk = parse_datetime(created), int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise InvalidCursor(cursor)
+    if direction not in ('n', 'p') or created is None:
+        raise InvalidCursor(cursor)
+    return direction, created, pk
+
+
+def count_capped(queryset, count_limit):
+    """
+    Returns (count, exact), counting no more than `count_limit + 1` rows
+    """
+    if count_limit is None:
+        return queryset.count(), True
+    count = queryset.order_by()[:count_limit + 1].count()
+    if count > count_limit:
+        return count_limit, False
+    return count, True
+
+
+class KeysetPage(object):
+    """
+    Page of the newest first `(created, pk)` ordered rows
+    """
+    def __init__(self, object_list, has_next, has_previous, count=None, count_exact=True):
+        self.object_list = object_list
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.count = count
+        self.count_exact = count_exact
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    @property
+    def next_cursor(self):
+        if self.has_next_page and self.object_list:
+            last = self.object_list[-1]
+            return encode_cursor('n', last.created, last.pk)
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous_page and self.object_list:
+            first = self.object_list[0]
+            return encode_cursor('p', first.created, first.pk)
+
+
+def paginate_keyset(queryset, cursor=None, per_page=15, count=False, count_limit=None):
+    """
+    Page of the queryset, newest first, after or before the `cursor`.
+
+    If `count` is set, the filtered queryset size is reported, capped by
+    `count_limit`.
+    """
+    total, total_exact = None, True
+    if count:
+        total, total_exact = count_capped(queryset, count_limit)
+
+    if not cursor:
+        rows = list(queryset.order_by('-created', '-pk')[:per_page + 1])
+        return KeysetPage(rows[:per_page], len(rows) > per_page, False, total, total_exact)
+
+    direction, created, pk = decode_cursor(cursor)
+    if direction == 'n':
+        rows = list(queryset
+                    .filter(Q(created__lt=created) | Q(created=created, pk__lt=pk))
+                    .order_by('-created', '-pk')[:per_page + 1])
+        return KeysetPage(rows[:per_page], len(rows) > per_page, True, total, total_exact)
+    else:
+        rows = list(queryset
+                    .filter(Q(created__gt=created) | Q(created=created, pk__gt=pk))
+                    .order_by('created', 'pk')[:per_page + 1])
+        return KeysetPage(rows[:per_page][::-1], True, len(rows) > per_page, total, total_exact)
+
+
+def iterate_keyset(queryset, chunk_size=500):
+    """
+    Iterate over the queryset, newest first, by lists of `chunk_size` rows.
+
+    Only one chunk is kept in memory, regardless of the queryset size.
+    """
+    queryset = queryset.order_by('-created', '-pk')
+    rows = list(queryset[:chunk_size])
+    while rows:
+        yield rows
+        if len(rows) < chunk_size:
+            break
+        last = rows[-1]
+        rows = list(queryset.filter(
+            Q(created__lt=last.created) | Q(created=last.created, pk__lt=last.pk))[:chunk_size])
+
+
+class KeysetPaginationMixin(object):
+    """
+    Keyset pagination mode for the list views.
+
+    Enabled by `paginate_keyset`, the `cursor` GET parameter selects the
+    page and `page_obj` is a :class:`KeysetPage`. Set `paginate_count` to
+    show the total number of rows, capped by `paginate_count_limit`.
+    """
+    paginate_keyset = False
+    paginate_count = False
+    paginate_count_limit = 1000
+    cursor_kwarg = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.paginate_keyset:
+            return super(KeysetPaginationMixin, self).paginate_queryset(queryset, page_size)
+
+        try:
+            page = paginate_keyset(
+                queryset, self.request.GET.get(self.cursor_kwarg), per_page=page_size,
+                count=self.paginate_count, count_limit=self.paginate_count_limit)
+        except InvalidCursor:
+            raise Http404(_('Invalid cursor'))
+        return (None, page, page.object_list, page.has_other_pages())
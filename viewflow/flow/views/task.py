@@ -17,6 +17,8 @@ from .utils import get_next_task_url
 class BaseFlowViewMixin(object):
     """
     Mixin for task views, that do not implement activation interface.
+
+    GET requests are read-only, the form is rendered without the flow lock.
     """
 
     def get_context_data(self, **kwargs):
@@ -28,12 +28,24 @@ class FlowViewSet(object):
 
     # TODO cancel_process_view is temporarily removed.
 
+    process_cancel_view = [
+        r'^cancel/$',
+        list_rest.ProcessCancelRestView.as_view(),
+        'process_cancel'
+    ]
+
     queue_list_view = [
         '^queue/$',
         list_rest.QueueListRestView.as_view(),
         'queue',
     ]
 
+    queue_claim_view = [
+        '^queue/claim/$',
+        list_rest.QueueClaimRestView.as_view(),
+        'queue_claim',
+    ]
+
     archive_list_view = [
         '^archive/$',
         list_rest.ArchiveListRestView.as_view(),
@@ -46,6 +58,12 @@ class FlowViewSet(object):
         'tasks'
     ]
 
+    task_action_view = [
+        '^tasks/action/$',
+        list_rest.TaskActionRestView.as_view(),
+        'task_action'
+    ]
+
     def __init__(self, flow_class):
         self.flow_class = flow_class
 
@@ -14,10 +14,35 @@ class Transition(object):
         self.conditions = conditions if conditions else []
 
     def conditions_met(self, instance):
-        return all(map(lambda condition: condition(instance), self.conditions))
+        if not self.conditions:
+            return True
+        return all(condition(instance) for condition in self.conditions)
+
+
+class TransitionTable(object):
+    """
+    Frozen transitions of a class, computed once per class.
+
+    Maps method name to the descriptor and the source state
+    transitions, with super() transitions resolved to the base
+    class definitions.
+    """
+    def __init__(self, state, cls):
+        self.methods = {}  # method name -> (descriptor, {source: transition})
+        self.available = {}  # source -> [(descriptor, transition)]
+
+        for name, descriptor in sorted(inspect.getmembers(cls, lambda attr: isinstance(attr, TransitionDescriptor))):
+            if descriptor.state is not state:
+                continue
+            transitions = dict(descriptor.get_class_transitions(cls))
+            self.methods[name] = (descriptor, transitions)
+            for source, transition in transitions.items():
+                self.available.setdefault(source, []).append((descriptor, transition))
 
 
 class TransitionMethod(object):
+    __slots__ = ('descriptor', 'instance')
+
     do_not_call_in_templates = True
 
     def __init__(self, descriptor, instance):
@@ -56,22 +81,41 @@ class TransitionDescriptor(object):
     def get_transitions(self, instance):
         return self.transitions
 
+    def get_class_transitions(self, cls):
+        return self.transitions
+
     def get_transition(self, source_state, instance=None):
         transition = self.transitions.get(source_state, None)
         if transition is None:
             transition = self.transitions.get('*', None)
         return transition
 
+    def lookup(self, instance):
+        """
+        Transition from the current instance state, a class transition table hit
+        """
+        entry = self.state.get_table(type(instance)).methods.get(self.name)
+        if entry is not None and entry[0] is self:
+            transitions = entry[1]
+        else:
+            transitions = self.get_transitions(instance)
+
+        transition = transitions.get(self.state.get(instance))
+        if transition is None:
+            transition = transitions.get('*')
+        return transition
+
     def can_proceed(self, instance, check_conditions=True):
-        current_state = self.state.get(instance)
-        transition = self.get_transition(current_state, instance)
+        transition = self.lookup(instance)
         if transition:
             return transition.conditions_met(instance)
         return False
 
     def __call__(self, instance, *args, **kwargs):
+        self.state.notify(instance, self.name)
+
         current_state = self.state.get(instance)
-        transition = self.get_transition(current_state, instance)
+        transition = self.lookup(instance)
 
         if transition is None:
             raise TransitionNotAllowed('No transition from {0}'.format(current_state))
@@ -91,14 +135,21 @@ class TransitionDescriptor(object):
             return result
 
     def __get__(self, instance, type=None):
-        return TransitionMethod(self, instance) if instance else self
+        if not instance:
+            return self
+
+        # not cached on the instance, to keep the instance free of reference cycles
+        return TransitionMethod(self, instance)
 
 
 class SuperTransitionDescriptor(TransitionDescriptor):
     def get_descriptor(self, instance):
-        for cls in instance.__class__.__mro__:
-            if hasattr(cls, self.name):
-                super_descriptor = getattr(cls, self.name)
+        return self.get_class_descriptor(instance.__class__)
+
+    def get_class_descriptor(self, cls):
+        for base in cls.__mro__:
+            if hasattr(base, self.name):
+                super_descriptor = getattr(base, self.name)
                 if not isinstance(super_descriptor, SuperTransitionDescriptor):
                     break
         else:
@@ -106,6 +157,9 @@ class SuperTransitionDescriptor(TransitionDescriptor):
 
         return super_descriptor
 
+    def get_class_transitions(self, cls):
+        return self.get_class_descriptor(cls).transitions
+
     def get_transition(self, source_state, instance):
         descriptor = self.get_descriptor(instance)
         return descriptor.get_transition(source_state, instance)
@@ -114,14 +168,11 @@ class SuperTransitionDescriptor(TransitionDescriptor):
         descriptor = self.get_descriptor(instance)
         return descriptor.transitions
 
-    def can_proceed(self, instance, check_conditions=True):
-        descriptor = self.get_descriptor(instance)
-        return descriptor.can_proceed(instance, check_conditions=check_conditions)
-
     def __call__(self, instance, *args, **kwargs):
-        descriptor = self.get_descriptor(instance)
+        self.state.notify(instance, self.name)
+
         current_state = self.state.get(instance)
-        transition = descriptor.get_transition(current_state, instance)
+        transition = self.lookup(instance)
 
         if transition is None:
             raise TransitionNotAllowed('No transition from {0}'.format(current_state))
@@ -144,8 +195,10 @@ class SuperTransitionDescriptor(TransitionDescriptor):
 class State(object):
     def __init__(self, default=None):
         self._default = default
+        self._table_name = '_fsm_table{}'.format(id(self))
         self._setter = None
         self._getter = None
+        self._on_transition = None
 
     def __get__(self, instance, type=None):
         if instance is None:
@@ -168,10 +221,24 @@ class State(object):
         else:
             setattr(instance, self.propname, value)
 
+    def notify(self, instance, name):
+        if self._on_transition:
+            self._on_transition(instance, name)
+
     @property
     def propname(self):
         return '_fsm{}'.format(id(self))
 
+    def get_table(self, cls):
+        """
+        Transition table of the class, built on the first use
+        """
+        table = cls.__dict__.get(self._table_name)
+        if table is None:
+            table = TransitionTable(self, cls)
+            setattr(cls, self._table_name, table)
+        return table
+
     def transition(self, source=None, target=None, conditions=None):
         def _wrapper(func):
             transition_wrapper = getattr(func, '_transition', None)
@@ -209,21 +276,21 @@ class State(object):
             return func
         return _wrapper
 
+    def on_transition(self):
+        """
+        Register a callback `(instance, transition_name)`, called
+        before the transition state check.
+        """
+        def _wrapper(func):
+            self._on_transition = func
+            return func
+        return _wrapper
+
     def get_available_transtions(self, instance):
-        transitions_cache = instance.__class__.__dict__.get('_transitions{}'.format(self.propname), None)
-        if transitions_cache is None:
-            transitions_cache = {}
-            descriptors = inspect.getmembers(instance.__class__, lambda attr: isinstance(attr, TransitionDescriptor))
-            for method_name, descriptor in descriptors:
-                for source, transition in descriptor.get_transitions(instance).items():
-                    if source not in transitions_cache:
-                        transitions_cache[source] = []
-                    transitions_cache[source].append(descriptor)
-
-            setattr(instance.__class__, '_transitions{}'.format(self.propname), transitions_cache)
-
-        result = [descriptor for descriptor in transitions_cache.get(self.get(instance), [])
-                  if descriptor.can_proceed(instance)]
-        result += [descriptor for descriptor in transitions_cache.get('*', [])
-                   if descriptor.can_proceed(instance)]
+        available = self.get_table(instance.__class__).available
+
+        result = [descriptor for descriptor, transition in available.get(self.get(instance), [])
+                  if transition.conditions_met(instance)]
+        result += [descriptor for descriptor, transition in available.get('*', [])
+                   if transition.conditions_met(instance)]
         return result
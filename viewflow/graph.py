@@ -0,0 +1,185 @@
+"""
+In-memory graph of the process tasks.
+
+All tasks of a process and their `previous` links are loaded by two
+queries, and then looked up without database access::
+
+    graph = ProcessGraph.get(flow_class, process_pk)
+    graph.previous(task), graph.leading(task), graph.by_token()
+
+While the flow lock is held, the loaded graph is cached and shared
+by all consumers. A task save or a `previous` links change of the
+process drops the cached graph, so it is reloaded on the next use.
+"""
+import threading
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+
+from .activation import STATUS
+
+
+_local = threading.local()
+
+
+def _scopes():
+    if not hasattr(_local, 'graphs'):
+        _local.graphs = {}  # (flow_class, process_pk) -> graph or None
+    return _local.graphs
+
+
+@contextmanager
+def cache_scope(flow_class, process_pk):
+    """
+    Cache the process graph until the scope exit
+    """
+    graphs, key = _scopes(), (flow_class, process_pk)
+    if key in graphs:
+        # nested lock of the same process
+        yield
+        return
+
+    graphs[key] = None
+    try:
+        yield
+    finally:
+        graphs.pop(key, None)
+
+
+def invalidate(process_pk):
+    """
+    Drop cached graphs of the process
+    """
+    graphs = getattr(_local, 'graphs', None)
+    if graphs:
+        for key in graphs:
+            if key[1] == process_pk:
+                graphs[key] = None
+
+
+class ProcessGraph(object):
+    """
+    Tasks of a process with the `previous` links between them.
+
+    Task instances are a snapshot, taken on the graph load.
+    """
+    def __init__(self, flow_class, process_pk, tasks, links):
+        self.flow_class = flow_class
+        self.process_pk = process_pk
+        self.tasks = tasks  # ordered by creation
+        self._tasks = {task.pk: task for task in tasks}
+
+        self._previous, self._leading = defaultdict(list), defaultdict(list)
+        for task_pk, previous_pk in links:
+            if task_pk in self._tasks and previous_pk in self._tasks:
+                self._previous[task_pk].append(self._tasks[previous_pk])
+                self._leading[previous_pk].append(self._tasks[task_pk])
+
+    @classmethod
+    def load_many(cls, flow_class, process_pks):
+        """
+        Load graphs of the processes, returns {process_pk: graph}
+        """
+        process_pks = list(process_pks)
+        if not process_pks:
+            return {}
+
+        task_class = flow_class.task_class
+        tasks = task_class._default_manager \
+            .filter(process_id__in=process_pks) \
+            .select_related('process') \
+            .order_by('created', 'pk')
+
+        field = task_class._meta.get_field('previous')
+        from_name, to_name = field.m2m_field_name(), field.m2m_reverse_field_name()
+        links = task_class.previous.through._default_manager \
+            .filter(**{'{}__process_id__in'.format(from_name): process_pks}) \
+            .values_list('{}_id'.format(from_name), '{}_id'.format(to_name))
+
+        process_tasks, process_links = defaultdict(list), defaultdict(list)
+        for task in tasks:
+            process_tasks[task.process_id].append(task)
+        task_processes = {task.pk: task.process_id for tasks in process_tasks.values() for task in tasks}
+        for task_pk, previous_pk in links:
+            process_links[task_processes.get(task_pk)].append((task_pk, previous_pk))
+
+        return {
+            process_pk: cls(flow_class, process_pk, process_tasks[process_pk], process_links[process_pk])
+            for process_pk in process_pks}
+
+    @classmethod
+    def get_many(cls, flow_class, process_pks):
+        """
+        Return {process_pk: graph}, cached graphs reused, and loaded
+        graphs cached for the processes locked by the current thread.
+        """
+        graphs, result, missing = _scopes(), {}, []
+        for process_pk in process_pks:
+            graph = graphs.get((flow_class, process_pk))
+            if graph is not None:
+                result[process_pk] = graph
+            else:
+                missing.append(process_pk)
+
+        for process_pk, graph in cls.load_many(flow_class, missing).items():
+            if (flow_class, process_pk) in graphs:
+                graphs[(flow_class, process_pk)] = graph
+            result[process_pk] = graph
+        return result
+
+    @classmethod
+    def get(cls, flow_class, process_pk):
+        return cls.get_many(flow_class, [process_pk])[process_pk]
+
+    @classmethod
+    def cached(cls, flow_class, process_pk):
+        """
+        Already loaded graph of the locked process, or None
+        """
+        graphs = getattr(_local, 'graphs', None)
+        if graphs:
+            return graphs.get((flow_class, process_pk))
+
+    def __contains__(self, task):
+        return getattr(task, 'pk', task) in self._tasks
+
+    def task(self, task_pk):
+        return self._tasks[task_pk]
+
+    def previous(self, task):
+        return self._previous[getattr(task, 'pk', task)]
+
+    def leading(self, task):
+        return self._leading[getattr(task, 'pk', task)]
+
+    def statuses(self):
+        """
+        {task_pk: status}
+        """
+        return {task.pk: task.status for task in self.tasks}
+
+    def by_status(self):
+        """
+        {status: [tasks]}
+        """
+        result = defaultdict(list)
+        for task in self.tasks:
+            result[task.status].append(task)
+        return result
+
+    def by_token(self):
+        """
+        {token: [tasks]}, in the order of the token first appearance
+        """
+        result = OrderedDict()
+        for task in self.tasks:
+            result.setdefault(str(task.token), []).append(task)
+        return result
+
+    def active(self):
+        """
+        Tasks not yet done or canceled
+        """
+        return [task for task in self.tasks if task.status not in [STATUS.DONE, STATUS.CANCELED]]
+
+    def all_leading_canceled(self, task):
+        return all(leading.status == STATUS.CANCELED for leading in self.leading(task))
@@ -0,0 +1,73 @@
+"""
+Database indexes for the hot task queries.
+
+Composite indexes are declared through the task model `Meta.index_together`::
+
+    class MyTask(AbstractTask):
+        process = models.ForeignKey(MyProcess)
+        owner = models.ForeignKey(settings.AUTH_USER_MODEL, blank=True, null=True)
+        owner_permission = models.CharField(max_length=255, blank=True, null=True)
+
+        class Meta:
+            index_together = TASK_INDEX_TOGETHER
+
+Partial indexes are created by the `create_partial_indexes` migration operation
+on the backends that support them (PostgreSQL and SQLite).
+"""
+
+TASK_INDEX_TOGETHER = (
+    ('owner', 'status'),  # TaskQuerySet.inbox
+    ('flow_task_type', 'status', 'owner_permission'),  # TaskQuerySet.queue
+    ('owner', 'finished'),  # TaskQuerySet.user_archive/archive
+    ('process', 'flow_task', 'status'),  # JoinActivation.activate
+)
+
+
+TASK_PARTIAL_INDEXES = (
+    # name suffix, columns, condition
+    ('inbox', ('owner_id', 'created'), "status = 'ASSIGNED'"),
+    ('queue', ('flow_task_type', 'owner_permission', 'created'), "status = 'NEW'"),
+    ('active', ('process_id',), "finished IS NULL"),
+)
+
+
+PARTIAL_INDEX_VENDORS = ('postgresql', 'sqlite')
+
+
+def create_partial_indexes(app_label, model_name, indexes=TASK_PARTIAL_INDEXES):
+    """
+    Migration operation that creates task partial indexes,
+    no-op for backends without partial index support.
+    """
+    from django.db import migrations
+
+    def get_index_name(table, suffix):
+        return '{}_{}_partial'.format(table, suffix)
+
+    def forwards(apps, schema_editor):
+        connection = schema_editor.connection
+        if connection.vendor not in PARTIAL_INDEX_VENDORS:
+            return
+
+        table = apps.get_model(app_label, model_name)._meta.db_table
+        quote_name = schema_editor.quote_name
+
+        for suffix, columns, condition in indexes:
+            schema_editor.execute('CREATE INDEX {} ON {} ({}) WHERE {}'.format(
+                quote_name(get_index_name(table, suffix)),
+                quote_name(table),
+                ', '.join(quote_name(column) for column in columns),
+                condition))
+
+    def backwards(apps, schema_editor):
+        connection = schema_editor.connection
+        if connection.vendor not in PARTIAL_INDEX_VENDORS:
+            return
+
+        table = apps.get_model(app_label, model_name)._meta.db_table
+
+        for suffix, _, _ in indexes:
+            schema_editor.execute('DROP INDEX {}'.format(
+                schema_editor.quote_name(get_index_name(table, suffix))))
+
+    return migrations.RunPython(forwards, backwards)
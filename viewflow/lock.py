@@ -3,12 +3,68 @@ Prevents inconsistent db updates for flow.
 """
 import time
 import random
+import zlib
 from contextlib import contextmanager
 
 from django.core.cache import cache as default_cache
-from django.db import transaction, DatabaseError
+from django.db import models, transaction, DatabaseError
 
-from viewflow.exceptions import FlowLockFailed
+from viewflow import graph, signals
+from viewflow.exceptions import FlowLockConflict, FlowLockFailed
+
+
+class LockStats(object):
+    """
+    Lock acquisition measurements.
+
+    Reported by :data:`viewflow.signals.lock_stats` with
+    `outcome` one of 'released', 'error' (exception inside
+    the lock), 'conflict' (optimistic lock conflict)
+    or 'failed' (lock not acquired).
+    """
+    def __init__(self, flow_class, process_pk):
+        self.flow_class = flow_class
+        self.process_pk = process_pk
+        self.attempts = 0
+        self.started = time.time()
+        self.acquired = None
+
+    def attempt(self):
+        self.attempts += 1
+
+    @contextmanager
+    def held(self):
+        """
+        Measure the lock hold time. The process graph
+        loaded while the lock is held, is cached.
+        """
+        self.acquired = time.time()
+        try:
+            with graph.cache_scope(self.flow_class, self.process_pk):
+                yield
+        except FlowLockConflict:
+            self.report('conflict')
+            raise
+        except Exception:
+            self.report('error')
+            raise
+        else:
+            self.report('released')
+
+    def report(self, outcome):
+        if not signals.lock_stats.has_listeners(self.flow_class):
+            return
+
+        finished = time.time()
+        acquired = self.acquired if self.acquired is not None else finished
+        signals.lock_stats.send(
+            sender=self.flow_class,
+            flow_label=self.flow_class._meta.flow_label,
+            process_pk=self.process_pk,
+            wait_time=acquired - self.started,
+            attempts=self.attempts,
+            hold_time=finished - acquired,
+            outcome=outcome)
 
 
 def no_lock(flow):
@@ -18,11 +74,49 @@ def no_lock(flow):
     """
     @contextmanager
     def lock(flow_class, process_pk):
-        with transaction.atomic():
+        stats = LockStats(flow_class, process_pk)
+        stats.attempt()
+        with stats.held(), transaction.atomic():
             yield
     return lock
 
 
+def optimistic_lock(flow, retries=3):
+    """
+    Optimistic concurrency control with the process `version` column.
+
+    No lock is taken. The process version is read on enter, and
+    incremented by compare-and-swap `update ... where version = n`
+    on exit. If the process was modified concurrently, the changes
+    are rolled back and :class:`viewflow.exceptions.FlowLockConflict`
+    is raised. Flow decorators retry the operation up to `retries` times.
+
+    Database errors inside the lock, including serialization failures
+    and deadlocks, are raised as is, and not retried.
+
+    Suitable for flows with rare concurrent modifications of the same process.
+    """
+    @contextmanager
+    def lock(flow_class, process_pk):
+        stats = LockStats(flow_class, process_pk)
+        stats.attempt()
+
+        process = flow_class.process_class._default_manager.filter(pk=process_pk)
+        with transaction.atomic():
+            version = process.values_list('version', flat=True).first()
+            if version is None:
+                stats.report('failed')
+                raise FlowLockFailed('Process not exists')
+
+            with stats.held():
+                yield
+                if not process.filter(version=version).update(version=models.F('version') + 1):
+                    raise FlowLockConflict('Concurrent modification of {} #{}'.format(flow_class, process_pk))
+
+    lock.retries = retries
+    return lock
+
+
 def select_for_update_lock(flow, nowait=True, attempts=5):
     """
     Uses `select ... for update` on process instance row for locking,
@@ -32,24 +126,125 @@ def select_for_update_lock(flow, nowait=True, attempts=5):
     """
     @contextmanager
     def lock(flow_class, process_pk):
+        stats = LockStats(flow_class, process_pk)
         for i in range(attempts):
+            stats.attempt()
             with transaction.atomic():
                 try:
                     process = flow_class.process_class._default_manager.filter(pk=process_pk)
                     if not process.select_for_update(nowait=nowait).exists():
                         raise DatabaseError('Process not exists')
-                    yield
+                    with stats.held():
+                        yield
                     break
                 except DatabaseError:
                     if i != attempts - 1:
                         sleep_time = (((i + 1) * random.random()) + 2 ** i) / 2.5
                         time.sleep(sleep_time)
                     else:
+                        stats.report('failed')
                         raise FlowLockFailed('Lock failed for {}'.format(flow_class))
 
     return lock
 
 
+def _int32(value):
+    value &= 0xffffffff
+    return value - 0x100000000 if value >= 0x80000000 else value
+
+
+def get_advisory_lock_key(flow_class, process_pk):
+    """
+    Pair of signed 32-bit integers, identifying the flow process
+    """
+    flow_label = flow_class._meta.flow_label.encode('utf-8')
+    return _int32(zlib.crc32(flow_label)), _int32(int(process_pk))
+
+
+def _postgresql_lock(cursor, key, timeout):
+    cursor.execute("SELECT current_setting('lock_timeout')")
+    lock_timeout = cursor.fetchone()[0]
+
+    cursor.execute("SELECT set_config('lock_timeout', %s, true)",
+                   ['{}ms'.format(int(timeout * 1000)) if timeout else '0'])
+    cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", key)
+    cursor.execute("SELECT set_config('lock_timeout', %s, true)", [lock_timeout])
+
+
+def _sqlite_lock(process, timeout, stats):
+    """
+    SQLite has only database-level write lock. Busy handler doesn't
+    work for shared-cache connections, so the lock is polled.
+    """
+    deadline = time.time() + timeout if timeout else None
+    while True:
+        stats.attempt()
+        try:
+            process.update(status=models.F('status'))
+            return
+        except DatabaseError:
+            if deadline is not None and time.time() > deadline:
+                raise
+            time.sleep(0.001)
+
+
+def advisory_lock(flow, timeout=10):
+    """
+    Uses database advisory lock keyed by the flow label and the process pk.
+
+    Waits for the lock up to `timeout` seconds, without retries.
+
+    - PostgreSQL: transaction-level `pg_advisory_xact_lock`
+    - MySQL: `GET_LOCK`, released after the transaction commit
+    - SQLite: database write lock, acquired by a no-op process update
+    - Other backends: `select ... for update` of the process row
+
+    Recommended for use with PostgreSQL.
+    """
+    @contextmanager
+    def lock(flow_class, process_pk):
+        stats = LockStats(flow_class, process_pk)
+        connection = transaction.get_connection()
+        mysql_lock = None
+
+        try:
+            with transaction.atomic():
+                key = get_advisory_lock_key(flow_class, process_pk)
+
+                try:
+                    with connection.cursor() as cursor:
+                        if connection.vendor != 'sqlite':
+                            stats.attempt()
+
+                        if connection.vendor == 'postgresql':
+                            _postgresql_lock(cursor, key, timeout)
+                        elif connection.vendor == 'mysql':
+                            name = 'viewflow-{}-{}'.format(*key)
+                            cursor.execute("SELECT GET_LOCK(%s, %s)", [name, timeout if timeout else -1])
+                            if cursor.fetchone()[0] != 1:
+                                raise DatabaseError('Lock wait timeout')
+                            mysql_lock = name
+                        else:
+                            process = flow_class.process_class._default_manager.filter(pk=process_pk)
+                            if connection.vendor == 'sqlite':
+                                _sqlite_lock(process, timeout, stats)
+                            else:
+                                list(process.select_for_update().values_list('pk'))
+                except DatabaseError:
+                    stats.report('failed')
+                    raise FlowLockFailed('Lock failed for {}'.format(flow_class))
+
+                with stats.held():
+                    yield
+        finally:
+            if mysql_lock is not None:
+                # session-level lock, released only after the transaction commit
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT RELEASE_LOCK(%s)", [mysql_lock])
+
+    return lock
+
+
 class CacheLock(object):
     """
     Task lock based on Django's cache.
@@ -72,8 +267,10 @@ class CacheLock(object):
         @contextmanager
         def lock(flow_class, process_pk):
             key = 'django-viewflow-lock-{}/{}'.format(flow_class._meta.flow_label, process_pk)
+            stats = LockStats(flow_class, process_pk)
 
             for i in range(attempts):
+                stats.attempt()
                 process = flow_class.process_class._default_manager.filter(pk=process_pk)
                 if process.exists():
                     stored = cache.add(key, 1, expires)
@@ -83,10 +280,11 @@ class CacheLock(object):
                     sleep_time = (((i + 1) * random.random()) + 2 ** i) / 2.5
                     time.sleep(sleep_time)
             else:
+                stats.report('failed')
                 raise FlowLockFailed('Lock failed for {}'.format(flow_class))
 
             try:
-                with transaction.atomic():
+                with stats.held(), transaction.atomic():
                     yield
             finally:
                 cache.delete(key)
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...activation import STATUS
+from ...bulk import cancel_processes
+from ...fields import import_flow_by_ref
+from ...models import Process
+
+
+class Command(BaseCommand):
+    """
+    Cancel processes with all active tasks.
+
+    Processes are given by primary keys, or all unfinished processes
+    of a flow, by the flow reference like `app_label/flows.MyFlow`.
+    """
+    help = 'Cancel processes and their active tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('process_pk', nargs='*', type=int, help='Processes to cancel')
+        parser.add_argument('--flow', help='Cancel all unfinished processes of the flow')
+        parser.add_argument('--chunk-size', type=int, default=100, help='Processes per transaction')
+
+    def handle(self, *args, **options):
+        processes = Process.objects.all()
+
+        if options['flow']:
+            try:
+                flow_class = import_flow_by_ref(options['flow'])
+            except ImportError as exc:
+                raise CommandError(exc)
+            processes = processes.filter(flow_class=flow_class) \
+                .exclude(status__in=[STATUS.DONE, STATUS.CANCELED])
+        elif not options['process_pk']:
+            raise CommandError('Specify process ids or --flow')
+
+        if options['process_pk']:
+            processes = processes.filter(pk__in=options['process_pk'])
+
+        results = cancel_processes(processes, chunk_size=options['chunk_size'])
+
+        for process_pk, error in sorted(results.items()):
+            if error is not None:
+                self.stderr.write('Process {}: {}'.format(process_pk, error))
+
+        canceled = sum(1 for error in results.values() if error is None)
+        self.stdout.write('{} processes canceled'.format(canceled))
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.fields import FieldDoesNotExist
+
+try:
+    from django.apps import apps
+    get_models = apps.get_models
+except ImportError:
+    # django 1.6
+    from django.db.models import get_models
+
+from ...models import AbstractProcess
+
+
+class Command(BaseCommand):
+    """
+    Recalculate denormalized `creator` and `active_task_count` process columns.
+
+    Required once for processes created before the columns were
+    introduced, and any time the task table was changed bypassing
+    the task models.
+    """
+    help = 'Rebuild denormalized process creator and active tasks count'
+
+    def handle(self, *args, **options):
+        for process_class in get_models():
+            if not issubclass(process_class, AbstractProcess):
+                continue
+            if process_class._meta.get_field('active_task_count').model is not process_class:
+                # multi-table inheritance child, rebuilt with the parent table
+                continue
+
+            flow_class_field = process_class._meta.get_field('flow_class')
+            flow_refs = process_class._default_manager \
+                .order_by().values_list('flow_class', flat=True).distinct()
+
+            for flow_ref in list(flow_refs):
+                flow_class = flow_class_field.to_python(flow_ref)
+                with transaction.atomic():
+                    rebuilt = self.rebuild(process_class, flow_class)
+                self.stdout.write('{}: {} processes rebuilt'.format(flow_class._meta.flow_label, rebuilt))
+
+    def rebuild(self, process_class, flow_class):
+        task_manager = flow_class.task_class._default_manager
+        process_manager = process_class._default_manager
+        tasks = task_manager.filter(process__flow_class=flow_class)
+
+        rebuilt = process_manager.filter(flow_class=flow_class).update(active_task_count=0, creator=None)
+
+        active_counts = tasks.filter(finished__isnull=True) \
+            .order_by().values_list('process').annotate(count=Count('pk'))
+        for process_pk, count in active_counts:
+            process_manager.filter(pk=process_pk).update(active_task_count=count)
+
+        try:
+            flow_class.task_class._meta.get_field('owner')
+        except FieldDoesNotExist:
+            return rebuilt
+
+        creators = tasks.filter(flow_task_type='START', owner__isnull=False) \
+            .values_list('process', 'owner')
+        for process_pk, owner_pk in creators:
+            process_manager.filter(pk=process_pk).update(creator=owner_pk)
+
+        return rebuilt
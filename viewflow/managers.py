@@ -1,9 +1,14 @@
 import django
-from django.db import models
+
+from collections import defaultdict
+from itertools import islice
+
+from django.db import connections, models, transaction
 from django.db.models import Q
 from django.core.exceptions import ObjectDoesNotExist
 from django.db.models.query import QuerySet
 from django.db.models.constants import LOOKUP_SEP
+from django.db.models.sql.constants import GET_ITERATOR_CHUNK_SIZE
 
 from .activation import STATUS
 from .compat import manager_from_queryset
@@ -20,10 +25,22 @@ def _available_flows(flow_classes, user):
     return result
 
 
+_related_path_cache = {}  # (model, base_model) -> related path
+
+
 def _get_related_path(model, base_model):
     """
     Return path suitable for select related for sublcass
     """
+    key = (model, base_model)
+    try:
+        return _related_path_cache[key]
+    except KeyError:
+        related = _related_path_cache[key] = _build_related_path(model, base_model)
+        return related
+
+
+def _build_related_path(model, base_model):
     ancestry = []
 
     if model._meta.proxy:
@@ -73,6 +90,104 @@ def coerce_to_related_instance(instance, target_model):
     return instance
 
 
+def _deferred_loading(query):
+    """
+    Deferred fields of the base model query, applicable to a subclass query.
+    """
+    field_names, defer = query.deferred_loading
+    if defer:
+        field_names = [name for name in field_names if LOOKUP_SEP not in name]
+    else:
+        field_names = [name.partition(LOOKUP_SEP)[0] for name in field_names]
+    return frozenset(field_names), defer
+
+
+def _copy_loaded(source, target, query):
+    """
+    Copy select_related cache, annotations and extra select values.
+    """
+    for field in source._meta.concrete_fields:
+        if field.is_relation:
+            cache_name = field.get_cache_name()
+            if hasattr(source, cache_name):
+                setattr(target, cache_name, getattr(source, cache_name))
+    for name in list(query.annotation_select) + list(query.extra_select):
+        setattr(target, name, getattr(source, name))
+
+
+def coerce_in_batches(instances, base_model, get_target_model, using, query):
+    """
+    Coerce instances to the related subclass instances.
+
+    Instead of joining all subclass tables, instances are grouped by
+    subclass, and each subclass is fetched with a single `pk__in` query
+    per chunk of rows. Related objects, annotations and extra values are
+    taken from the base `query` rows, and its deferred fields are kept.
+    """
+    instances = iter(instances)
+    deferred_loading = _deferred_loading(query)
+
+    while True:
+        chunk = list(islice(instances, GET_ITERATOR_CHUNK_SIZE))
+        if not chunk:
+            break
+
+        pks_by_model = defaultdict(list)
+        for instance in chunk:
+            if isinstance(instance, base_model):
+                target_model = get_target_model(instance)
+                if _get_related_path(target_model, instance.__class__):
+                    pks_by_model[target_model].append(instance.pk)
+
+        fetched = {}
+        for target_model, pks in pks_by_model.items():
+            queryset = target_model._base_manager.using(using).filter(pk__in=pks)
+            queryset.query.deferred_loading = deferred_loading
+            fetched[target_model] = {obj.pk: obj for obj in queryset}
+
+        for instance in chunk:
+            if isinstance(instance, base_model):
+                target_model = get_target_model(instance)
+                if target_model in fetched and instance.pk in fetched[target_model]:
+                    coerced = fetched[target_model][instance.pk]
+                    _copy_loaded(instance, coerced, query)
+                    instance = coerced
+                elif not isinstance(instance, target_model):
+                    # Coerce proxy classes
+                    instance.__class__ = target_model
+            yield instance
+
+
+def prefetch_flow_processes(tasks):
+    """
+    Set `task.process` to the flow process class instances.
+
+    Processes are fetched by a single query per process class, so
+    `task.flow_process` of the tasks needs no more queries.
+    """
+    pks_by_model = defaultdict(set)
+    for task in tasks:
+        if task.flow_task is None:
+            continue
+        process_class = task.flow_task.flow_class.process_class
+        cached = getattr(task, task._meta.get_field('process').get_cache_name(), None)
+        if not isinstance(cached, process_class):
+            pks_by_model[process_class].add(task.process_id)
+
+    fetched = {}
+    for process_class, pks in pks_by_model.items():
+        fetched.update(
+            ((process_class, process.pk), process)
+            for process in process_class._base_manager.filter(pk__in=pks))
+
+    for task in tasks:
+        if task.flow_task is not None:
+            process = fetched.get((task.flow_task.flow_class.process_class, task.process_id))
+            if process is not None:
+                task.process = process
+    return tasks
+
+
 class ProcessQuerySet(QuerySet):
     def filter(self, *args, **kwargs):
         flow_class = kwargs.pop('flow_class', None)
@@ -81,24 +196,45 @@ class ProcessQuerySet(QuerySet):
 
         return super(ProcessQuerySet, self).filter(*args, **kwargs)
 
-    def coerce_for(self, flow_classes):
+    def coerce_for(self, flow_classes, batched=False):
+        """
+        Coerce results to flow process classes.
+
+        With `batched=True` process subclasses are fetched by a separate
+        query per subclass, instead of joining all subclass tables.
+        """
         self._coerced = True
+        self._coerce_batched = batched
 
         flow_classes = list(flow_classes)
+        queryset = self.filter(flow_class__in=flow_classes)
 
-        related = filter(
-            None, map(
-                lambda flow_class: _get_related_path(flow_class.process_class, self.model),
-                flow_classes))
+        if not batched:
+            related = filter(
+                None, map(
+                    lambda flow_class: _get_related_path(flow_class.process_class, self.model),
+                    flow_classes))
+            queryset = queryset.select_related(*related)
 
-        return self.filter(flow_class__in=flow_classes).select_related(*related)
+        return queryset
 
     def filter_available(self, flow_classes, user):
-        return self.model.objects.coerce_for(_available_flows(flow_classes, user))
+        # list views: a query per subclass on the page, instead of joining all subclass tables
+        return self.model.objects.coerce_for(_available_flows(flow_classes, user), batched=True)
+
+    def bulk_cancel(self, chunk_size=100):
+        """
+        Cancel the processes with all active tasks.
+
+        Returns {process_pk: error message or None}.
+        """
+        from .bulk import cancel_processes
+        return cancel_processes(self, chunk_size=chunk_size)
 
     def _clone(self, *args, **kwargs):
         try:
-            kwargs.update({'_coerced': self._coerced})
+            kwargs.update({'_coerced': self._coerced,
+                           '_coerce_batched': self._coerce_batched})
         except AttributeError:
             pass
         return super(ProcessQuerySet, self)._clone(*args, **kwargs)
@@ -108,7 +244,12 @@ class ProcessQuerySet(QuerySet):
         Coerce queryset results to process subclasses depends onf flow_class.process_class
         """
         base_itererator = super(ProcessQuerySet, self).iterator()
-        if getattr(self, '_coerced', False):
+        if getattr(self, '_coerce_batched', False):
+            for process in coerce_in_batches(
+                    base_itererator, self.model,
+                    lambda process: process.flow_class.process_class, self.db, self.query):
+                yield process
+        elif getattr(self, '_coerced', False):
             for process in base_itererator:
                 if isinstance(process, self.model):
                     process = coerce_to_related_instance(process, process.flow_class.process_class)
@@ -118,6 +259,63 @@ class ProcessQuerySet(QuerySet):
                 yield process
 
 
+def _claim_skip_locked(model, candidates, user, n, connection):
+    base_model = model._meta.get_field('status').model
+    process_model = base_model._meta.get_field('process').related_model
+    quote_name = connection.ops.quote_name
+    candidates_sql, params = candidates.values('pk').query.sql_with_params()
+
+    # tasks of the processes locked by `select ... for update` are skipped,
+    # the claimed tasks processes version is incremented for `optimistic_lock`
+    sql = (
+        'WITH claimed AS ('
+        ' UPDATE {table} SET {owner} = %s, {status} = %s, {summary} = NULL WHERE {pk} IN ('
+        '  SELECT task.{pk} FROM {table} task'
+        '  INNER JOIN {process_table} process ON process.{process_pk} = task.{process}'
+        '  WHERE task.{pk} IN ({candidates}) AND task.{status} = %s'
+        '  ORDER BY task.{created}, task.{pk} LIMIT %s FOR UPDATE OF task, process SKIP LOCKED'
+        ' ) RETURNING {pk}, {process}'
+        '), bumped AS ('
+        ' UPDATE {process_table} SET {version} = {version} + 1'
+        ' WHERE {process_pk} IN (SELECT {process} FROM claimed)'
+        ') SELECT {pk} FROM claimed').format(
+            table=quote_name(base_model._meta.db_table),
+            pk=quote_name(base_model._meta.pk.column),
+            owner=quote_name(base_model._meta.get_field('owner').column),
+            status=quote_name(base_model._meta.get_field('status').column),
+            summary=quote_name(base_model._meta.get_field('rendered_summary').column),
+            created=quote_name(base_model._meta.get_field('created').column),
+            process=quote_name(base_model._meta.get_field('process').column),
+            process_table=quote_name(process_model._meta.db_table),
+            process_pk=quote_name(process_model._meta.pk.column),
+            version=quote_name(process_model._meta.get_field('version').column),
+            candidates=candidates_sql)
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(sql, [user.pk, STATUS.ASSIGNED] + list(params) + [STATUS.NEW, n])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _claim_conditional(model, candidates, user, n):
+    process_model = model._meta.get_field('status').model._meta.get_field('process').related_model
+    claimed = []
+    while len(claimed) < n:
+        batch = list(candidates.exclude(pk__in=claimed).values_list('pk', 'process_id')[:n - len(claimed)])
+        if not batch:
+            break
+        for pk, process_pk in batch:
+            with transaction.atomic(using=candidates.db):
+                # the process row is updated first, to wait for `select ... for update`
+                # lock holders, and to conflict with the `optimistic_lock` ones
+                process_model._default_manager.filter(pk=process_pk).update(version=models.F('version') + 1)
+                if model._default_manager.filter(pk=pk, status=STATUS.NEW).update(
+                        owner=user, status=STATUS.ASSIGNED, rendered_summary=None):
+                    claimed.append(pk)
+                else:
+                    transaction.set_rollback(True, using=candidates.db)
+    return claimed
+
+
 class TaskQuerySet(QuerySet):
     def filter(self, *args, **kwargs):
         flow_class = kwargs.pop('process__flow_class', None)
@@ -126,16 +324,27 @@ class TaskQuerySet(QuerySet):
 
         return super(TaskQuerySet, self).filter(*args, **kwargs)
 
-    def coerce_for(self, flow_classes):
+    def coerce_for(self, flow_classes, batched=False):
+        """
+        Coerce results to flow task classes.
+
+        With `batched=True` task subclasses are fetched by a separate
+        query per subclass, instead of joining all subclass tables.
+        """
         self._coerced = True
+        self._coerce_batched = batched
         flow_classes = list(flow_classes)
+        queryset = self.filter(process__flow_class__in=flow_classes)
+
+        if batched:
+            return queryset.select_related('process')
 
         related = filter(
             None, map(
                 lambda flow_class: _get_related_path(flow_class.task_class, self.model),
                 flow_classes))
 
-        return self.filter(process__flow_class__in=flow_classes).select_related('process', *related)
+        return queryset.select_related('process', *related)
 
     def user_queue(self, user, flow_class=None):
         """
@@ -170,7 +379,8 @@ class TaskQuerySet(QuerySet):
         return queryset.filter(owner=user, finished__isnull=False)
 
     def filter_available(self, flow_classes, user):
-        return self.model.objects.coerce_for(_available_flows(flow_classes, user))
+        # list views: a query per subclass on the page, instead of joining all subclass tables
+        return self.model.objects.coerce_for(_available_flows(flow_classes, user), batched=True)
 
     def inbox(self, flow_classes, user):
         """
@@ -194,9 +404,71 @@ class TaskQuerySet(QuerySet):
         return self.filter_available(flow_classes, user) \
             .filter(owner=user, finished__isnull=False)
 
+    def claim_next(self, user, flow_classes, n=1):
+        """
+        Assign up to `n` oldest tasks from the user queue to the user.
+
+        Concurrent claimers get different tasks. On PostgreSQL 9.5+ tasks
+        are picked with `select ... for update skip locked` and assigned
+        by a single `update` statement. Other databases assign candidates
+        one by one, with a conditional update.
+
+        The claimed tasks process row is updated in the same transaction,
+        so claims wait for `select_for_update_lock` holders, and conflict
+        with `optimistic_lock` holders, which loaded the task before.
+        """
+        candidates = self.queue(flow_classes, user).order_by('created', 'pk')
+        connection = connections[self.db]
+
+        if connection.vendor == 'postgresql' and connection.pg_version >= 90500:
+            claimed = _claim_skip_locked(self.model, candidates, user, n, connection)
+        else:
+            claimed = _claim_conditional(self.model, candidates, user, n)
+
+        return list(
+            self.model._default_manager.coerce_for(flow_classes)
+            .filter(pk__in=claimed).order_by('created', 'pk'))
+
+    def bulk_assign(self, user, owner=None):
+        """
+        Assign the tasks to the `owner`, the `user` by default.
+
+        Returns {task_pk: error message or None}.
+        """
+        from .bulk import perform_task_actions
+        return perform_task_actions(self, 'assign', user, owner=owner)
+
+    def bulk_unassign(self, user):
+        """
+        Unassign the tasks.
+
+        Returns {task_pk: error message or None}.
+        """
+        from .bulk import perform_task_actions
+        return perform_task_actions(self, 'unassign', user)
+
+    def bulk_cancel(self, user):
+        """
+        Cancel the tasks.
+
+        Returns {task_pk: error message or None}.
+        """
+        from .bulk import perform_task_actions
+        return perform_task_actions(self, 'cancel', user)
+
+    def bulk_undo(self, user):
+        """
+        Undo the tasks.
+
+        Returns {task_pk: error message or None}.
+        """
+        from .bulk import perform_task_actions
+        return perform_task_actions(self, 'undo', user)
+
     def _clone(self, *args, **kwargs):
         try:
-            kwargs.update({'_coerced': self._coerced})
+            kwargs.update({'_coerced': self._coerced,
+                           '_coerce_batched': self._coerce_batched})
         except AttributeError:
             pass
         return super(TaskQuerySet, self)._clone(*args, **kwargs)
@@ -206,7 +478,12 @@ class TaskQuerySet(QuerySet):
         Coerce queryset results to process subclasses depends onf flow_class.task_class
         """
         base_itererator = super(TaskQuerySet, self).iterator()
-        if getattr(self, '_coerced', False):
+        if getattr(self, '_coerce_batched', False):
+            for task in coerce_in_batches(
+                    base_itererator, self.model,
+                    lambda task: task.flow_task.flow_class.task_class, self.db, self.query):
+                yield task
+        elif getattr(self, '_coerced', False):
             for task in base_itererator:
                 if isinstance(task, self.model):
                     task = coerce_to_related_instance(task, task.flow_task.flow_class.task_class)
@@ -0,0 +1,155 @@
+"""
+In-memory flow lock metrics, with Prometheus text exposition.
+
+Usage::
+
+    # urls.py
+    from viewflow.metrics import lock_metrics
+
+    lock_metrics.connect()
+
+    urlpatterns = [
+        url(r'^metrics/$', lock_metrics.view),
+    ]
+
+Metrics are collected per python process.
+"""
+import bisect
+import heapq
+import threading
+from collections import OrderedDict, defaultdict
+
+from django.http import HttpResponse
+
+from . import signals
+
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram(object):
+    """
+    Cumulative histogram with fixed buckets
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        Return [(upper bound, count)] pairs, including '+Inf'
+        """
+        result, total = [], 0
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+def _labels(**labels):
+    return ','.join('{}="{}"'.format(
+        name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in sorted(labels.items()))
+
+
+class LockMetrics(object):
+    """
+    Aggregates :data:`viewflow.signals.lock_stats` reports.
+
+    :keyword buckets: Histogram buckets, seconds
+    :keyword top_processes: Number of the most waited processes to expose
+    :keyword tracked_processes: Number of the recently locked processes to
+                                keep the wait time for, `top_processes * 10`
+                                by default
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS, top_processes=10, tracked_processes=None):
+        self.buckets = buckets
+        self.top_processes = top_processes
+        self.tracked_processes = tracked_processes or top_processes * 10
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.wait = defaultdict(lambda: Histogram(self.buckets))  # (flow, outcome) -> histogram
+            self.hold = defaultdict(lambda: Histogram(self.buckets))
+            self.attempts = defaultdict(int)  # (flow, outcome) -> attempts total
+            self.process_wait = OrderedDict()  # (flow, process_pk) -> wait total, least recent first
+
+    def connect(self):
+        signals.lock_stats.connect(self.receiver, dispatch_uid=id(self))
+
+    def disconnect(self):
+        signals.lock_stats.disconnect(dispatch_uid=id(self))
+
+    def receiver(self, flow_label, process_pk, wait_time, attempts, hold_time, outcome, **kwargs):
+        key = (flow_label, outcome)
+        with self._lock:
+            self.wait[key].observe(wait_time)
+            if outcome != 'failed':
+                self.hold[key].observe(hold_time)
+            self.attempts[key] += attempts
+
+            process_key = (flow_label, process_pk)
+            self.process_wait[process_key] = self.process_wait.pop(process_key, 0.0) + wait_time
+            if len(self.process_wait) > self.tracked_processes:
+                self.process_wait.popitem(last=False)
+
+    def hot_processes(self):
+        """
+        Return [((flow_label, process_pk), total wait)] of the most waited processes
+
+        Only `tracked_processes` recently locked processes are considered.
+        """
+        with self._lock:
+            return heapq.nlargest(self.top_processes, self.process_wait.items(), key=lambda item: item[1])
+
+    def _histogram_lines(self, name, help_text, histograms):
+        lines = ['# HELP {} {}'.format(name, help_text), '# TYPE {} histogram'.format(name)]
+        for (flow_label, outcome), histogram in sorted(histograms.items()):
+            for bound, count in histogram.cumulative():
+                lines.append('{}_bucket{{{}}} {}'.format(
+                    name, _labels(flow=flow_label, outcome=outcome, le=bound), count))
+            labels = _labels(flow=flow_label, outcome=outcome)
+            lines.append('{}_sum{{{}}} {!r}'.format(name, labels, histogram.sum))
+            lines.append('{}_count{{{}}} {}'.format(name, labels, histogram.count))
+        return lines
+
+    def exposition(self):
+        """
+        Metrics in Prometheus text format
+        """
+        hot_processes = self.hot_processes()
+
+        with self._lock:
+            lines = self._histogram_lines(
+                'viewflow_lock_wait_seconds', 'Time spent acquiring the flow lock.', self.wait)
+            lines += self._histogram_lines(
+                'viewflow_lock_hold_seconds', 'Time the flow lock was held.', self.hold)
+
+            lines += ['# HELP viewflow_lock_attempts_total Flow lock acquisition attempts.',
+                      '# TYPE viewflow_lock_attempts_total counter']
+            for (flow_label, outcome), attempts in sorted(self.attempts.items()):
+                lines.append('viewflow_lock_attempts_total{{{}}} {}'.format(
+                    _labels(flow=flow_label, outcome=outcome), attempts))
+
+        lines += ['# HELP viewflow_lock_process_wait_seconds Lock wait time of the most contended processes.',
+                  '# TYPE viewflow_lock_process_wait_seconds gauge']
+        for (flow_label, process_pk), wait_time in hot_processes:
+            lines.append('viewflow_lock_process_wait_seconds{{{}}} {!r}'.format(
+                _labels(flow=flow_label, process=process_pk), wait_time))
+
+        return '\n'.join(lines) + '\n'
+
+    def view(self, request):
+        return HttpResponse(self.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+lock_metrics = LockMetrics()
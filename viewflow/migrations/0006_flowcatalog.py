@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewflow', '0005_rename_flowcls'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlowCatalog',
+            fields=[
+                ('id', models.AutoField(primary_key=True, verbose_name='ID', serialize=False, auto_created=True)),
+                ('ref', models.CharField(max_length=255, unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Flow catalog',
+            },
+        ),
+    ]
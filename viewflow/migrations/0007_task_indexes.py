@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations
+
+from viewflow.indexes import create_partial_indexes
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('viewflow', '0006_flowcatalog'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='task',
+            index_together=set([
+                ('owner', 'status'),
+                ('flow_task_type', 'status', 'owner_permission'),
+                ('owner', 'finished'),
+                ('process', 'flow_task', 'status')]),
+        ),
+        create_partial_indexes('viewflow', 'Task'),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewflow', '0009_process_denormalized_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='process',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
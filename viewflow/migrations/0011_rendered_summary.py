@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewflow', '0010_process_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='process',
+            name='rendered_summary',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='rendered_summary',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
@@ -1,15 +1,71 @@
 from __future__ import unicode_literals
 from django.conf import settings
-from django.core.urlresolvers import reverse, NoReverseMatch
+from django.core.urlresolvers import reverse, NoReverseMatch, get_script_prefix, get_urlconf
 from django.db import models
+from django.db.models import F
+from django.db.models.signals import m2m_changed
 from django.template import Template, Context
 
+from . import graph
 from .activation import STATUS
 from .exceptions import FlowRuntimeError
 from .fields import FlowReferenceField, TaskReferenceField, TokenField
+from .indexes import TASK_INDEX_TOGETHER
 from .managers import ProcessManager, TaskManager, coerce_to_related_instance
 
 
+_template_cache = {}  # template source -> compiled template
+_task_url_cache = {}  # (urlconf, script prefix, view name) -> url format string or None
+_URL_PROCESS_PK, _URL_TASK_PK = 8642097531, 9753108642  # placeholders, unlikely to appear in a url
+
+
+def get_summary_template(source):
+    """
+    Compiled summary template, cached by the template source
+    """
+    template = _template_cache.get(source)
+    if template is None:
+        template = _template_cache[source] = Template(source)
+    return template
+
+
+def reverse_task_url(view_name, process_pk, task_pk):
+    """
+    Reverse `view_name` with the process and task pks.
+
+    The url is reversed once per view name, and then formatted for
+    each task. Returns None if the url does not exist.
+    """
+    key = (get_urlconf() or settings.ROOT_URLCONF, get_script_prefix(), view_name)
+    try:
+        url_format = _task_url_cache[key]
+    except KeyError:
+        try:
+            url = reverse(view_name, args=[_URL_PROCESS_PK, _URL_TASK_PK])
+        except NoReverseMatch:
+            url_format = None
+        else:
+            url_format = url.replace('{', '{{').replace('}', '}}') \
+                .replace(str(_URL_PROCESS_PK), '{0}').replace(str(_URL_TASK_PK), '{1}')
+        _task_url_cache[key] = url_format
+
+    if url_format is not None:
+        return url_format.format(process_pk, task_pk)
+
+
+class FlowCatalog(models.Model):
+    """
+    Integer ids for flow and task references, used by compact reference fields
+    """
+    ref = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.ref
+
+    class Meta:
+        verbose_name_plural = 'Flow catalog'
+
+
 class AbstractProcess(models.Model):
     """
     Base class for Process data object
@@ -20,10 +76,23 @@ class AbstractProcess(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     finished = models.DateTimeField(blank=True, null=True)
 
+    # denormalized process state, NULL for processes created before
+    # the columns were introduced, see `rebuild_process_counters` command
+    creator = models.ForeignKey(settings.AUTH_USER_MODEL, blank=True, null=True, related_name='+')
+    active_task_count = models.PositiveIntegerField(blank=True, null=True)
+
+    # incremented by `viewflow.lock.optimistic_lock`
+    version = models.PositiveIntegerField(default=0)
+
+    # `summary()` rendered on save, if flow `materialize_summary` is enabled
+    rendered_summary = models.TextField(blank=True, null=True)
+
     objects = ProcessManager()
 
     @property
     def created_by(self):
+        if self.creator_id is not None:
+            return self.creator
         return self.flow_class.task_class._default_manager \
             .get(process=self, flow_task_type='START').owner
 
@@ -48,16 +117,44 @@ class AbstractProcess(models.Model):
         """
         Quick textual process state representation for end user
         """
+        if self.rendered_summary is not None and self.flow_class and self.flow_class.materialize_summary:
+            return self.rendered_summary
+        return self.render_summary()
+
+    def render_summary(self):
         if self.flow_class and self.flow_class.process_class == type(self):
-            return Template(self.flow_class.summary_template).render(Context({'process': self, 'flow_class': self.flow_class}))
+            return get_summary_template(self.flow_class.summary_template).render(
+                Context({'process': self, 'flow_class': self.flow_class}))
 
         return "{} - {}".format(self.flow_class.process_title, self.status)
 
+    def refresh_summary(self):
+        """
+        Update materialized summary, if enabled for the flow
+        """
+        if self.flow_class and self.flow_class.materialize_summary:
+            self.rendered_summary = self.render_summary()
+
     def __str__(self):
         if self.flow_class:
             return '{} #{}'.format(self.flow_class.process_title, self.pk)
         return "<Process {}> - {}".format(self.pk, self.status)
 
+    def save(self, *args, **kwargs):
+        self.refresh_summary()
+
+        if self._state.adding and self.active_task_count is None:
+            self.active_task_count = 0
+
+        super(AbstractProcess, self).save(*args, **kwargs)
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        if update_fields is None:
+            # active_task_count and version are maintained with atomic
+            # updates, an in-memory value could be stale. Inserts write all columns.
+            values = [value for value in values if value[0].name not in ('active_task_count', 'version')]
+        return super(AbstractProcess, self)._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+
     def refresh_from_db(self, using=None, fields=None, **kwargs):
         if hasattr(models.Model, 'refresh_from_db'):
             super(AbstractProcess, self).refresh_from_db(using=using, fields=fields, **kwargs)
@@ -92,8 +189,20 @@ class AbstractTask(models.Model):
     previous = models.ManyToManyField('self', symmetrical=False, related_name='leading')
     token = TokenField(default='start')
 
+    join_expected = models.PositiveIntegerField(blank=True, null=True)
+    join_arrived = models.PositiveIntegerField(blank=True, null=True)
+
+    # `summary()` rendered on save, if flow `materialize_summary` is enabled
+    rendered_summary = models.TextField(blank=True, null=True)
+
     objects = TaskManager()
 
+    def __init__(self, *args, **kwargs):
+        super(AbstractTask, self).__init__(*args, **kwargs)
+        if 'finished' in self.__dict__:
+            # deferred `finished` is not loaded here, see `get_persisted_active`
+            self._persisted_active = self.pk is not None and self.finished is None
+
     @property
     def flow_process(self):
         """
@@ -106,10 +215,15 @@ class AbstractTask(models.Model):
         """
         Quick textual task result representation for end user
         """
+        if self.rendered_summary is not None and self.flow_task and self.flow_task.flow_class.materialize_summary:
+            return self.rendered_summary
+        return self.render_summary()
+
+    def render_summary(self):
         if self.flow_task:
             if self.finished:
                 if hasattr(self.flow_task, 'task_result_summary'):
-                    return Template(self.flow_task.task_result_summary or "").render(Context({
+                    return get_summary_template(self.flow_task.task_result_summary or "").render(Context({
                         'process': self.flow_process,
                         'task': self,
                         'flow_class': self.flow_task.flow_class,
@@ -120,14 +234,53 @@ class AbstractTask(models.Model):
 
         return ""
 
+    def refresh_summary(self):
+        """
+        Update materialized summary, if enabled for the flow
+        """
+        if self.flow_task and self.flow_task.flow_class.materialize_summary:
+            self.rendered_summary = self.render_summary()
+
     def save(self, *args, **kwargs):
         if self.status == STATUS.PREPARED:
             raise FlowRuntimeError("Can't save task with intermediate status - PREPARED")
 
         if self.flow_task:
             self.flow_task_type = self.flow_task.task_type
+        self.refresh_summary()
+
+        persisted_active = self.get_persisted_active()
+        is_active = self.finished is None
+        delta = int(is_active) - int(persisted_active)
 
         super(AbstractTask, self).save(*args, **kwargs)
+        graph.invalidate(self.process_id)
+
+        if delta and self.flow_task:
+            self._update_active_task_count(delta)
+        self._persisted_active = is_active
+
+    def get_persisted_active(self):
+        """
+        Check that the task is unfinished in the database
+        """
+        if '_persisted_active' in self.__dict__:
+            return self._persisted_active
+        elif 'finished' not in self.__dict__:
+            # deferred and not changed since the task was loaded
+            return self.finished is None
+        return self.__class__._default_manager.filter(pk=self.pk, finished__isnull=True).exists()
+
+    def _update_active_task_count(self, delta):
+        """
+        Keep process active tasks counter in sync, processes
+        with unknown (NULL) counter are left untouched.
+        """
+        process_class = self.flow_task.flow_class.process_class
+        process_class = process_class._meta.get_field('active_task_count').model
+        process_class._default_manager \
+            .filter(pk=self.process_id) \
+            .update(active_task_count=F('active_task_count') + delta)
 
     def activate(self):
         """
@@ -159,14 +312,12 @@ class AbstractTask(models.Model):
 
     def get_url(self, url_type=None):
         # Ideas copied from get_task_url() methods.
-        namespace = 'rest_viewflow_app_' + self.flow_process._meta.app_label
+        namespace = 'rest_viewflow_app_' + self.flow_task.flow_class.process_class._meta.app_label
         view_name = '{}:{}'.format(namespace, self.flow_task.name)
         if url_type:
             view_name += '__' + url_type
-        try:
-            return reverse(view_name, args=[self.process_id, self.pk])
-        except NoReverseMatch:  # certain non-HUMAN tasks do not expose URLs.
-            return None
+        # certain non-HUMAN tasks do not expose URLs.
+        return reverse_task_url(view_name, self.process_id, self.pk)
 
     class Meta:
         abstract = True
@@ -185,3 +336,14 @@ class Task(AbstractTask):
     owner_permission = models.CharField(max_length=255, blank=True, null=True)
 
     comments = models.TextField(blank=True, null=True)
+
+    class Meta:
+        index_together = TASK_INDEX_TOGETHER
+
+
+def _task_links_changed(sender, instance, action, **kwargs):
+    if isinstance(instance, AbstractTask) and action.startswith('post_'):
+        graph.invalidate(instance.process_id)
+
+
+m2m_changed.connect(_task_links_changed, dispatch_uid='viewflow_task_links_changed')
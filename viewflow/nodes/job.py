@@ -1,3 +1,5 @@
+import threading
+
 from .. import Task, mixins
 
 
@@ -20,7 +22,44 @@ class AbstractJob(mixins.TaskDescriptionMixin,
     def __init__(self, job, **kwargs):
         super(AbstractJob, self).__init__(**kwargs)
         self._job = job
+        self._optimistic_threshold = None
+        self._average_duration = None
+        self._stats_lock = threading.Lock()
 
     @property
     def job(self):
         return self._job
+
+    def Optimistic(self, threshold):
+        """
+        Run short jobs with a single process lock acquisition.
+
+        If the average duration of the previous runs is within `threshold`
+        seconds, the task is claimed as started by a conditional update,
+        without the process lock, so a duplicate job delivery is skipped.
+        After the execution, the task is finished under the lock, if it
+        was not changed meanwhile. Longer jobs are started and finished
+        under separate locks.
+        """
+        self._optimistic_threshold = threshold
+        return self
+
+    def use_optimistic(self):
+        """
+        Check that the next job run is expected to be short
+        """
+        if self._optimistic_threshold is None:
+            return False
+        with self._stats_lock:
+            average_duration = self._average_duration
+        return average_duration is None or average_duration <= self._optimistic_threshold
+
+    def observe_duration(self, duration):
+        """
+        Update exponential moving average of the job duration
+        """
+        with self._stats_lock:
+            if self._average_duration is None:
+                self._average_duration = duration
+            else:
+                self._average_duration = 0.8 * self._average_duration + 0.2 * duration
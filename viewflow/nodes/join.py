@@ -1,8 +1,10 @@
+from django.db import models
 from django.utils.timezone import now
 
 from .. import Gateway, mixins, signals
 from ..activation import Activation, STATUS, all_leading_canceled
 from ..exceptions import FlowRuntimeError
+from ..graph import ProcessGraph
 
 
 class JoinActivation(Activation):
@@ -32,24 +34,69 @@ class JoinActivation(Activation):
 
             self.activate_next()
 
-    def is_done(self):
-        if not self.flow_task._wait_all:
-            return True
-
+    def get_join_prefix(self, graph):
+        """
+        Token prefix common for all tasks of the joined split branches.
+        """
         join_prefixes = set(
             prev.token.get_common_split_prefix(self.task.token, prev.pk)
-            for prev in self.task.previous.exclude(status=STATUS.CANCELED).all())
+            for prev in graph.previous(self.task) if prev.status != STATUS.CANCELED)
 
         if len(join_prefixes) > 1:
             raise FlowRuntimeError('Multiple tokens {} cames to join {}'.format(join_prefixes, self.flow_task.name))
 
-        join_token_prefix = next(iter(join_prefixes))
+        return next(iter(join_prefixes))
+
+    def recount(self):
+        """
+        Recalculate and persist join counters from the process tasks state.
+
+        Each split branch is expected to arrive to the join once, canceled
+        branches are not expected at all.
+        """
+        graph = ProcessGraph.get(self.flow_class, self.task.process_id)
+        join_token_prefix = self.get_join_prefix(graph)
+
+        def branch(token):
+            token = str(token)
+            if token.startswith(join_token_prefix):
+                return token[len(join_token_prefix):].split('/', 1)[0]
+            return token
 
-        active = self.flow_class.task_class._default_manager \
-            .filter(process=self.process, token__startswith=join_token_prefix) \
-            .exclude(status__in=[STATUS.DONE, STATUS.CANCELED])
+        arrived = set(branch(prev.token) for prev in graph.previous(self.task) if prev.status != STATUS.CANCELED)
+        active = set(branch(task.token) for task in graph.active() if str(task.token).startswith(join_token_prefix))
 
-        return not active.exists()
+        self.task.join_expected = len(arrived | active)
+        self.task.join_arrived = len(arrived - active)
+
+        self.flow_class.task_class._default_manager.filter(pk=self.task.pk).update(
+            join_expected=self.task.join_expected,
+            join_arrived=self.task.join_arrived)
+
+    def arrive(self, prev_activation):
+        """
+        Register incoming task, and count it if it came from a direct split branch.
+        """
+        self.task.previous.add(prev_activation.task)
+
+        if self.task.join_arrived is not None:
+            prev_token, join_token = str(prev_activation.task.token), str(self.task.token)
+            if prev_token.startswith(join_token + '/') and '/' not in prev_token[len(join_token) + 1:]:
+                self.task.join_arrived += 1
+                self.flow_class.task_class._default_manager.filter(pk=self.task.pk).update(
+                    join_arrived=models.F('join_arrived') + 1)
+            else:
+                # nested split without join, counters could not be trusted anymore
+                self.task.join_arrived = None
+
+    def is_done(self):
+        if not self.flow_task._wait_all:
+            return True
+
+        if self.task.join_expected is None or self.task.join_arrived is None:
+            self.recount()
+
+        return self.task.join_arrived >= self.task.join_expected
 
     @Activation.status.transition(source=STATUS.ERROR)
     def retry(self):
@@ -118,8 +165,8 @@ class JoinActivation(Activation):
             activation.initialize(flow_task, task)
             activation.start()
         else:
-            task.previous.add(prev_activation.task)
             activation.initialize(flow_task, task)
+            activation.arrive(prev_activation)
 
         if activation.is_done():
             activation.done()
@@ -0,0 +1,145 @@
+"""
+Iterative scheduling of node activations.
+
+By default each node activation activates the next nodes recursively,
+so a chain of automatic nodes (gates, handlers, joins, end) runs inside
+one python call stack.
+
+With a scheduler enabled, node activations are placed into a queue,
+that is drained breadth-first by a single loop::
+
+    class MyFlow(Flow):
+        scheduler_impl = functools.partial(
+            Scheduler, max_steps=100, continuation=continue_activations.delay)
+
+When `max_steps` activations were performed in one transaction, the rest
+of the queue is passed to the `continuation` callable after commit, as a
+list of `[flow_task_ref, prev_task_pk, token]` items. The continuation
+should call `resume(items)`, usually from a background job.
+"""
+from collections import OrderedDict, deque
+
+from django.db import transaction
+
+from .activation import Context
+from .exceptions import FlowRuntimeError
+from .fields import get_task_ref, import_task_by_ref
+from .token import Token
+
+
+class Scheduler(object):
+    """
+    Breadth-first queue of node activations.
+
+    :keyword max_steps: Activations limit per transaction, unlimited if None
+    :keyword continuation: Callable that gets the rest of the queue,
+                           if the limit is reached. Without continuation,
+                           exceeding the limit is an error.
+    """
+    def __init__(self, flow_class, max_steps=None, continuation=None):
+        self.flow_class = flow_class
+        self.max_steps = max_steps
+        self.continuation = continuation
+
+        self.queue = deque()
+        self.steps = 0
+        self.running = False
+
+    def activate(self, flow_task, prev_activation, token):
+        """
+        Enqueue node activation. The outermost call drains the queue.
+
+        Returns the node activation, if it was performed by this call.
+        Nested calls return None, the activation is performed later.
+        """
+        self.queue.append((flow_task, prev_activation, token))
+        if not self.running:
+            return self.run()
+
+    def run(self):
+        """
+        Drain the queue, returns the first performed activation
+        """
+        self.running = True
+        first = None
+        try:
+            while self.queue:
+                if self.max_steps is not None and self.steps >= self.max_steps:
+                    self.hand_off()
+                    break
+
+                flow_task, prev_activation, token = self.queue.popleft()
+                self.steps += 1
+                activation = self.perform_step(flow_task, prev_activation, token)
+                if first is None:
+                    first = activation
+        finally:
+            self.running = False
+        return first
+
+    def perform_step(self, flow_task, prev_activation, token):
+        """
+        Activate a node, single scheduler step
+        """
+        return flow_task.activation_class.activate(flow_task, prev_activation, token)
+
+    def hand_off(self):
+        """
+        Pass the rest of the queue to the continuation, after the transaction commit.
+        """
+        if self.continuation is None:
+            raise FlowRuntimeError('Activations limit {} exceeded'.format(self.max_steps))
+
+        items = [
+            [get_task_ref(flow_task), prev_activation.task.pk, str(token)]
+            for flow_task, prev_activation, token in self.queue]
+        self.queue.clear()
+
+        continuation = self.continuation
+        if hasattr(transaction, 'on_commit'):
+            transaction.on_commit(lambda: continuation(items))
+        else:
+            # django 1.6/1.8
+            continuation(items)
+
+
+def resume(items):
+    """
+    Continue activations handed off by a scheduler.
+
+    Items are grouped by process, each process queue is drained in
+    a separate transaction under the process lock.
+    """
+    groups = OrderedDict()
+    for flow_task_ref, prev_task_pk, token in items:
+        flow_task = import_task_by_ref(flow_task_ref)
+        groups.setdefault(flow_task.flow_class, []).append((flow_task, prev_task_pk, Token(token)))
+
+    for flow_class, queue in groups.items():
+        task_class = flow_class.task_class
+        process_pks = dict(task_class._default_manager
+                           .filter(pk__in=[prev_task_pk for _, prev_task_pk, _ in queue])
+                           .values_list('pk', 'process_id'))
+
+        process_queues = OrderedDict()
+        for flow_task, prev_task_pk, token in queue:
+            process_queues.setdefault(process_pks[prev_task_pk], []).append((flow_task, prev_task_pk, token))
+
+        for process_pk, process_queue in process_queues.items():
+            _resume_process(flow_class, process_pk, process_queue)
+
+
+def _resume_process(flow_class, process_pk, queue):
+    task_class = flow_class.task_class
+
+    if flow_class.scheduler_impl is not None:
+        scheduler = flow_class.scheduler_impl(flow_class)
+    else:
+        scheduler = Scheduler(flow_class)
+
+    lock = flow_class.lock_impl(flow_class.instance)
+    with transaction.atomic(), lock(flow_class, process_pk), Context(scheduler=scheduler):
+        for flow_task, prev_task_pk, token in queue:
+            prev_task = task_class._default_manager.get(pk=prev_task_pk)
+            scheduler.queue.append((flow_task, prev_task.activate(), token))
+        scheduler.run()
@@ -1,8 +1,10 @@
 from django.contrib.auth import get_user_model
+from django.db.models import Manager
 from django.urls import NoReverseMatch
 from rest_framework import serializers
 
 from . import models as models
+from .managers import prefetch_flow_processes
 
 user_model = get_user_model()
 
@@ -20,23 +22,60 @@ class ProcessSerializer(serializers.ModelSerializer):
         model = models.Process
         fields = ('id', 'title', 'status', 'created', 'finished')
 
+    def to_representation(self, instance):
+        payloads = getattr(self.root, 'process_payloads', None)
+        if payloads is None:
+            return super(ProcessSerializer, self).to_representation(instance)
+
+        key = ('process', instance.pk)
+        if key not in payloads:
+            payloads[key] = super(ProcessSerializer, self).to_representation(instance)
+        return payloads[key]
+
+
+class TaskListSerializer(serializers.ListSerializer):
+    """
+    Serialize a page of tasks by a fixed number of queries.
+
+    Processes of the tasks are fetched at once, and each process payload
+    is serialized once per page.
+    """
+    def to_representation(self, data):
+        tasks = prefetch_flow_processes(list(data.all() if isinstance(data, Manager) else data))
+        self.process_payloads = {}
+        try:
+            return [self.child.to_representation(task) for task in tasks]
+        finally:
+            del self.process_payloads
+
 
 class TaskSerializer(serializers.ModelSerializer):
     process = ProcessSerializer()
     task_name = serializers.CharField(source='flow_task.name')
-    process_summary = serializers.CharField(source='flow_process.summary')
+    process_summary = serializers.SerializerMethodField()
     task_description = serializers.CharField(source='summary')
 
     class Meta:
         model = models.Task
         fields = ('id', 'owner', 'process', 'process_summary', 'task_name', 'task_description', 'status', 'created',
                   'started', 'finished', 'comments')
+        list_serializer_class = TaskListSerializer
 
     def __init__(self, *args, **kwargs):
         request = kwargs.pop('request', None)
         self.server_prefix = request.build_absolute_uri('/')[:-1].strip("/") if request else ''
         super(TaskSerializer, self).__init__(*args, **kwargs)
 
+    def get_process_summary(self, instance):
+        payloads = getattr(self.root, 'process_payloads', None)
+        if payloads is None:
+            return instance.flow_process.summary()
+
+        key = ('summary', instance.process_id)
+        if key not in payloads:
+            payloads[key] = instance.flow_process.summary()
+        return payloads[key]
+
     def to_representation(self, instance):
         data = super(TaskSerializer, self).to_representation(instance)
         links = {}
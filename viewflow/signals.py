@@ -1,8 +1,142 @@
+"""
+Flow signals.
+
+Signals are sent synchronously, inside the flow lock. Slow receivers
+could be moved out of the lock by the flow `signal_dispatcher`::
+
+    class MyFlow(Flow):
+        signal_dispatcher = OnCommitDispatcher(max_workers=4)
+
+"""
+import copy
+import logging
+import threading
+
+from django.db import close_old_connections, models, transaction
 from django.dispatch import Signal
 
-flow_started = Signal(providing_args=["process", "task"])
-flow_finished = Signal(providing_args=["process", "task"])
 
-task_started = Signal(providing_args=["process", "task"])
-task_failed = Signal(providing_args=["process", "task", "exception", "traceback"])
-task_finished = Signal(providing_args=["process", "task"])
+logger = logging.getLogger(__name__)
+
+
+class FlowSignal(Signal):
+    """
+    Signal that could be dispatched by the sender flow `signal_dispatcher`
+    """
+    def send(self, sender, **named):
+        dispatcher = getattr(sender, 'signal_dispatcher', None)
+        if dispatcher is not None:
+            return dispatcher.dispatch(self, sender, named)
+        return super(FlowSignal, self).send(sender, **named)
+
+    def send_now(self, sender, **named):
+        """
+        Send signal bypassing the flow dispatcher
+        """
+        return super(FlowSignal, self).send(sender, **named)
+
+
+class OnCommitDispatcher(object):
+    """
+    Buffer signals until the current transaction commit.
+
+    Signals of a rolled back transaction are not sent. Receivers get
+    signals in the same order as they were sent, with process and task
+    instances in the state they have at the commit time.
+
+    :keyword max_workers: Send signals from a pool of background threads.
+                          Signals of the same process are sent by the
+                          same thread, so ordering preserved per process.
+                          Receivers use own database connections, and
+                          get copies of the process and task instances.
+    """
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self._executors = None
+        self._executors_lock = threading.Lock()
+
+    def dispatch(self, signal, sender, named):
+        if hasattr(transaction, 'on_commit'):
+            transaction.on_commit(lambda: self.fire(signal, sender, named))
+        else:
+            # django 1.6/1.8
+            self.fire(signal, sender, named)
+        return []
+
+    def fire(self, signal, sender, named):
+        if not self.max_workers:
+            signal.send_now(sender, **named)
+        else:
+            process = named.get('process')
+            executor = self.get_executor(process.pk if process is not None else None)
+            executor.submit(_send_in_thread, signal, sender, _copy_instances(named))
+
+    def get_executor(self, key):
+        if self._executors is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with self._executors_lock:
+                if self._executors is None:
+                    self._executors = [ThreadPoolExecutor(max_workers=1) for _ in range(self.max_workers)]
+        return self._executors[hash(key) % self.max_workers]
+
+    def shutdown(self, wait=True):
+        """
+        Wait for pending signals and stop background threads.
+        """
+        with self._executors_lock:
+            executors, self._executors = self._executors, None
+        for executor in executors or []:
+            executor.shutdown(wait=wait)
+
+
+def _copy_instance(instance, copies):
+    """
+    Shallow copy of the model instance, with copies of the cached related instances
+    """
+    if id(instance) not in copies:
+        clone = copies[id(instance)] = copy.copy(instance)
+        clone._state = copy.copy(instance._state)
+        for name, value in list(clone.__dict__.items()):
+            if isinstance(value, models.Model):
+                clone.__dict__[name] = _copy_instance(value, copies)
+        fields_cache = getattr(clone._state, 'fields_cache', None)
+        if fields_cache:
+            clone._state.fields_cache = {
+                name: _copy_instance(value, copies) if isinstance(value, models.Model) else value
+                for name, value in fields_cache.items()}
+    return copies[id(instance)]
+
+
+def _copy_instances(named):
+    copies = {}
+    result = {}
+    for name, value in named.items():
+        if isinstance(value, models.Model):
+            value = _copy_instance(value, copies)
+        elif isinstance(value, (list, tuple)) and value and isinstance(value[0], models.Model):
+            value = [_copy_instance(item, copies) for item in value]
+        result[name] = value
+    return result
+
+
+def _send_in_thread(signal, sender, named):
+    # nobody waits for the submitted future, log receiver errors here
+    try:
+        return signal.send_now(sender, **named)
+    except Exception:
+        logger.exception('Signal receiver failed, sender %s', sender)
+        raise
+    finally:
+        close_old_connections()
+
+
+flow_started = FlowSignal(providing_args=["process", "task"])
+flow_finished = FlowSignal(providing_args=["process", "task"])
+flow_started_bulk = FlowSignal(providing_args=["processes", "tasks"])
+
+task_started = FlowSignal(providing_args=["process", "task"])
+task_failed = FlowSignal(providing_args=["process", "task", "exception", "traceback"])
+task_finished = FlowSignal(providing_args=["process", "task"])
+
+lock_stats = Signal(providing_args=["flow_label", "process_pk", "wait_time", "attempts", "hold_time", "outcome"])